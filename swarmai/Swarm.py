@@ -1,5 +1,6 @@
 import numpy as np
 from datetime import datetime
+import asyncio
 import time
 import yaml
 import threading
@@ -11,11 +12,26 @@ from pathlib import Path
 
 from swarmai.utils.CustomLogger import CustomLogger
 
-from swarmai.utils.memory import VectorMemory
+from swarmai.utils.memory import VectorMemory, EmbeddingCache
+from swarmai.utils.ai_engines.EngineBase import EngineBase
+from swarmai.utils.ai_engines.ResponseCache import ResponseCache
+from swarmai.utils.ai_engines.RateLimiter import RateLimiter
+from swarmai.utils.ai_engines.ContextPacker import ContextPacker
+from swarmai.utils.ai_engines.SimulatedEngine import Simulation, SimulatedEmbeddings, SimulatedLLM
+from swarmai.utils.ai_engines.GPTConversEngine import GPTConversEngine
+from swarmai.utils.ai_engines.RoutingEngine import RoutingEngine
+from swarmai.utils.ai_engines.EnginePool import EnginePool
 from swarmai.utils.task_queue.PandasQueue import PandasQueue
+from swarmai.utils.task_queue.HeapQueue import HeapQueue
+from swarmai.utils.task_queue.TaskQueueWAL import TaskQueueWAL
+from swarmai.utils.task_queue.TaskDeduplicator import TaskDeduplicator
+from swarmai.utils.task_queue.SchedulingPolicy import create_scheduling_policy
+from swarmai.utils.task_queue.TaskQueueServer import TaskQueueServer
+from swarmai.utils.task_queue.RemoteQueue import RemoteQueue
 from swarmai.utils.task_queue.Task import Task
 
 from swarmai.agents import ManagerAgent, GeneralPurposeAgent, GooglerAgent, CrunchbaseSearcher
+from swarmai.agents.AsyncAgentRuntime import AsyncAgentRuntime
 
 class Swarm:
     """This class is responsible for managing the swarm of agents.
@@ -59,6 +75,11 @@ class Swarm:
         Task.TaskTypes.crunchbase_search
     ]
 
+    TASK_QUEUES = {
+        "pandas": PandasQueue,
+        "heap": HeapQueue
+    }
+
     TASK_ASSOCIATIONS = {
         "manager": [Task.TaskTypes.breakdown_to_subtasks, Task.TaskTypes.report_preparation],
         "googler": [Task.TaskTypes.google_search],
@@ -75,12 +96,17 @@ class Swarm:
         self.swarm_config_loc = swarm_config_loc
         self._parse_swarm_config()
 
-        # creating shared memory
+        # creating shared memory, the embedding cache lives outside of run_dir to survive the re-runs
+        self.embedding_cache = EmbeddingCache(**self.embedding_cache_config) if self.embedding_cache_config is not None else None
         self.shared_memory_file = self.data_dir / 'shared_memory'
-        self.shared_memory = VectorMemory(self.shared_memory_file)
+        if self.simulation_config is not None:
+            self.shared_memory = VectorMemory(self.shared_memory_file, embeddings=SimulatedEmbeddings(), qa_llm=SimulatedLLM(), embedding_cache=self.embedding_cache, **self.shared_memory_config)
+        else:
+            self.shared_memory = VectorMemory(self.shared_memory_file, embedding_cache=self.embedding_cache, **self.shared_memory_config)
         self.output_file = str((self.data_dir / 'output.txt').resolve())
-        with open(self.output_file, 'w') as f:
-            f.write("")
+        if not (self.resume and Path(self.output_file).exists()):
+            with open(self.output_file, 'w') as f:
+                f.write("")
         
         out_json = Path(str(self.output_file).replace(".txt", ".json"))
         if out_json.exists():
@@ -93,11 +119,18 @@ class Swarm:
                 f.write("")
 
         # creating task queue
-        self.task_queue = PandasQueue(self.TASK_TYPES, self.WORKER_ROLES.keys(), self.TASK_ASSOCIATIONS)
+        self.task_queue = self._create_task_queue()
+        self.task_queue_server = None
+        if self.task_queue_config.get("serve") is not None:
+            self.task_queue_server = TaskQueueServer(self.task_queue, self.task_queue_config["serve"]).start()
 
         # creating the logger
         self.logger = CustomLogger(self.data_dir)
 
+        # the response cache is shared by the engines of all the agents, it lives outside of run_dir to survive the re-runs
+        if self.llm_cache_config is not None:
+            EngineBase.response_cache = ResponseCache(**self.llm_cache_config)
+
         # creating agents
         self.agents_ids = []
         self.agents = self._create_agents() # returns just a list of agents
@@ -105,6 +138,40 @@ class Swarm:
         # get a lock
         self.lock = threading.Lock()
 
+    def _create_task_queue(self):
+        """Creates the task queue of the type specified in the swarm config (swarm.task_queue.type).
+        If swarm.task_queue.wal is set, the queue is logged to run_dir/task_queue and resumed from there on restart.
+        Type "remote" connects to a TaskQueueServer at swarm.task_queue.address (another swarm with swarm.task_queue.serve, or a standalone server).
+        """
+        queue_type = self.task_queue_config.get("type", "pandas")
+        if queue_type == "remote":
+            return RemoteQueue(self.task_queue_config["address"])
+        if queue_type not in self.TASK_QUEUES:
+            raise ValueError(f"Task queue type {queue_type} is not supported. Supported types are: {list(self.TASK_QUEUES.keys())}")
+
+        kwargs = {}
+        if self.task_queue_config.get("wal", False):
+            if queue_type != "heap":
+                raise ValueError(f"Write-ahead log is only supported by the heap task queue, not {queue_type}")
+            kwargs["wal"] = TaskQueueWAL(self.data_dir / "task_queue", snapshot_every=self.task_queue_config.get("snapshot_every", 1000))
+        if self.task_queue_config.get("lease_duration") is not None:
+            if queue_type != "heap":
+                raise ValueError(f"Leases are only supported by the heap task queue, not {queue_type}")
+            kwargs["lease_duration"] = self.task_queue_config["lease_duration"]
+            kwargs["reap_interval"] = self.task_queue_config.get("reap_interval", 1)
+        if self.task_queue_config.get("dedup") is not None:
+            if queue_type != "heap":
+                raise ValueError(f"Task deduplication is only supported by the heap task queue, not {queue_type}")
+            kwargs["deduplicator"] = TaskDeduplicator(**self.task_queue_config["dedup"])
+        if self.task_queue_config.get("scheduling") is not None:
+            if queue_type != "heap":
+                raise ValueError(f"Scheduling policies are only supported by the heap task queue, not {queue_type}")
+            kwargs["scheduling_policy"] = create_scheduling_policy(self.task_queue_config["scheduling"])
+        if "dependency_timeout" in self.task_queue_config:
+            kwargs["dependency_timeout"] = self.task_queue_config["dependency_timeout"]
+
+        return self.TASK_QUEUES[queue_type](self.TASK_TYPES, self.WORKER_ROLES.keys(), self.TASK_ASSOCIATIONS, **kwargs)
+
     def _create_agents(self):
         """Creates the tesnor of agents according to the tensor shape and the agent role distribution.
         For now just randomly allocating them in the swarm"""
@@ -129,7 +196,8 @@ class Swarm:
 
     def _check_keys_and_agents(self, agent_role):
         # if GOOGLE_API_KEY and GOOGLE_CSE_ID are not in os.environ, then the googler agent will be treated as a general purpose agent
-        if agent_role == "googler" and ("GOOGLE_API_KEY" not in os.environ or "GOOGLE_CSE_ID" not in os.environ):
+        # (the simulated search needs no keys)
+        if agent_role == "googler" and self.simulation_config is None and ("GOOGLE_API_KEY" not in os.environ or "GOOGLE_CSE_ID" not in os.environ):
             agent_role = "analyst"
 
         return agent_role
@@ -138,8 +206,14 @@ class Swarm:
     def run_swarm(self):
         """Runs the swarm for a given number of cycles or until the termination condition is met.
         """
-        # add the main task to the task queue
+        # add the main task to the task queue, unless the queue was resumed from the write-ahead log and already has them
         n_initial_manager_tasks = len(self.goals)
+        if getattr(self.task_queue, "resumed", False):
+            self.log(f"Resumed the task queue from the write-ahead log, skipping the initial tasks")
+            n_initial_manager_tasks = 0
+        if isinstance(self.task_queue, RemoteQueue):
+            self.log(f"Using the remote task queue at {self.task_queue.address}, the initial tasks are added by the process that serves it")
+            n_initial_manager_tasks = 0
         for i in range(n_initial_manager_tasks):
             task_i = Task(
                 priority=100,
@@ -149,6 +223,18 @@ class Swarm:
             self.task_queue.add_task(task_i)
             self.create_report_qa_task()
 
+        if self.runtime == "asyncio":
+            # all the agents are coroutines on one event loop, see AsyncAgentRuntime
+            for agent in self.agents:
+                agent.max_cycles = 50
+            self.log(f"Running {len(self.agents)} agents on the asyncio runtime with max {self.max_concurrency} concurrent tasks for {self.timeout} seconds")
+            asyncio.run(AsyncAgentRuntime(list(self.agents), max_concurrency=self.max_concurrency).run(timeout=self.timeout))
+            self.stop()
+            self.log("All agents have finished their work")
+            self.dump_task_queue_metrics()
+            self.dump_routing_stats()
+            return
+
         # start the agents
         for agent in self.agents:
             agent.max_cycles = 50
@@ -164,23 +250,69 @@ class Swarm:
         self.stop()
 
         self.log("All agents have finished their work")
+        self.dump_task_queue_metrics()
+        self.dump_routing_stats()
+
+    def dump_task_queue_metrics(self):
+        """Writes the task queue metrics (depth, wait/service time percentiles, rates, resets) to run_dir/task_queue_metrics.json.
+        """
+        metrics_file = self.data_dir / "task_queue_metrics.json"
+        with open(metrics_file, "w") as f:
+            json.dump(self.task_queue.get_metrics(), f, indent=4)
+        self.log(f"Task queue metrics are saved to {metrics_file}")
 
-    def create_report_qa_task(self):
+    def dump_routing_stats(self):
+        """Writes the calls, timeouts, latency and tokens per model route to run_dir/routing_stats.json, if the routing is enabled.
+        """
+        if self.routing_config is None:
+            return
+        stats_file = self.data_dir / "routing_stats.json"
+        with open(stats_file, "w") as f:
+            json.dump(RoutingEngine.stats.get_stats(), f, indent=4)
+        self.log(f"Routing stats are saved to {stats_file}")
+
+    def create_report_qa_task(self, depends_on=None):
         """Creates a task that will be used to evaluate the report quality.
         Make it as a method, because it will be called by the manager agent too.
+
+        Args:
+            - depends_on (list): ids of the tasks (e.g. the searches for the missing information) that must be completed before the report is updated again
         """
         task_i = Task(
             priority=50,
             task_type=Task.TaskTypes.report_preparation,
-            task_description=f"Prepare a final report about a global goal."
+            task_description=f"Prepare a final report about a global goal.",
+            depends_on=depends_on,
         )
         self.task_queue.add_task(task_i)
 
     def stop(self):
         for agent in self.agents:
             agent.ifRun = False
+        self.task_queue.interrupt_waiters()
         for agent in self.agents:
-            agent.join()
+            if agent.ident is not None: # not started with the asyncio runtime
+                agent.join()
+        if self.task_queue_server is not None:
+            self.task_queue_server.stop() # also closes the queue
+        else:
+            self.task_queue.close()
+        # write and persist the buffered memory entries
+        self.shared_memory.close()
+        if self.embedding_cache is not None:
+            self.embedding_cache.close()
+            self.log(f"Embedding cache: {self.embedding_cache.get_stats()}")
+
+        deduplicator = getattr(self.task_queue, "deduplicator", None)
+        if deduplicator is not None:
+            self.log(f"Suppressed near-duplicate tasks: {deduplicator.get_suppressed_count()}")
+        if EngineBase.response_cache is not None:
+            EngineBase.response_cache.flush()
+            self.log(f"LLM response cache: {EngineBase.response_cache.get_stats()}")
+        if EngineBase.single_flight is not None:
+            self.log(f"Coalesced LLM calls: {EngineBase.single_flight.get_stats()}")
+        if self.simulation_config is not None:
+            self.log(f"Simulated calls: {Simulation.get_stats()}")
 
     def _parse_swarm_config(self):
         """Parses the swarm configuration file and returns the agent role distribution.
@@ -194,6 +326,59 @@ class Swarm:
                 n: 10
             timeout: 10m
             run_dir: /tmp/swarm
+            runtime: asyncio # threads (default): one thread per agent, asyncio: all the agents on one event loop
+            max_concurrency: 200 # asyncio only, max number of tasks performed at the same time. Agents without a native aperform_task
+                                 # (manager, googler, crunchbase_searcher) take one thread of a pool of this size per task
+            llm_cache: # optional (off by default), kwargs of the ResponseCache
+                path: ~/.cache/swarmai/llm_cache.sqlite
+                max_memory_entries: 1000
+                max_disk_bytes: 268435456
+                bypass_nonzero_temperature: true # false also caches the sampled calls (temperature > 0)
+            shared_memory: # optional, kwargs of the VectorMemory
+                backend: numpy # chroma (default) or numpy
+                ann: {n_probe: 16, min_size: 50000} # numpy only, approximate search of large memories, kwargs of the IVFIndex
+                batch_size: 64 # max chunks per embedding call
+                flush_interval: 1 # seconds the chunks wait for a full batch
+                persist_every: 256 # group commit: persist after this many chunks...
+                persist_interval: 30 # ...or seconds
+            embedding_cache: # optional, kwargs of the EmbeddingCache
+                path: ~/.cache/swarmai/embedding_cache
+                max_entries: 100000
+            rate_limits: # optional, requests and tokens per minute per model, shared by all the agents. Defaults in RateLimiter.DEFAULT_LIMITS
+                gpt-3.5-turbo: {rpm: 3500, tpm: 90000}
+            simulation: # optional, simulated llm, search and embeddings instead of the apis (load tests), see SimulatedEngine.Simulation
+                latency:
+                    llm: {distribution: lognormal, median: 2.0, sigma: 0.5}
+                    search: {distribution: uniform, low: 0.5, high: 2.0}
+                error_rate: 0.01
+                seed: 0
+            routing: # optional, choose the model per call, see RoutingEngine
+                models: {gpt-3.5-turbo: {cost_per_1k_tokens: 0.002, timeout: 60}, gpt-4: {cost_per_1k_tokens: 0.06, timeout: 120}}
+                task_types: {report_preparation: gpt-4}
+                max_cost_per_call: 0.5
+                max_latency: 30
+            context_packing: # optional (off by default), kwargs of the ContextPacker for the calls with an instruction (e.g. the report), {} for the defaults
+                max_context_tokens: 2000
+                max_segment_tokens: 200
+            task_queue: # optional
+                type: heap # supported: pandas (default), heap
+                wal: true # log the task queue to run_dir/task_queue (heap only)
+                resume: true # don't wipe run_dir on start, resume the tasks from the log
+                lease_duration: 30 # seconds a claim is valid without renewal (heap only), or a dict per task type with a "default" key
+                max_task_duration: 600 # seconds after which an agent drops a stuck task, or a dict per task type with a "default" key
+                dependency_timeout: 600 # seconds after which a task blocked by its depends_on is released anyway (default 600), null to wait forever
+                dedup: # suppress near-duplicate tasks (heap only), kwargs of the TaskDeduplicator
+                    threshold: 0.7
+                    mode: merge # reject or merge
+                    task_types: [google_search]
+                    max_completed: 10000 # completed tasks whose descriptions are kept for the comparison, least recently completed are evicted
+                scheduling: # heap only, see SchedulingPolicy.create_scheduling_policy
+                    policy: fair_share # priority (default), aging, fair_share
+                    aging_rate: 0.1 # priority points per second of waiting
+                    weights: {breakdown_to_subtasks: 1, report_preparation: 1, google_search: 3}
+                serve: tcp://127.0.0.1:5555 # expose the queue to agents in other processes, or unix:///path/to/socket
+                # type: remote # use the queue of another process
+                # address: tcp://127.0.0.1:5555
         task:
             role: |
                 professional venture capital agency, who has a proven track reckord of consistently funding successful startups
@@ -213,14 +398,46 @@ class Swarm:
             self.agent_role_distribution[agent["type"]] = agent["n"]
         
         self.timeout = config["swarm"]["timeout_min"]*60
+        self.runtime = config["swarm"].get("runtime", "threads")
+        if self.runtime not in ["threads", "asyncio"]:
+            raise ValueError(f"Runtime {self.runtime} is not supported. Supported runtimes are: threads, asyncio")
+        self.max_concurrency = config["swarm"].get("max_concurrency", 100)
+        self.llm_cache_config = config["swarm"].get("llm_cache")
+        self.shared_memory_config = config["swarm"].get("shared_memory", {})
+        self.embedding_cache_config = config["swarm"].get("embedding_cache")
+        if self.embedding_cache_config is not None and self.embedding_cache_config.get("path") is not None:
+            self.embedding_cache_config["path"] = Path(self.embedding_cache_config["path"]).expanduser()
+        if config["swarm"].get("rate_limits") is not None:
+            RateLimiter.configure(config["swarm"]["rate_limits"])
+        if self.llm_cache_config is not None and self.llm_cache_config.get("path") is not None:
+            self.llm_cache_config["path"] = Path(self.llm_cache_config["path"]).expanduser()
+        self.simulation_config = config["swarm"].get("simulation")
+        if self.simulation_config is not None:
+            Simulation.enable(self.simulation_config)
+            # the synthetic responses must not end up in the persistent cache of the real ones
+            if self.llm_cache_config is not None:
+                self.llm_cache_config["path"] = ":memory:"
+            if self.embedding_cache_config is not None:
+                self.embedding_cache_config["path"] = ":memory:"
+        self.routing_config = config["swarm"].get("routing")
+        if self.routing_config is not None:
+            # the agents get the RoutingEngine instead of the GPTConversEngine, it calls the (possibly simulated) model engines
+            RoutingEngine.configure(self.routing_config, model_engine_class=EnginePool.resolve(GPTConversEngine))
+            EnginePool.substitute({GPTConversEngine: RoutingEngine})
+        if config["swarm"].get("context_packing") is not None:
+            EngineBase.context_packer = ContextPacker(**config["swarm"]["context_packing"])
+        self.task_queue_config = config["swarm"].get("task_queue", {})
+        self.max_task_duration = self.task_queue_config.get("max_task_duration", 600)
         
         self.data_dir = Path(".", config["swarm"]["run_dir"]).resolve()
-        # first, try to delete the directory with all the data
-        try:
-            for dir_i in self.data_dir.iterdir():
-                shutil.rmtree(dir_i)
-        except Exception:
-            pass
+        self.resume = self.task_queue_config.get("wal", False) and self.task_queue_config.get("resume", False)
+        # first, try to delete the directory with all the data. When resuming, the data of the previous run is kept
+        if not self.resume:
+            try:
+                for dir_i in self.data_dir.iterdir():
+                    shutil.rmtree(dir_i)
+            except Exception:
+                pass
 
         self.data_dir.mkdir(parents=True, exist_ok=True)
 
@@ -1,9 +1,13 @@
 from abc import ABC, abstractmethod
+import asyncio
 import threading
 import queue
 import time
+import functools
+import contextvars
 
 from swarmai.utils.task_queue.Task import Task
+from swarmai.utils.ai_engines.EngineBase import current_task_type
 
 class AgentJob(threading.Thread):
     """A class that handles multithreading logic
@@ -30,8 +34,11 @@ class AgentBase(ABC, threading.Thread):
         challenge (Challenge implementation): The challenge object
         logger (Logger): The logger object
         max_cycles (int): The maximum number of cycles that the agent will run
+        task_wait_timeout (float): How long the agent blocks in the task queue waiting for a task before re-checking if it should still run
     """
 
+    task_wait_timeout = 15
+
     def __init__(self, agent_id, agent_type, swarm, logger, max_cycles = 10):
         """Initialize the agent.
         """
@@ -45,6 +52,7 @@ class AgentBase(ABC, threading.Thread):
 
         self.logger = logger
         self.max_cycles = max_cycles
+        self.max_task_duration = self.swarm.max_task_duration
 
         # some mandatory components
         self.step = "init"
@@ -55,42 +63,92 @@ class AgentBase(ABC, threading.Thread):
         self.current_step = "init"
         self.ifRun = True
         self.cycle = 0
+        self.executor = None # executor of perform_task on the AsyncAgentRuntime, set by the runtime
 
     def run(self):
         while self.ifRun:
-            while self.task is None:
-                self._get_task() # gets the task from the task queue
-                if self.task  is None:
-                    time.sleep(15)
+            while self.task is None and self.ifRun:
+                self._get_task(timeout=self.task_wait_timeout) # blocks until the task queue has a task for us
+            if self.task is None:
+                break
 
-            self.job = AgentJob(self.agent_iteration, ())
+            task = self.task
+            self.job = AgentJob(self.agent_iteration, (task,))
             self.job.name = f"Agent {self.agent_id}, cycle {self.cycle}"
             self.job.start()
-            self.job.join(timeout=600)
-
-            # there is no deadlock, but the agetns sometimes submit code with infinite loops, so need to kill the jobs
-            if self.job.is_alive():
-                self.log("Stuck. Dropping the thread.", level = "error")
-                self._reset_task()
+            self._wait_for_job(task)
 
             self.cycle += 1
             if self.cycle >= self.max_cycles:
                 self.ifRun = False
 
-    def agent_iteration(self):
+    def _wait_for_job(self, task):
+        """Waits for the job to finish and renews the lease of the task in the task queue while the job is running.
+        If the job takes longer than the max duration for its task type or the lease was lost, the job is abandoned.
+        The abandoned job can't complete the task anymore: its fencing token is outdated once the task is claimed again.
+        The id and the fencing token of the claim are read once before waiting: the job may change self.task in the meantime.
+        """
+        task_id, fencing_token = task.task_id, task.fencing_token
+        deadline = time.monotonic() + self._get_max_task_duration(task.task_type)
+        lease_duration = self.task_queue.get_lease_duration(task.task_type)
+        while self.job.is_alive():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                # there is no deadlock, but the agetns sometimes submit code with infinite loops or hang in the api calls, so need to drop the jobs
+                self.log("Stuck. Dropping the thread.", level = "error")
+                self.task_queue.reset_task(task_id, fencing_token=fencing_token)
+                self._drop_task(task)
+                return
+
+            if lease_duration is not None:
+                remaining = min(remaining, lease_duration/3)
+            self.job.join(timeout=remaining)
+
+            if self.job.is_alive() and not self.task_queue.renew_lease(task_id, fencing_token):
+                self.log("Lost the lease of the task. Dropping the thread.", level = "error")
+                self._drop_task(task)
+                return
+
+    def _drop_task(self, task):
+        """Forgets the abandoned task, unless the agent already holds another one.
+        """
+        if self.task is task:
+            self.task = None
+
+    def _get_max_task_duration(self, task_type):
+        """max_task_duration is either a number of seconds or a dict task_type -> seconds with an optional "default" key.
+        """
+        if isinstance(self.max_task_duration, dict):
+            return self.max_task_duration.get(task_type, self.max_task_duration.get("default", 600))
+        return self.max_task_duration
+
+    def agent_iteration(self, task=None):
         """Main iteration of the agent.
         """
+        if task is None:
+            task = self.task
+        current_task_type.set(task.task_type) # for the RoutingEngine, the job thread has its own context
         ifSuccess = self.perform_task()
         if ifSuccess:
-            self._submit_complete_task()
+            self._submit_complete_task(task)
         else:
-            self._reset_task()
+            self._reset_task(task)
 
     @abstractmethod
     def perform_task(self):
         """main method of the agent that defines the task it performs
         """
         raise NotImplementedError
+
+    async def aperform_task(self):
+        """Coroutine version of perform_task, used by the AsyncAgentRuntime.
+        By default runs perform_task in a thread of self.executor, which the runtime sizes to max_concurrency, so the blocking agents
+        can still have max_concurrency calls in flight, but each one occupies a thread. Agents that call the engines with acall_model
+        (e.g. GeneralPurposeAgent) should override it.
+        """
+        # the context carries the task type for the RoutingEngine, run_in_executor doesn't copy it
+        perform_task = functools.partial(contextvars.copy_context().run, self.perform_task)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, perform_task)
     
     @abstractmethod
     def share(self):
@@ -98,13 +156,20 @@ class AgentBase(ABC, threading.Thread):
         """
         raise NotImplementedError
     
-    def _submit_complete_task(self):
-        self.task_queue.complete_task(self.task.task_id)
-        self.task = None
+    def _submit_complete_task(self, task=None):
+        if task is None:
+            task = self.task
+        if not self.task_queue.complete_task(task.task_id, fencing_token=task.fencing_token):
+            self.log(f"Task queue rejected the completion of the task {task.task_id}", level = "warning")
+        if self.task is task:
+            self.task = None
 
-    def _reset_task(self):
-        self.task_queue.reset_task(self.task.task_id)
-        self.task = None
+    def _reset_task(self, task=None):
+        if task is None:
+            task = self.task
+        self.task_queue.reset_task(task.task_id, fencing_token=task.fencing_token)
+        if self.task is task:
+            self.task = None
 
     def _retrive_messages(self):
         """Retrive messages from the neighbors.
@@ -121,11 +186,12 @@ class AgentBase(ABC, threading.Thread):
             except Exception as e:
                 self.log(f"Error while processing the message: {e}", level = "error")
 
-    def _get_task(self):
+    def _get_task(self, timeout=0):
         """Gets the task from the task queue.
         It's not the job of the agent to decide which task to perform, it's the job of the task queue.
+        Waits up to timeout seconds for a suitable task to be added.
         """        
-        self.task = self.task_queue.get_task(self)
+        self.task = self.task_queue.get_task(self, timeout=timeout)
         if not isinstance(self.task, Task):
             self.task = None
             return
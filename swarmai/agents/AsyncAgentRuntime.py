@@ -0,0 +1,183 @@
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import openai
+import aiohttp
+
+from swarmai.utils.ai_engines.EngineBase import current_task_type
+
+class AsyncAgentRuntime:
+    """Runs the agents as coroutines on one event loop instead of one thread (plus one AgentJob thread per cycle) per agent.
+
+    Every agent still processes one task at a time (agent.aperform_task). For the agents with a native aperform_task (acall_model,
+    e.g. GeneralPurposeAgent) waiting for the LLM doesn't occupy a thread, so hundreds of agents can keep hundreds of calls in flight.
+    The other agents (Manager, Googler, Crunchbase) run their blocking perform_task in a thread of the task executor, which has one
+    thread per slot: they reach max_concurrency too, at the cost of one thread per task in flight. A task cancelled because it's stuck
+    keeps its thread until perform_task returns, so stuck blocking tasks reduce the effective concurrency.
+    max_concurrency caps the number of tasks performed at the same time,
+    and all the openai calls share one HTTP session (openai.aiosession) with a connection pool of the same size.
+
+    Mirrors the thread runtime of AgentBase: the claim is renewed while the task runs, the task is reset if it fails or takes longer
+    than the max duration of its type, and the completion is submitted with the fencing token of the claim.
+    An agent without a task waits in get_task of the task queue, in a thread of the claim executor: it's woken up by the queue as soon as
+    a task is available (no polling) and doesn't hold a slot of max_concurrency meanwhile, so idle agents don't keep the others waiting.
+    A claimed task waits for a slot with its lease renewed, so the lease can't run out before the task starts.
+    The other task queue calls run in the default executor (asyncio.to_thread), so a slow queue (e.g. a RemoteQueue) doesn't block the loop.
+
+    Example:
+        runtime = AsyncAgentRuntime(agents, max_concurrency=200)
+        asyncio.run(runtime.run(timeout=600))
+    """
+
+    def __init__(self, agents, max_concurrency=100, claim_timeout=5):
+        """
+        Args:
+            - agents (list[AgentBase]): the agents, not started as threads
+            - max_concurrency (int): max number of tasks performed at the same time
+            - claim_timeout (float): max seconds an agent waits in the task queue before checking if the runtime is stopped
+        """
+        self.agents = agents
+        self.max_concurrency = max_concurrency
+        self.claim_timeout = claim_timeout
+        self._stopped = None
+        self._semaphore = None
+        self._claim_executor = None
+        self._task_executor = None
+
+    async def run(self, timeout=None):
+        """Runs all the agents until they reach max_cycles, stop() is called or timeout seconds passed.
+        """
+        self._stopped = asyncio.Event()
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        # one waiting thread per idle agent, blocked on the condition of the task queue
+        self._claim_executor = ThreadPoolExecutor(max_workers=max(1, len(self.agents)), thread_name_prefix="AsyncAgentRuntime claim")
+        # blocking perform_task of the agents without a native aperform_task, one thread per slot
+        self._task_executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="AsyncAgentRuntime task")
+        for agent in self.agents:
+            agent.executor = self._task_executor
+        async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.max_concurrency)) as session:
+            openai.aiosession.set(session) # the agent tasks below inherit the context
+            agent_loops = [asyncio.create_task(self._agent_loop(agent)) for agent in self.agents]
+            try:
+                await asyncio.wait_for(self._stopped.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._stopped.set()
+            for agent in self.agents:
+                agent.ifRun = False
+            # the agents waiting for a task return at once, the tasks in flight are cancelled and reset
+            for task_queue in {id(agent.task_queue): agent.task_queue for agent in self.agents}.values():
+                task_queue.interrupt_waiters()
+            for agent_loop in agent_loops:
+                agent_loop.cancel()
+            await asyncio.gather(*agent_loops, return_exceptions=True)
+            openai.aiosession.set(None)
+        self._claim_executor.shutdown(wait=False, cancel_futures=True)
+        self._task_executor.shutdown(wait=False, cancel_futures=True)
+
+    def stop(self):
+        """Stops the runtime, must be called from the event loop (e.g. in a coroutine or via loop.call_soon_threadsafe).
+        """
+        if self._stopped is not None:
+            self._stopped.set()
+
+    async def _agent_loop(self, agent):
+        while agent.ifRun and not self._stopped.is_set():
+            task = await self._claim(agent)
+            if task is None or not await self._acquire_slot(agent, task):
+                continue
+            try:
+                agent.task = task
+                agent.log(f"Got task: {task.task_id}", level = "debug")
+                await self._perform_task(agent, task)
+            finally:
+                self._semaphore.release()
+
+            agent.cycle += 1
+            if agent.cycle >= agent.max_cycles:
+                agent.ifRun = False
+
+    async def _claim(self, agent):
+        """Waits up to claim_timeout seconds for a task in a thread of the claim executor, without blocking the loop.
+        A task claimed after the agent was cancelled is reset, either by the claiming thread or here if it was already handed over.
+        """
+        handover = threading.Lock()
+        claim_state = {"abandoned": False, "task": None}
+
+        def claim():
+            task = agent.task_queue.get_task(agent, timeout=self.claim_timeout)
+            with handover:
+                if claim_state["abandoned"]:
+                    if task is not None:
+                        agent._reset_task(task)
+                    return None
+                claim_state["task"] = task
+            return task
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._claim_executor, claim)
+        except asyncio.CancelledError:
+            with handover:
+                claim_state["abandoned"] = True
+                task = claim_state["task"]
+            if task is not None:
+                await asyncio.to_thread(agent._reset_task, task)
+            raise
+
+    async def _acquire_slot(self, agent, task):
+        """Waits for a slot of max_concurrency, renewing the lease of the claimed task meanwhile.
+        Returns False if the lease was lost, the task is reset if the agent is cancelled.
+        """
+        lease_duration = await asyncio.to_thread(agent.task_queue.get_lease_duration, task.task_type)
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(self._semaphore.acquire(), None if lease_duration is None else lease_duration/3)
+                    return True
+                except asyncio.TimeoutError:
+                    if not await asyncio.to_thread(agent.task_queue.renew_lease, task.task_id, task.fencing_token):
+                        agent.log("Lost the lease of the task while waiting for a slot.", level = "error")
+                        return False
+        except asyncio.CancelledError:
+            await asyncio.to_thread(agent._reset_task, task)
+            raise
+
+    async def _perform_task(self, agent, task):
+        """Performs the task, renewing its lease, and completes or resets it in the task queue.
+        """
+        # the task copies the context, so the engines called by the agent see the task type (RoutingEngine)
+        token = current_task_type.set(task.task_type)
+        job = asyncio.create_task(agent.aperform_task())
+        current_task_type.reset(token)
+        deadline = time.monotonic() + agent._get_max_task_duration(task.task_type)
+        lease_duration = await asyncio.to_thread(agent.task_queue.get_lease_duration, task.task_type)
+        try:
+            while not job.done():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    agent.log("Stuck. Cancelling the task.", level = "error")
+                    job.cancel()
+                    await asyncio.to_thread(agent._reset_task, task)
+                    return
+
+                if lease_duration is not None:
+                    remaining = min(remaining, lease_duration/3)
+                await asyncio.wait([job], timeout=remaining)
+
+                if not job.done() and not await asyncio.to_thread(agent.task_queue.renew_lease, task.task_id, task.fencing_token):
+                    agent.log("Lost the lease of the task. Cancelling the task.", level = "error")
+                    job.cancel()
+                    if agent.task is task:
+                        agent.task = None
+                    return
+        except asyncio.CancelledError:
+            job.cancel()
+            await asyncio.to_thread(agent._reset_task, task)
+            raise
+
+        if not job.cancelled() and job.exception() is None and job.result():
+            await asyncio.to_thread(agent._submit_complete_task, task)
+        else:
+            await asyncio.to_thread(agent._reset_task, task)
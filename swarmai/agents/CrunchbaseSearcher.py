@@ -1,5 +1,5 @@
 from swarmai.agents.AgentBase import AgentBase
-from swarmai.utils.ai_engines import LanchainGoogleEngine, GPTConversEngine
+from swarmai.utils.ai_engines import LanchainGoogleEngine, GPTConversEngine, EnginePool
 from swarmai.utils.task_queue.Task import Task
 from swarmai.utils.PromptFactory import PromptFactory
 from langchain.utilities import ApifyWrapper
@@ -10,14 +10,14 @@ class CrunchbaseSearcher(AgentBase):
 
     def __init__(self, agent_id, agent_type, swarm, logger):
         super().__init__(agent_id, agent_type, swarm, logger)
-        self.search_engine = LanchainGoogleEngine("gpt-3.5-turbo", 0.5, 1000)
-        self.thinking_engine = GPTConversEngine("gpt-3.5-turbo", 0.5, 1000)
+        self.search_engine = EnginePool.get(LanchainGoogleEngine, "gpt-3.5-turbo", 0.5, 1000)
+        self.thinking_engine = EnginePool.get(GPTConversEngine, "gpt-3.5-turbo", 0.5, 1000)
         
         self.TASK_METHODS = {
             Task.TaskTypes.crunchbase_search: self.domain_specific_search,
         }
 
-        self.apify_engine = ApifyWrapper()
+        self.apify_engine = EnginePool.get(ApifyWrapper)
 
     def perform_task(self):
         self.step = "perform_task"
@@ -1,5 +1,6 @@
 from swarmai.agents.AgentBase import AgentBase
 from swarmai.utils.ai_engines.GPTConversEngine import GPTConversEngine
+from swarmai.utils.ai_engines.EnginePool import EnginePool
 from swarmai.utils.task_queue.Task import Task
 from swarmai.utils.PromptFactory import PromptFactory
 
@@ -9,7 +10,7 @@ class GeneralPurposeAgent(AgentBase):
 
     def __init__(self, agent_id, agent_type, swarm, logger):
         super().__init__(agent_id, agent_type, swarm, logger)
-        self.engine = GPTConversEngine("gpt-3.5-turbo", 0.5, 1000)
+        self.engine = EnginePool.get(GPTConversEngine, "gpt-3.5-turbo", 0.5, 1000)
         
         self.TASK_METHODS = {}
         for method in self.swarm.TASK_TYPES:
@@ -19,25 +20,50 @@ class GeneralPurposeAgent(AgentBase):
     def perform_task(self):
         self.step = "perform_task"
         try:
-            # self.task is already taken in the beginning of the cycle in AgentBase
-            if not isinstance(self.task, Task):
-                raise Exception(f"Task is not of type Task, but {type(self.task)}")
-            
-            task_type = self.task.task_type
-            if task_type not in self.TASK_METHODS:
-                raise Exception(f"Task type {task_type} is not supported by the agent {self.agent_id} of type {self.agent_type}")
-            
-            self.result = self.TASK_METHODS[task_type](self.task.task_description)
+            self._check_task()
+            self.result = self.TASK_METHODS[self.task.task_type](self.task.task_description)
             return True
         except Exception as e:
             self.log(f"Agent {self.agent_id} of type {self.agent_type} failed to perform the task {self.task.task_description} with error {e}", level = "error")
             return False
 
+    async def aperform_task(self):
+        """Same as perform_task, but the model is called without blocking the event loop. All the task types map to _think.
+        """
+        self.step = "perform_task"
+        try:
+            self._check_task()
+            self.result = await self._athink(self.task.task_description)
+            return True
+        except Exception as e:
+            self.log(f"Agent {self.agent_id} of type {self.agent_type} failed to perform the task {self.task.task_description} with error {e}", level = "error")
+            return False
+
+    def _check_task(self):
+        # self.task is already taken in the beginning of the cycle in AgentBase
+        if not isinstance(self.task, Task):
+            raise Exception(f"Task is not of type Task, but {type(self.task)}")
+
+        task_type = self.task.task_type
+        if task_type not in self.TASK_METHODS:
+            raise Exception(f"Task type {task_type} is not supported by the agent {self.agent_id} of type {self.agent_type}")
+
     def share(self):
         pass
 
     def _think(self, task_description):
         self.step = "think"
+        result = self.engine.call_model(self._think_conversation(task_description))
+        self._share_thought(task_description, result)
+        return result
+
+    async def _athink(self, task_description):
+        self.step = "think"
+        result = await self.engine.acall_model(self._think_conversation(task_description))
+        self._share_thought(task_description, result)
+        return result
+
+    def _think_conversation(self, task_description):
         prompt = (
             "Act as an analyst and worker."
             f"You need to perform a task: {task_description}. The type of the task is {self.task.task_type}."
@@ -48,10 +74,9 @@ class GeneralPurposeAgent(AgentBase):
         conversation = [
             {"role": "user", "content": prompt}
         ]
+        return conversation
 
-        result = self.engine.call_model(conversation)
-
+    def _share_thought(self, task_description, result):
         # add to shared memory
         self._send_data_to_swarm(result)
         self.log(f"Agent {self.agent_id} of type {self.agent_type} thought about the task:\n{task_description}\n\nand shared the following result:\n{result}", level = "info")
-        return result
@@ -1,5 +1,5 @@
 from swarmai.agents.AgentBase import AgentBase
-from swarmai.utils.ai_engines import LanchainGoogleEngine, GPTConversEngine
+from swarmai.utils.ai_engines import LanchainGoogleEngine, GPTConversEngine, EnginePool
 from swarmai.utils.task_queue.Task import Task
 from swarmai.utils.PromptFactory import PromptFactory
 
@@ -9,8 +9,8 @@ class GooglerAgent(AgentBase):
 
     def __init__(self, agent_id, agent_type, swarm, logger):
         super().__init__(agent_id, agent_type, swarm, logger)
-        self.search_engine = LanchainGoogleEngine("gpt-3.5-turbo", 0.5, 1000)
-        self.thinking_engine = GPTConversEngine("gpt-3.5-turbo", 0.5, 1000)
+        self.search_engine = EnginePool.get(LanchainGoogleEngine, "gpt-3.5-turbo", 0.5, 1000)
+        self.thinking_engine = EnginePool.get(GPTConversEngine, "gpt-3.5-turbo", 0.5, 1000)
         
         self.TASK_METHODS = {
             Task.TaskTypes.google_search: self.google,
@@ -57,15 +57,25 @@ class GooglerAgent(AgentBase):
         )
         conversation = [
             {"role": "system", "content": system_prompt},
-            {"role": "user", "content": summarisation_prompt + f"Search Results:\n{result}"},
+            {"role": "user", "content": f"Search Results:\n{result}"},
         ]
-        result = self.thinking_engine.call_model(conversation)
+        # the summary is saved to the shared memory chunk by chunk while it's generated
+        chunk_size = getattr(self.shared_memory, "chunk_size", 1000)
+        result = ""
+        pending = ""
+        for delta in self.thinking_engine.stream_model(conversation, instruction=summarisation_prompt):
+            result += delta
+            pending += delta
+            while len(pending) >= chunk_size:
+                # cut at the last whitespace, so that no word is split between the chunks
+                cut = pending.rfind(" ", 0, chunk_size) + 1 or chunk_size
+                self._send_data_to_swarm(pending[:cut])
+                pending = pending[cut:]
+        if pending.strip():
+            self._send_data_to_swarm(pending)
 
         self.log(message = f"Agent {self.agent_id} of type {self.agent_type} googled:\n{task_description}\n\nand got:\n{result}", level = "info")
 
-        # saving to the shared memory
-        self._send_data_to_swarm(result)
-
         return result
 
         
\ No newline at end of file
@@ -3,9 +3,11 @@ import openai
 import re
 import random
 import json
+from concurrent.futures import ThreadPoolExecutor
 
 from swarmai.agents.AgentBase import AgentBase
 from swarmai.utils.ai_engines.GPTConversEngine import GPTConversEngine
+from swarmai.utils.ai_engines.EnginePool import EnginePool
 from swarmai.utils.task_queue.Task import Task
 from swarmai.utils.PromptFactory import PromptFactory
 
@@ -15,7 +17,7 @@ class ManagerAgent(AgentBase):
 
     def __init__(self, agent_id, agent_type, swarm, logger):
         super().__init__(agent_id, agent_type, swarm, logger)
-        self.engine = GPTConversEngine("gpt-3.5-turbo", 0.25, 2000)
+        self.engine = EnginePool.get(GPTConversEngine, "gpt-3.5-turbo", 0.25, 2000)
         
         self.TASK_METHODS = {
             Task.TaskTypes.report_preparation: self.report_preparation,
@@ -54,11 +56,12 @@ class ManagerAgent(AgentBase):
                 else:
                     it adds the task to the task queue
 
-                Finally: resets the report preparation task
+                Finally: resets the report preparation task. It only runs again once the searches for the missing information completed.
         """
         global_goal = self.swarm.global_goal
         goals = self.swarm.goals.copy()
         random.shuffle(goals)
+        search_task_ids = []
 
         for _, goal in enumerate(goals):
             idx = self.swarm.goals.index(goal)
@@ -71,9 +74,9 @@ class ManagerAgent(AgentBase):
                 prev_answer = ""
 
             missing_information_list = self._analyse_report(global_goal, goal, prev_answer)
-                
-            for el in missing_information_list:
-                self._add_subtasks_to_task_queue([('google_search', f"For the purpose of {goal}, find information about {el}", 50)])
+            task_ids = self._add_subtasks_to_task_queue([('google_search', f"For the purpose of {goal}, find information about {el}", 50) for el in missing_information_list])
+            # near-duplicates rejected by the task queue have no id
+            search_task_ids += [task_id for task_id in task_ids or [] if task_id is not None]
 
             # update the report
             info_from_memory = self.shared_memory.ask_question(f"For the purpose of {global_goal}, try to find information about {goal}. Summarise it shortly and indclude web-lins of sources. Be an extremely critical analyst!.") 
@@ -81,16 +84,17 @@ class ManagerAgent(AgentBase):
                 info_from_memory = ""
             conversation = [
                 {"role": "system", "content": PromptFactory.StandardPrompts.summarisation_for_task_prompt },
-                {"role": "user", "content": info_from_memory + prev_answer + f"\nUsing all the info above answer the question:\n{goal}\n"},
+                {"role": "user", "content": info_from_memory + "\n\n" + prev_answer},
             ]
-            summary = self.engine.call_model(conversation)
+            # the context is packed by relevance to the question, the question itself is never truncated
+            summary = self.engine.call_model(conversation, instruction=f"Using all the info above answer the question:\n{goal}\n")
 
             # add to the report
             report_json = self._get_report_json()
             report_json[idx] = {"Question": goal, "Answer": summary}
             self.swarm.interact_with_output(json.dumps(report_json), method="write")
 
-        self.swarm.create_report_qa_task()
+        self.swarm.create_report_qa_task(depends_on=search_task_ids)
 
     def _get_report_json(self):
         report = self.swarm.interact_with_output("",  method="read")
@@ -171,43 +175,14 @@ class ManagerAgent(AgentBase):
             {"role": "user", "content": task_prompt}
         ]
 
-        result = self.engine.call_model(conversation)
-        result = result.replace("\n", "").replace("\r", "").replace("\t", "").strip()
-
-        # parse the result
-
-        # first, find the substring enclosed in [[]]
-        subtasks_str = re.search(r"\[.*\]", result)
-        try:
-            subtasks_str = subtasks_str.group(0)
-        except:
-            raise Exception(f"Failed to parse the result {result}")
-
-        # then, find all substrings enclosed in ()
-        subtasks = []
-        for subtask_str_i in re.findall(r"\(.*?\)", subtasks_str):
-            subtask_str_i = subtask_str_i.replace("(", "").replace(")", "").replace("[", "").replace("]", "").replace("'", "").strip()
-            result_split = subtask_str_i.split(";")
-
-            try:
-                subtask_type = result_split[0].strip()
-            except:
-                continue
-
-            try:
-                subtask_description = result_split[1].strip()
-            except:
-                continue
-
-            try:
-                prio_int = int(result_split[2].strip())
-            except:
-                prio_int = 0
-
-            subtasks.append((subtask_type.strip(), subtask_description.strip(), prio_int))
-
-        # add subtasks to the task queue
-        self._add_subtasks_to_task_queue(subtasks)
+        # the summary of the global task only needs the task itself, so it's generated while the breakdown streams in
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            task_summary = executor.submit(self._summarise_global_task, main_task_description)
+            subtasks = []
+            for subtask in self._stream_subtasks(conversation):
+                # every subtask is in the task queue as soon as its tuple is parsed, the agents don't wait for the whole breakdown
+                self._add_subtasks_to_task_queue([subtask], task_summary=task_summary.result())
+                subtasks.append(subtask)
 
         # add to shared memory
         self.log(
@@ -218,24 +193,91 @@ class ManagerAgent(AgentBase):
         # )
         return subtasks
 
-    def _add_subtasks_to_task_queue(self, subtask_list: list):
-        if len(subtask_list) == 0:
-            return
+    def _stream_subtasks(self, conversation):
+        """Streams the breakdown from the model and yields the subtasks (type, description, priority)
+        as soon as their tuples are complete in the output: [[(subtask_type; subtask_description; priority), ...]]
+        """
+        result = ""
+        parsed_until = None # position after the last parsed tuple, None until the list started
+        scan_from = 0 # position from which the closing ")" of the tuple in progress is looked for, every delta is scanned once
+        list_closed = False
+        for delta in self.engine.stream_model(conversation):
+            if list_closed:
+                # the rest of the stream is still read, so that the complete response is cached
+                continue
+            result += delta.replace("\n", "").replace("\r", "").replace("\t", "")
+            if parsed_until is None:
+                list_start = result.find("[", scan_from)
+                if list_start == -1:
+                    scan_from = len(result)
+                    continue
+                parsed_until = scan_from = list_start
+
+            while True:
+                tuple_start = result.find("(", parsed_until)
+                # a "]" between the tuples closes the list, the text after it is not parsed
+                if result.find("]", parsed_until, len(result) if tuple_start == -1 else tuple_start) != -1:
+                    list_closed = True
+                    break
+                if tuple_start == -1:
+                    break
+                tuple_end = result.find(")", max(tuple_start, scan_from))
+                if tuple_end == -1:
+                    scan_from = len(result)
+                    break
+                subtask = self._parse_subtask(result[tuple_start:tuple_end + 1])
+                if subtask is not None:
+                    yield subtask
+                parsed_until = scan_from = tuple_end + 1
+
+        if parsed_until is None:
+            raise Exception(f"Failed to parse the result {result.strip()}")
+
+    def _parse_subtask(self, subtask_str):
+        """Parses one '(subtask_type; subtask_description; priority)' tuple, None if it's not a valid subtask.
+        """
+        subtask_str = subtask_str.replace("(", "").replace(")", "").replace("[", "").replace("]", "").replace("'", "").strip()
+        result_split = subtask_str.split(";")
+        if len(result_split) < 2:
+            return None
+        subtask_type = result_split[0].strip()
+        subtask_description = result_split[1].strip()
 
-        self.step = "_add_subtasks_to_task_queue"
+        try:
+            prio_int = int(result_split[2].strip())
+        except:
+            prio_int = 0
+        return (subtask_type, subtask_description, prio_int)
+
+    def _summarise_global_task(self, task_description):
         summary_conversation = [
             {"role": "system", "content": "Be very concise and precise when summarising the global task. Focus on the most important aspects of the global task to guide the model in performing a given subtask. Don't mention any subtasks but only the main mission as a guide."},
-            {"role": "user", "content": f"""Global Task:\n{self.task.task_description}\nSubtasks:\n{"||".join([x[1] for x in subtask_list])}\nSummary of the global task:"""},
+            {"role": "user", "content": f"""Global Task:\n{task_description}\nSummary of the global task:"""},
         ]
-        task_summary = self.engine.call_model(summary_conversation)
+        return self.engine.call_model(summary_conversation)
+
+    def _add_subtasks_to_task_queue(self, subtask_list: list, task_summary=None):
+        """Adds the subtasks to the task queue in one batch, prefixed with the summary of the global task (of the current task if not given).
+        """
+        if len(subtask_list) == 0:
+            return
+
+        self.step = "_add_subtasks_to_task_queue"
+        if task_summary is None:
+            task_summary = self._summarise_global_task(self.task.task_description)
+        tasks = []
         for task_i in subtask_list:
-            try:
-                # generating a task object
-                taks_obj_i = Task(
-                    priority=task_i[2],
-                    task_type=task_i[0],
-                    task_description=f"""For the purpose of '{task_summary}' Perform ONLY the following task: {task_i[1]}""",
-                )
-                self.swarm.task_queue.add_task(taks_obj_i)
-            except:
+            # the model sometimes comes up with its own task types, they would make the whole batch invalid
+            if task_i[0] not in self.swarm.TASK_TYPES or task_i[1] == "":
                 continue
+            # generating a task object
+            taks_obj_i = Task(
+                priority=task_i[2],
+                task_type=task_i[0],
+                task_description=f"""For the purpose of '{task_summary}' Perform ONLY the following task: {task_i[1]}""",
+                dedup_text=task_i[1], # the summary prefix is shared by all the subtasks, so it's not used for the deduplication
+            )
+            tasks.append(taks_obj_i)
+
+        # one locked insert for the whole list
+        return self.swarm.task_queue.add_tasks(tasks)
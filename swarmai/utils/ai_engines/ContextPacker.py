@@ -0,0 +1,129 @@
+import re
+import math
+from collections import Counter
+
+STOPWORDS = set((
+    "a an and are as at be by for from has have in is it its of on or that the this to was were will with "
+    "about above all any can do does how if into more most no not only other our should so such than their them "
+    "then there these they what when where which who why you your using answer question info information"
+).split())
+
+def _terms(text):
+    return [t for t in re.findall(r"\w+", text.lower()) if t not in STOPWORDS and len(t) > 1]
+
+def append_instruction(conversation, instruction):
+    """Returns the conversation with the instruction at the end of the last user message, or in a new user message.
+    """
+    conversation = [dict(message) for message in conversation]
+    if len(conversation) > 0 and conversation[-1]["role"] == "user":
+        conversation[-1]["content"] += "\n" + instruction
+    else:
+        conversation.append({"role": "user", "content": instruction})
+    return conversation
+
+class ContextPacker:
+    """Fits the context of a call into the token budget by relevance instead of keeping the head of every message.
+
+    A context that fits into the budget is returned as it is. Otherwise the context (all the non-system messages) is split into
+    segments: paragraphs, and sentences or word windows for the long ones. The segments are scored with BM25 against the instruction
+    and taken in the order of the score until the budget is full, then put back in their original order.
+    The engine appends the instruction after packing (append_instruction), so the instruction itself is never truncated.
+
+    Optional (swarm.context_packing), used by the engines when call_model gets an instruction, e.g.:
+        engine.call_model([system_message, {"role": "user", "content": memory + previous_answer}], instruction=question)
+    """
+
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self, max_context_tokens=None, max_segment_tokens=200):
+        """
+        Args:
+            - max_context_tokens (int): max tokens of the packed context, e.g. to cut the cost and latency of the calls.
+                The context window of the model (minus the system messages and the instruction) if None
+            - max_segment_tokens (int): paragraphs longer than this are split into sentences
+        """
+        self.max_context_tokens = max_context_tokens
+        self.max_segment_tokens = max_segment_tokens
+
+    def pack(self, engine, conversation, instruction):
+        """Returns the conversation with the most relevant context that fits into the budget, without the instruction.
+        """
+        if isinstance(conversation, str):
+            conversation = [{"role": "user", "content": conversation}]
+
+        fixed_tokens = engine.count_tokens(instruction) + sum(engine.count_tokens(m["content"]) for m in conversation if m["role"] == "system")
+        # _prepare_conversation of the engines reserves 100 tokens per message
+        budget = max(0, engine.max_input_length() - fixed_tokens - 100 * (len(conversation) + 1))
+        if self.max_context_tokens is not None:
+            budget = min(budget, self.max_context_tokens)
+
+        if sum(engine.count_tokens(m["content"]) for m in conversation if m["role"] != "system") <= budget:
+            return [dict(message) for message in conversation]
+
+        segments = [] # (message index, segment index, text, tokens)
+        for i, message in enumerate(conversation):
+            if message["role"] != "system":
+                for j, text in enumerate(self.split(engine, message["content"])):
+                    segments.append((i, j, text, engine.count_tokens(text)))
+
+        selected = set()
+        used = 0
+        for k in self._rank([s[2] for s in segments], instruction):
+            if used + segments[k][3] <= budget:
+                selected.add(k)
+                used += segments[k][3]
+
+        packed = []
+        for i, message in enumerate(conversation):
+            if message["role"] == "system":
+                packed.append(dict(message))
+                continue
+            content = "\n".join(s[2] for k, s in enumerate(segments) if s[0] == i and k in selected)
+            if content:
+                packed.append({**message, "content": content})
+        return packed
+
+    def split(self, engine, text):
+        """Splits the text into paragraphs, the paragraphs longer than max_segment_tokens into sentences, and those into word windows.
+        """
+        segments = []
+        for paragraph in re.split(r"\n\s*\n|\n", text):
+            paragraph = paragraph.strip()
+            if not paragraph:
+                continue
+            if engine.count_tokens(paragraph) <= self.max_segment_tokens:
+                segments.append(paragraph)
+                continue
+            for sentence in re.split(r"(?<=[.!?])\s+", paragraph):
+                if engine.count_tokens(sentence) <= self.max_segment_tokens:
+                    segments.append(sentence)
+                    continue
+                words = sentence.split()
+                # ~0.75 words per token
+                window = max(1, self.max_segment_tokens * 3 // 4)
+                segments += [" ".join(words[w:w + window]) for w in range(0, len(words), window)]
+        return segments
+
+    def _rank(self, texts, instruction):
+        """Indices of the texts by decreasing BM25 score against the instruction, ties in the original order.
+        """
+        query = set(_terms(instruction))
+        documents = [Counter(_terms(text)) for text in texts]
+        if len(documents) == 0:
+            return []
+        avg_length = sum(sum(d.values()) for d in documents) / len(documents) or 1
+        document_frequency = Counter(term for d in documents for term in d if term in query)
+
+        scores = []
+        for d in documents:
+            length = sum(d.values())
+            score = 0.0
+            for term in query:
+                tf = d.get(term, 0)
+                if tf == 0:
+                    continue
+                idf = math.log(1 + (len(documents) - document_frequency[term] + 0.5) / (document_frequency[term] + 0.5))
+                score += idf * tf * (self.K1 + 1) / (tf + self.K1 * (1 - self.B + self.B * length / avg_length))
+            scores.append(score)
+        return sorted(range(len(texts)), key=lambda k: (-scores[k], k))
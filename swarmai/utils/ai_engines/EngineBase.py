@@ -1,9 +1,43 @@
+import array
+import asyncio
+import functools
+import contextvars
 from abc import ABC, abstractmethod
 
+from swarmai.utils.ai_engines.SingleFlight import SingleFlight
+
+# type of the task the agent is performing, set by the agents around perform_task (threads and coroutines).
+# Engines that pick the model per task type (RoutingEngine) read it
+current_task_type = contextvars.ContextVar("current_task_type", default=None)
+
+# longer texts (search results, memory dumps) are mostly unique, caching them would only evict the recurring prompts
+MAX_CACHED_TEXT_LENGTH = 20000
+
+@functools.lru_cache(maxsize=1024)
+def _encode_cached(encoding, text):
+    # compact array of uint32 instead of a list of python ints, ~4 bytes per token
+    return array.array("I", encoding.encode(text))
+
+def encode(encoding, text):
+    """Encodes the text with the tiktoken encoding. Recurring texts (prompt templates, the global goal, ...) are encoded only once per process.
+    """
+    if len(text) > MAX_CACHED_TEXT_LENGTH:
+        return encoding.encode(text)
+    return _encode_cached(encoding, text)
+
 class EngineBase(ABC):
     """Abstract base class for the AI engines.
     Engines define the API for the AI engines that can be used in the swarm.
+
+    response_cache (ResponseCache) is shared by all the engines of the process, the Swarm sets it from the config (swarm.llm_cache).
+    single_flight (SingleFlight) coalesces the identical calls of all the engines that are in flight at the same time, None to disable it.
+    context_packer (ContextPacker) fits the context of the calls with an instruction into the token budget by relevance, set from the config
+    (swarm.context_packing). None (default) keeps the head of every message.
     """
+
+    response_cache = None
+    single_flight = SingleFlight()
+    context_packer = None
     
     TOKEN_LIMITS = {
         "gpt-4": 16*1024,
@@ -38,6 +72,24 @@ class EngineBase(ABC):
         """
         raise NotImplementedError
 
+    async def acall_model(self, conversation: list, **kwargs) -> str:
+        """Coroutine version of call_model, so that one event loop can keep many calls in flight (see AsyncAgentRuntime).
+        By default runs call_model in a worker thread, engines with an async client should override it.
+        """
+        return await asyncio.to_thread(self.call_model, conversation, **kwargs)
+
+    def stream_model(self, conversation: list, **kwargs):
+        """Same as call_model, but yields the response in pieces (str) as they are generated,
+        so that the consumers can start before the whole response is ready. "".join of the pieces is the response.
+        By default yields the whole response of call_model once, engines with a streaming api should override it.
+        """
+        yield self.call_model(conversation, **kwargs)
+
+    async def astream_model(self, conversation: list, **kwargs):
+        """Async generator version of stream_model.
+        """
+        yield await self.acall_model(conversation, **kwargs)
+
     @abstractmethod
     def max_input_length(self) -> int:
         """Returns the maximum length of the input to the model.
@@ -61,15 +113,26 @@ class EngineBase(ABC):
         """
         return self.TOKEN_LIMITS[self.model_name]-self.max_response_tokens
     
+    def count_tokens(self, message) -> int:
+        """Number of tokens of the message, without truncation.
+        """
+        return len(encode(self.tiktoken_encoding, message))
+
     def truncate_message(self, message, token_limit=None):
         """Truncates the message using tiktoken"""
+        return self.truncate_message_with_count(message, token_limit)[0]
+
+    def truncate_message_with_count(self, message, token_limit=None):
+        """Truncates the message using tiktoken and returns it with its number of tokens, so that the message is encoded only once.
+        """
         max_tokens = self.max_input_length()
-        message_tokens = self.tiktoken_encoding.encode(message)
+        message_tokens = encode(self.tiktoken_encoding, message)
 
         if token_limit is not None:
             max_tokens = min(max_tokens, token_limit)
 
         if len(message_tokens) <= max_tokens:
-            return message
+            return message, len(message_tokens)
         else:
-            return self.tiktoken_encoding.decode(message_tokens[:max_tokens])
\ No newline at end of file
+            max_tokens = max(max_tokens, 0)
+            return self.tiktoken_encoding.decode(list(message_tokens[:max_tokens])), max_tokens
\ No newline at end of file
@@ -0,0 +1,66 @@
+import threading
+
+class EnginePool:
+    """Process-wide registry of the engines, keyed by the engine class and its constructor arguments.
+    Agents borrow the engines instead of constructing their own, so every client (tiktoken encoding, LangChain agent, LLM wrapper)
+    is created once per configuration and the swarm startup doesn't grow with the number of agents.
+
+    The engines must be safe to share between threads: GPTConversEngine keeps no state between the calls,
+    LanchainGoogleEngine lends its google clients from a pool to one call at a time.
+
+    Example:
+        engine = EnginePool.get(GPTConversEngine, "gpt-3.5-turbo", 0.25, 2000)
+    """
+
+    _engines = {}
+    _lock = threading.Lock()
+    _key_locks = {}
+    _substitutes = {}
+
+    @classmethod
+    def get(cls, engine_class, *args, **kwargs):
+        """Returns the shared engine_class(*args, **kwargs), creating it on the first call.
+        Concurrent first calls with the same key wait for one construction, calls with other keys are not blocked by it.
+        """
+        engine_class = cls.resolve(engine_class)
+        key = (engine_class, args, tuple(sorted(kwargs.items())))
+        with cls._lock:
+            if key in cls._engines:
+                return cls._engines[key]
+            key_lock = cls._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with cls._lock:
+                if key in cls._engines:
+                    return cls._engines[key]
+            engine = engine_class(*args, **kwargs)
+            with cls._lock:
+                cls._engines[key] = engine
+                del cls._key_locks[key]
+            return engine
+
+    @classmethod
+    def substitute(cls, substitutes: dict):
+        """Replaces engine classes by others with the same constructor, e.g. by the simulated engines for the load tests:
+        {GPTConversEngine: SimulatedEngine}. Adds to the previous substitutes and clears the pool.
+        """
+        with cls._lock:
+            cls._substitutes = {**cls._substitutes, **substitutes}
+            cls._engines = {}
+
+    @classmethod
+    def resolve(cls, engine_class):
+        """Returns the class that EnginePool.get constructs for engine_class.
+        """
+        with cls._lock:
+            return cls._substitutes.get(engine_class, engine_class)
+
+    @classmethod
+    def size(cls) -> int:
+        with cls._lock:
+            return len(cls._engines)
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._engines = {}
@@ -3,11 +3,21 @@ import openai
 import tiktoken
 
 from swarmai.utils.ai_engines.EngineBase import EngineBase
+from swarmai.utils.ai_engines.RateLimiter import RateLimiter, RetryPolicy
+from swarmai.utils.ai_engines.ResponseCache import ResponseCache
+from swarmai.utils.ai_engines.ContextPacker import append_instruction
 
 class GPTConversEngine(EngineBase):
     """
     gpt-4, gpt-4-0314, gpt-4-32k, gpt-4-32k-0314, gpt-3.5-turbo, gpt-3.5-turbo-0301
+
+    All the calls of the process to a model go through its RateLimiter (requests and tokens per minute),
+    retryable api errors are retried with the retry_policy, and the error is raised if the retries are exhausted.
+    Identical calls (model, parameters and conversation) that are in flight at the same time are sent only once (EngineBase.single_flight).
+    Calls with an instruction get their context packed by relevance (EngineBase.context_packer, if set) and the instruction appended untruncated.
     """
+    retry_policy = RetryPolicy()
+
     SUPPORTED_MODELS = [
         "gpt-4",
         "gpt-4-0314",
@@ -30,7 +40,7 @@ class GPTConversEngine(EngineBase):
         openai.api_key = os.getenv("OPENAI_API_KEY")
         self.tiktoken_encoding = tiktoken.encoding_for_model(model_name)
 
-    def call_model(self, conversation, max_tokens=None, temperature=None) -> str:
+    def call_model(self, conversation, max_tokens=None, temperature=None, request_timeout=None, instruction=None) -> str:
         """Calls the gpt-3.5 or gpt-4 model to generate a response to a conversation.
 
         Args:
@@ -39,33 +49,187 @@ class GPTConversEngine(EngineBase):
                     {"role": "system", "content": configuration_prompt},
                     {"role": "user", "content": prompt}
                 ]
+            request_timeout (float): seconds to wait for the response, the default of openai if None
+            instruction (str): the task of the call, e.g. the question to answer from the context in the conversation.
+                If set, the context is packed by relevance to the instruction (see ContextPacker) instead of truncated,
+                and the instruction is appended to the last user message
+
+        Raises:
+            openai.error.OpenAIError: if the api call failed, after the retries for the retryable errors
+        """
+        if max_tokens is None:
+            max_tokens = self.max_response_tokens
+        if temperature is None:
+            temperature = self.temperature
+        conversation, prompt_tokens = self._prepare_conversation(conversation, instruction)
+
+        request_key = ResponseCache.key(self.model_name, temperature, max_tokens, conversation)
+        cached = self._cached_response(request_key, temperature)
+        if cached is not None:
+            return cached
+
+        def create():
+            rate_limiter = RateLimiter.get(self.model_name)
+            if rate_limiter is not None:
+                rate_limiter.wait(prompt_tokens + max_tokens)
+            return self._create(model=self.model_name, messages=conversation, max_tokens=max_tokens, temperature=temperature, n=1, request_timeout=request_timeout)
+
+        def request():
+            response = self.retry_policy.call(create)
+            return self._cache_response(request_key, temperature, response["choices"][0]["message"]["content"])
+
+        if self.single_flight is None:
+            return request()
+        return self.single_flight.call(request_key, request)
+
+    async def acall_model(self, conversation, max_tokens=None, temperature=None, request_timeout=None, instruction=None) -> str:
+        """Same as call_model, but doesn't block the event loop while waiting for the api (openai.ChatCompletion.acreate).
+        The HTTP session is taken from openai.aiosession if set, e.g. the shared session of the AsyncAgentRuntime.
         """
         if max_tokens is None:
             max_tokens = self.max_response_tokens
         if temperature is None:
             temperature = self.temperature
+        conversation, prompt_tokens = self._prepare_conversation(conversation, instruction)
+
+        request_key = ResponseCache.key(self.model_name, temperature, max_tokens, conversation)
+        cached = self._cached_response(request_key, temperature)
+        if cached is not None:
+            return cached
+
+        async def acreate():
+            rate_limiter = RateLimiter.get(self.model_name)
+            if rate_limiter is not None:
+                await rate_limiter.wait_async(prompt_tokens + max_tokens)
+            return await self._acreate(model=self.model_name, messages=conversation, max_tokens=max_tokens, temperature=temperature, n=1, request_timeout=request_timeout)
+
+        async def arequest():
+            response = await self.retry_policy.call_async(acreate)
+            return self._cache_response(request_key, temperature, response["choices"][0]["message"]["content"])
+
+        if self.single_flight is None:
+            return await arequest()
+        return await self.single_flight.call_async(request_key, arequest)
+
+    def stream_model(self, conversation, max_tokens=None, temperature=None, instruction=None):
+        """Streams the response of the model (openai stream=True), yields the content deltas as they arrive.
+        The rate limiter and the retries apply to opening the stream: once a delta was yielded, an error is raised to the consumer
+        instead of retrying, because the consumer has already used the first part of the response.
+        Cached responses are yielded at once, streamed responses are cached when complete. Streams are not coalesced.
+        """
+        if max_tokens is None:
+            max_tokens = self.max_response_tokens
+        if temperature is None:
+            temperature = self.temperature
+        conversation, prompt_tokens = self._prepare_conversation(conversation, instruction)
+
+        request_key = ResponseCache.key(self.model_name, temperature, max_tokens, conversation)
+        cached = self._cached_response(request_key, temperature)
+        if cached is not None:
+            yield cached
+            return
+
+        def create():
+            rate_limiter = RateLimiter.get(self.model_name)
+            if rate_limiter is not None:
+                rate_limiter.wait(prompt_tokens + max_tokens)
+            return self._create(model=self.model_name, messages=conversation, max_tokens=max_tokens, temperature=temperature, n=1, stream=True)
 
+        response = []
+        for chunk in self.retry_policy.call(create):
+            delta = chunk["choices"][0]["delta"].get("content")
+            if delta:
+                response.append(delta)
+                yield delta
+        self._cache_response(request_key, temperature, "".join(response))
+
+    async def astream_model(self, conversation, max_tokens=None, temperature=None, instruction=None):
+        """Async generator version of stream_model (openai.ChatCompletion.acreate with stream=True).
+        """
+        if max_tokens is None:
+            max_tokens = self.max_response_tokens
+        if temperature is None:
+            temperature = self.temperature
+        conversation, prompt_tokens = self._prepare_conversation(conversation, instruction)
+
+        request_key = ResponseCache.key(self.model_name, temperature, max_tokens, conversation)
+        cached = self._cached_response(request_key, temperature)
+        if cached is not None:
+            yield cached
+            return
+
+        async def acreate():
+            rate_limiter = RateLimiter.get(self.model_name)
+            if rate_limiter is not None:
+                await rate_limiter.wait_async(prompt_tokens + max_tokens)
+            return await self._acreate(model=self.model_name, messages=conversation, max_tokens=max_tokens, temperature=temperature, n=1, stream=True)
+
+        response = []
+        async for chunk in await self.retry_policy.call_async(acreate):
+            delta = chunk["choices"][0]["delta"].get("content")
+            if delta:
+                response.append(delta)
+                yield delta
+        self._cache_response(request_key, temperature, "".join(response))
+
+    def _create(self, **params):
+        """The api call itself, overridden by the SimulatedEngine.
+        """
+        return openai.ChatCompletion.create(**params)
+
+    async def _acreate(self, **params):
+        return await openai.ChatCompletion.acreate(**params)
+
+    def _uses_cache(self, temperature) -> bool:
+        return self.response_cache is not None and self.response_cache.applies_to(temperature)
+
+    def _cached_response(self, request_key, temperature):
+        """Returns the cached response of the call, None if there is no cache, the call is not cached or not in the cache yet.
+        """
+        if not self._uses_cache(temperature):
+            return None
+        return self.response_cache.get(request_key)
+
+    def _cache_response(self, request_key, temperature, response):
+        # empty responses are not cached, the next call should try again
+        if response and self._uses_cache(temperature):
+            self.response_cache.set(request_key, response)
+        return response
+
+    def _prepare_conversation(self, conversation, instruction=None):
+        """Validates the conversation and truncates the messages to fit into the context of the model.
+        With an instruction, the context is packed by the context_packer first (if there is one), truncated to leave room
+        for the instruction, and the instruction is appended untruncated.
+
+        Returns:
+            - conversation (list[dict]): the truncated conversation
+            - total_len (int): number of tokens of the messages
+        """
         if isinstance(conversation, str):
             conversation = [{"role": "user", "content": conversation}]
 
-        if len(conversation) == 0:
+        if len(conversation) == 0 and instruction is None:
             raise ValueError("Conversation must have at least one message of format: [{'role': 'user', 'content': 'message'}]")
         
-        total_len = 0
         for message in conversation:
             if "role" not in message:
                 raise ValueError("Conversation messages must have a format: {'role': 'user', 'content': 'message'}. 'role' is missing.")
             if "content" not in message:
                 raise ValueError("Conversation messages must have a format: {'role': 'user', 'content': 'message'}. 'content' is missing.")
-            message["content"] = self.truncate_message(message["content"], self.max_input_length()-total_len-100)
-            new_message_len = len(self.tiktoken_encoding.encode(message["content"]))
+        total_len = 0
+        if instruction is not None:
+            total_len = self.count_tokens(instruction)
+            if self.context_packer is not None:
+                conversation = self.context_packer.pack(self, conversation, instruction)
+            else:
+                conversation = [dict(message) for message in conversation]
+
+        for message in conversation:
+            message["content"], new_message_len = self.truncate_message_with_count(message["content"], self.max_input_length()-total_len-100)
             total_len += new_message_len
-        
-        try:
-            response = openai.ChatCompletion.create(model=self.model_name, messages=conversation, max_tokens=max_tokens, temperature=temperature, n=1)
-        except:
-            return ""
-        return response["choices"][0]["message"]["content"]
+        if instruction is not None:
+            conversation = append_instruction(conversation, instruction)
+        return conversation, total_len
 
         
         
\ No newline at end of file
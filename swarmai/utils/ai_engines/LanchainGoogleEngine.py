@@ -1,6 +1,8 @@
 import os
 import openai
 import tiktoken
+import threading
+from contextlib import contextmanager
 
 from swarmai.utils.ai_engines.EngineBase import EngineBase
 from langchain.agents import load_tools
@@ -13,6 +15,11 @@ from langchain.utilities import GoogleSearchAPIWrapper
 class LanchainGoogleEngine(EngineBase):
     """
     gpt-4, gpt-4-0314, gpt-4-32k, gpt-4-32k-0314, gpt-3.5-turbo, gpt-3.5-turbo-0301
+
+    Shared between the agents through the EnginePool. The LLM wrapper is created once. The google api client (httplib2) must not be used
+    from several threads at once, so the LangChain agents and the google search wrappers are kept in small pools of the engine:
+    a call borrows an idle one (or creates one if all are busy) and returns it afterwards. The pools grow to the number of concurrent
+    calls, not to the number of tasks, although the AgentJob of every task runs in a new thread.
     """
     SUPPORTED_MODELS = [
         "gpt-4",
@@ -36,15 +43,30 @@ class LanchainGoogleEngine(EngineBase):
         openai.api_key = os.getenv("OPENAI_API_KEY")
         self.tiktoken_encoding = tiktoken.encoding_for_model(model_name)
 
-        self.agent = self._init_chain()
-        self.search = GoogleSearchAPIWrapper()
+        self.llm = OpenAI(temperature=self.temperature)
+        self._pool_lock = threading.Lock()
+        self._idle_agents = []
+        self._idle_searches = []
+
+    @contextmanager
+    def _borrow(self, idle, create):
+        """Borrows an idle client from the pool (list) idle, creates one with create() if there is none.
+        """
+        with self._pool_lock:
+            client = idle.pop() if len(idle) > 0 else None
+        if client is None:
+            client = create()
+        try:
+            yield client
+        finally:
+            with self._pool_lock:
+                idle.append(client)
 
     def _init_chain(self):
         """Instantiates langchain chain with all the necessary tools
         """
-        llm = OpenAI(temperature=self.temperature)
-        tools = load_tools(["google-search", "google-search-results-json"], llm=llm)
-        agent = initialize_agent(tools, llm, agent=AgentType.ZERO_SHOT_REACT_DESCRIPTION, verbose=False, return_intermediate_steps=True)
+        tools = load_tools(["google-search", "google-search-results-json"], llm=self.llm)
+        agent = initialize_agent(tools, self.llm, agent=AgentType.ZERO_SHOT_REACT_DESCRIPTION, verbose=False, return_intermediate_steps=True)
         return agent
 
     def call_model(self, conversation: list) -> str:
@@ -55,7 +77,8 @@ class LanchainGoogleEngine(EngineBase):
         else:
             prompt = conversation
 
-        response = self.agent(prompt)
+        with self._borrow(self._idle_agents, self._init_chain) as agent:
+            response = agent(prompt)
         final_response = ""
         intermediate_steps = response["intermediate_steps"]
         for step in intermediate_steps:
@@ -66,13 +89,15 @@ class LanchainGoogleEngine(EngineBase):
     def google_query(self, query: str) -> str:
         """Does the search itself but provides very short answers!
         """
-        response = self.search.run(query)
+        with self._borrow(self._idle_searches, GoogleSearchAPIWrapper) as search:
+            response = search.run(query)
         return response
     
     def search_sources(self, query: str, n=5):
         """Does the search itself but provides very short answers!
         """
-        response = self.search.results(query, n)
+        with self._borrow(self._idle_searches, GoogleSearchAPIWrapper) as search:
+            response = search.results(query, n)
         return response
     
     def _convert_conversation_to_str(self, conversation):
@@ -0,0 +1,153 @@
+import time
+import random
+import asyncio
+import threading
+
+import openai
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute budget of one model, shared by all the engines of the process (see RateLimiter.get).
+
+    Both budgets are token buckets that refill continuously and hold at most one minute of budget.
+    Callers reserve their request under the lock: the buckets are debited right away (and may go negative),
+    and the caller gets the time it has to wait until the debt is refilled. So the callers are served strictly in the order
+    they asked (FIFO), nobody spins, and the same limiter works for threads (wait) and coroutines (await wait_async).
+
+    The tokens of a request are estimated before the call as prompt + max_tokens, the same way the api counts them against the limit
+    when the request arrives, so the budget is not corrected with the actual usage of the response.
+    """
+
+    DEFAULT_LIMITS = {
+        "gpt-3.5-turbo": {"rpm": 3500, "tpm": 90000},
+        "gpt-3.5-turbo-0301": {"rpm": 3500, "tpm": 90000},
+        "gpt-4": {"rpm": 200, "tpm": 40000},
+        "gpt-4-0314": {"rpm": 200, "tpm": 40000},
+        "gpt-4-32k": {"rpm": 200, "tpm": 80000},
+        "gpt-4-32k-0314": {"rpm": 200, "tpm": 80000},
+    }
+
+    _limits = dict(DEFAULT_LIMITS)
+    _limiters = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, rpm=None, tpm=None):
+        """
+        Args:
+            - rpm (float): requests per minute, None for no limit
+            - tpm (float): tokens per minute, None for no limit
+        """
+        self.rpm = rpm
+        self.tpm = tpm
+        self.lock = threading.Lock()
+        self.requests = rpm if rpm is not None else 0.0
+        self.tokens = tpm if tpm is not None else 0.0
+        self.last_refill = time.monotonic()
+
+    @classmethod
+    def configure(cls, limits: dict):
+        """Sets the limits per model, e.g. from the swarm config: {"gpt-4": {"rpm": 200, "tpm": 40000}}.
+        Models without limits (or with None) are not limited. Replaces the existing limiters.
+        """
+        with cls._registry_lock:
+            cls._limits = dict(cls.DEFAULT_LIMITS)
+            cls._limits.update(limits)
+            cls._limiters = {}
+
+    @classmethod
+    def get(cls, model_name):
+        """Returns the process-wide limiter of the model, None if the model has no limits.
+        """
+        with cls._registry_lock:
+            if model_name not in cls._limiters:
+                limits = cls._limits.get(model_name)
+                cls._limiters[model_name] = RateLimiter(limits.get("rpm"), limits.get("tpm")) if limits is not None else None
+            return cls._limiters[model_name]
+
+    def reserve(self, tokens) -> float:
+        """Debits one request and the given number of tokens. Returns the number of seconds the caller has to wait before the request.
+        """
+        with self.lock:
+            self._refill()
+            delay = 0.0
+            if self.rpm is not None:
+                self.requests -= 1
+                if self.requests < 0:
+                    delay = max(delay, -self.requests / (self.rpm / 60))
+            if self.tpm is not None:
+                self.tokens -= tokens
+                if self.tokens < 0:
+                    delay = max(delay, -self.tokens / (self.tpm / 60))
+            return delay
+
+    def wait(self, tokens):
+        """Blocks until the request fits into the budget.
+        """
+        delay = self.reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def wait_async(self, tokens):
+        delay = self.reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def _refill(self):
+        """Must be called with the lock held.
+        """
+        now = time.monotonic()
+        elapsed = now - self.last_refill
+        self.last_refill = now
+        if self.rpm is not None:
+            self.requests = min(self.rpm, self.requests + elapsed * self.rpm / 60)
+        if self.tpm is not None:
+            self.tokens = min(self.tpm, self.tokens + elapsed * self.tpm / 60)
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter for the retryable errors of the api (rate limits, timeouts, overloaded servers).
+    The delay before the retry n is uniform in [0, min(max_delay, base_delay * 2^n)], so the clients that hit a limit at the same time
+    don't retry at the same time again. Other errors (e.g. invalid requests) and the last failure are raised.
+    """
+
+    RETRYABLE_ERRORS = (
+        openai.error.RateLimitError,
+        openai.error.APIError,
+        openai.error.Timeout,
+        openai.error.APIConnectionError,
+        openai.error.ServiceUnavailableError,
+        openai.error.TryAgain,
+    )
+
+    def __init__(self, max_retries=6, base_delay=1.0, max_delay=60.0, retryable_errors=None):
+        """
+        Args:
+            - retryable_errors (tuple): error types to retry, RETRYABLE_ERRORS by default
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retryable_errors = retryable_errors if retryable_errors is not None else self.RETRYABLE_ERRORS
+
+    def is_retryable(self, error) -> bool:
+        return isinstance(error, self.retryable_errors)
+
+    def delay(self, attempt) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def call(self, function):
+        for attempt in range(self.max_retries + 1):
+            try:
+                return function()
+            except Exception as e:
+                if attempt == self.max_retries or not self.is_retryable(e):
+                    raise
+                time.sleep(self.delay(attempt))
+
+    async def call_async(self, coroutine_function):
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await coroutine_function()
+            except Exception as e:
+                if attempt == self.max_retries or not self.is_retryable(e):
+                    raise
+                await asyncio.sleep(self.delay(attempt))
@@ -0,0 +1,154 @@
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from collections import OrderedDict
+
+class ResponseCache:
+    """Content-addressed cache of the model responses, shared by all the engines of the process.
+
+    The key is a sha256 of the model, temperature, max_tokens and the normalized conversation (roles and stripped contents),
+    so the same prompt gets the same answer within a run and across the runs of the same swarm config.
+    Two tiers:
+    - in-memory LRU of max_memory_entries responses
+    - SQLite file (outside of run_dir, which is wiped on start), evicted by last access once it's larger than max_disk_bytes.
+      The access times of the disk hits are written in batches (with the next set, every TOUCH_BATCH hits and on close),
+      so a hit doesn't commit.
+
+    Calls with temperature > 0 are not cached by default (bypass_nonzero_temperature), their callers rely on sampling different answers.
+    Thread-safe.
+    """
+
+    DEFAULT_PATH = Path.home() / ".cache" / "swarmai" / "llm_cache.sqlite"
+    TOUCH_BATCH = 100
+
+    def __init__(self, path=None, max_memory_entries=1000, max_disk_bytes=256*1024*1024, bypass_nonzero_temperature=True):
+        """
+        Args:
+            - path (str or Path): SQLite file of the on-disk tier, ~/.cache/swarmai/llm_cache.sqlite by default. None in the config means default,
+                use ":memory:" for no persistence
+            - max_memory_entries (int): size of the in-memory LRU
+            - max_disk_bytes (int): max total size of the cached responses on disk
+            - bypass_nonzero_temperature (bool): don't cache the calls with temperature > 0. False caches them too,
+                e.g. to replay a run without api calls
+        """
+        self.path = Path(path) if path is not None else self.DEFAULT_PATH
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.bypass_nonzero_temperature = bypass_nonzero_temperature
+
+        self.lock = threading.Lock()
+        self.memory = OrderedDict() # key -> response
+        self.touched = {} # key -> last access of the disk hits, not written yet
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if str(self.path) != ":memory:":
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, response TEXT, size INTEGER, last_access REAL)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        self.db.commit()
+        self.disk_bytes = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def applies_to(self, temperature) -> bool:
+        return not (self.bypass_nonzero_temperature and temperature > 0)
+
+    @staticmethod
+    def key(model_name, temperature, max_tokens, conversation) -> str:
+        normalized = [[message["role"], message["content"].strip()] for message in conversation]
+        payload = json.dumps([model_name, temperature, max_tokens, normalized], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Returns the cached response or None.
+        """
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                self.memory_hits += 1
+                return self.memory[key]
+
+            row = self.db.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.touched[key] = time.time()
+            if len(self.touched) >= self.TOUCH_BATCH:
+                self._write_touched()
+                self.db.commit()
+            self.disk_hits += 1
+            self._remember(key, row[0])
+            return row[0]
+
+    def set(self, key, response: str):
+        size = len(response.encode("utf-8"))
+        with self.lock:
+            self._remember(key, response)
+            previous = self.db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self.db.execute("INSERT OR REPLACE INTO responses (key, response, size, last_access) VALUES (?, ?, ?, ?)", (key, response, size, time.time()))
+            self.disk_bytes += size - (previous[0] if previous is not None else 0)
+            self.touched.pop(key, None)
+            self._write_touched()
+            if self.disk_bytes > self.max_disk_bytes:
+                self._evict()
+            self.db.commit()
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            n_lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / n_lookups if n_lookups > 0 else None,
+                "memory_entries": len(self.memory),
+                "disk_bytes": self.disk_bytes,
+            }
+
+    def flush(self):
+        """Writes the pending access times of the disk hits.
+        """
+        with self.lock:
+            self._write_touched()
+            self.db.commit()
+
+    def close(self):
+        with self.lock:
+            self._write_touched()
+            self.db.commit()
+            self.db.close()
+
+    def _write_touched(self):
+        """Writes the access times of the disk hits, without committing. Must be called with the lock held.
+        """
+        if len(self.touched) > 0:
+            self.db.executemany("UPDATE responses SET last_access = ? WHERE key = ?", [(t, key) for key, t in self.touched.items()])
+            self.touched = {}
+
+    def _remember(self, key, response):
+        """Puts the response to the in-memory LRU. Must be called with the lock held.
+        """
+        self.memory[key] = response
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_memory_entries:
+            self.memory.popitem(last=False)
+
+    def _evict(self):
+        """Deletes the least recently used responses until the disk tier is at 90% of max_disk_bytes. Must be called with the lock held.
+        """
+        target = 0.9 * self.max_disk_bytes
+        freed = 0
+        evicted = []
+        for key, size in self.db.execute("SELECT key, size FROM responses ORDER BY last_access"):
+            if self.disk_bytes - freed <= target:
+                break
+            evicted.append((key,))
+            freed += size
+        self.db.executemany("DELETE FROM responses WHERE key = ?", evicted)
+        self.disk_bytes -= freed
@@ -0,0 +1,262 @@
+import time
+import threading
+
+import openai
+
+from swarmai.utils.ai_engines.EngineBase import EngineBase, current_task_type
+from swarmai.utils.ai_engines.GPTConversEngine import GPTConversEngine
+from swarmai.utils.ai_engines.RateLimiter import RetryPolicy
+from swarmai.utils.task_queue.TaskQueueMetrics import LatencyHistogram
+
+class RouteStats:
+    """Calls, timeouts, latency and tokens per route (model, reason), to tune the routing table.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.routes = {}
+
+    def record(self, model_name, reason, latency, prompt_tokens, completion_tokens=0, timeout=False, error=False):
+        with self.lock:
+            route = self.routes.setdefault((model_name, reason), {
+                "calls": 0, "timeouts": 0, "errors": 0, "prompt_tokens": 0, "completion_tokens": 0, "latency": LatencyHistogram(),
+            })
+            route["calls"] += 1
+            route["timeouts"] += int(timeout)
+            route["errors"] += int(error)
+            route["prompt_tokens"] += prompt_tokens
+            route["completion_tokens"] += completion_tokens
+            if not timeout and not error:
+                route["latency"].add(latency)
+
+    def median_latency(self, model_name, min_samples=10):
+        """Observed p50 latency of the successful calls to the model over all the routes, None if there are not enough samples.
+        """
+        with self.lock:
+            histograms = [route["latency"] for (model, _), route in self.routes.items() if model == model_name]
+            merged = LatencyHistogram()
+            for histogram in histograms:
+                merged.buckets = [a + b for a, b in zip(merged.buckets, histogram.buckets)]
+                merged.count += histogram.count
+                merged.total += histogram.total
+                merged.max = max(merged.max, histogram.max)
+            if merged.count < min_samples:
+                return None
+            return merged.percentile(50)
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return {
+                f"{model_name}/{reason}": {**{k: v for k, v in route.items() if k != "latency"}, "latency": route["latency"].summary()}
+                for (model_name, reason), route in sorted(self.routes.items())
+            }
+
+
+class RoutingEngine(EngineBase):
+    """Picks the model per call instead of the fixed model of the agent, configured from the swarm config (swarm.routing):
+
+        routing:
+            models: # candidates, cheapest first
+                gpt-3.5-turbo: {cost_per_1k_tokens: 0.002, timeout: 60}
+                gpt-4: {cost_per_1k_tokens: 0.06, timeout: 120}
+            task_types: # preferred model per task type (see current_task_type), the model of the engine otherwise
+                report_preparation: gpt-4
+            max_cost_per_call: 0.5 # dollars, estimated from the prompt and max_tokens
+            max_latency: 30 # seconds, models with a higher observed median latency are avoided
+
+    Routes (the reason of the choice is recorded in the stats):
+        - preferred: the preferred model, the prompt fits into its context
+        - context: the prompt doesn't fit into the context of the preferred model, the cheapest candidate with a larger context that fits
+          and is within the cost budget. If there is none, the preferred model is used and the prompt is truncated ("truncated")
+        - latency: the preferred model is slower than max_latency, the cheapest candidate that fits and is faster
+        - fallback: the model timed out, the call is repeated once with the cheapest candidate that fits and is cheaper or faster (observed median latency).
+          If there is none, the same model is tried once more ("retry"). The timeouts are not retried otherwise
+
+    The Swarm substitutes GPTConversEngine by the RoutingEngine in the EnginePool, so the agents don't change.
+    """
+
+    DEFAULT_CONFIG = {
+        "models": {
+            "gpt-3.5-turbo": {"cost_per_1k_tokens": 0.002, "timeout": 60},
+            "gpt-4": {"cost_per_1k_tokens": 0.06, "timeout": 120},
+        },
+        "task_types": {},
+        "max_cost_per_call": None,
+        "max_latency": None,
+    }
+    MESSAGE_OVERHEAD_TOKENS = 100 # reserved per message by the truncation of the GPTConversEngine
+
+    config = DEFAULT_CONFIG
+    model_engine_class = GPTConversEngine
+    stats = RouteStats()
+
+    @classmethod
+    def configure(cls, config: dict, model_engine_class=GPTConversEngine):
+        """
+        Args:
+            - config (dict): swarm.routing, see the class docstring
+            - model_engine_class: engine that calls the models, e.g. the SimulatedEngine
+        """
+        cls.config = {**cls.DEFAULT_CONFIG, **config}
+        for model_name in cls.config["models"]:
+            if model_name not in GPTConversEngine.SUPPORTED_MODELS:
+                raise ValueError(f"Model {model_name} is not supported. Supported models are: {GPTConversEngine.SUPPORTED_MODELS}")
+        cls.model_engine_class = model_engine_class
+        cls.stats = RouteStats()
+
+    def __init__(self, model_name: str, temperature: float, max_response_tokens: int):
+        super().__init__("routing", model_name, temperature, max_response_tokens)
+        self.lock = threading.Lock()
+        self.engines = {}
+
+    def call_model(self, conversation, max_tokens=None, temperature=None, task_type=None, instruction=None) -> str:
+        conversation = self._as_conversation(conversation)
+        engine, reason, prompt_tokens = self._route(conversation, max_tokens, task_type, instruction)
+        try:
+            return self._call(engine, reason, prompt_tokens, lambda e, timeout: e.call_model(self._copy(conversation), max_tokens, temperature, request_timeout=timeout, instruction=instruction))
+        except openai.error.Timeout:
+            fallback, reason = self._fallback(engine, prompt_tokens, max_tokens)
+            return self._call(fallback, reason, prompt_tokens, lambda e, timeout: e.call_model(self._copy(conversation), max_tokens, temperature, request_timeout=timeout, instruction=instruction))
+
+    async def acall_model(self, conversation, max_tokens=None, temperature=None, task_type=None, instruction=None) -> str:
+        conversation = self._as_conversation(conversation)
+        engine, reason, prompt_tokens = self._route(conversation, max_tokens, task_type, instruction)
+        try:
+            return await self._acall(engine, reason, prompt_tokens, lambda e, timeout: e.acall_model(self._copy(conversation), max_tokens, temperature, request_timeout=timeout, instruction=instruction))
+        except openai.error.Timeout:
+            fallback, reason = self._fallback(engine, prompt_tokens, max_tokens)
+            return await self._acall(fallback, reason, prompt_tokens, lambda e, timeout: e.acall_model(self._copy(conversation), max_tokens, temperature, request_timeout=timeout, instruction=instruction))
+
+    def stream_model(self, conversation, max_tokens=None, temperature=None, task_type=None, instruction=None):
+        """Streams from the routed model. Streams are not timed out, so they have no fallback.
+        """
+        conversation = self._as_conversation(conversation)
+        engine, reason, prompt_tokens = self._route(conversation, max_tokens, task_type, instruction)
+        start = time.monotonic()
+        response = ""
+        try:
+            for delta in engine.stream_model(self._copy(conversation), max_tokens, temperature, instruction=instruction):
+                response += delta
+                yield delta
+        except Exception:
+            self.stats.record(engine.model_name, reason, time.monotonic() - start, prompt_tokens, error=True)
+            raise
+        self.stats.record(engine.model_name, reason, time.monotonic() - start, prompt_tokens, engine.count_tokens(response))
+
+    def count_tokens(self, message) -> int:
+        return self._engine(self.model_name).count_tokens(message)
+
+    def truncate_message(self, message, token_limit=None):
+        return self._engine(self.model_name).truncate_message(message, token_limit)
+
+    def _route(self, conversation, max_tokens, task_type, instruction=None):
+        """Returns the engine of the chosen model, the reason and the number of tokens of the untruncated prompt.
+        """
+        if max_tokens is None:
+            max_tokens = self.max_response_tokens
+        if task_type is None:
+            task_type = current_task_type.get()
+        preferred = self.config["task_types"].get(task_type, self.model_name)
+        preferred_engine = self._engine(preferred)
+        prompt_tokens = sum(preferred_engine.count_tokens(message["content"]) + self.MESSAGE_OVERHEAD_TOKENS for message in conversation)
+        if instruction is not None:
+            prompt_tokens += preferred_engine.count_tokens(instruction)
+
+        if not self._fits(preferred, prompt_tokens, max_tokens):
+            larger = [m for m in self._candidates(prompt_tokens, max_tokens) if self.TOKEN_LIMITS[m] > self.TOKEN_LIMITS[preferred]]
+            if len(larger) == 0:
+                return preferred_engine, "truncated", prompt_tokens
+            return self._engine(larger[0]), "context", prompt_tokens
+
+        max_latency = self.config.get("max_latency")
+        if max_latency is not None:
+            median_latency = self.stats.median_latency(preferred)
+            if median_latency is not None and median_latency > max_latency:
+                for model_name in self._candidates(prompt_tokens, max_tokens):
+                    model_latency = self.stats.median_latency(model_name)
+                    if model_name != preferred and (model_latency is None or model_latency < median_latency):
+                        return self._engine(model_name), "latency", prompt_tokens
+        return preferred_engine, "preferred", prompt_tokens
+
+    def _candidates(self, prompt_tokens, max_tokens):
+        """The configured models that fit the prompt and are within the cost budget, cheapest first.
+        """
+        max_cost = self.config.get("max_cost_per_call")
+        candidates = []
+        for model_name in self.config["models"]:
+            cost = (prompt_tokens + max_tokens) / 1000 * self._cost_per_1k_tokens(model_name)
+            if self._fits(model_name, prompt_tokens, max_tokens) and (max_cost is None or cost <= max_cost):
+                candidates.append(model_name)
+        return candidates
+
+    def _fits(self, model_name, prompt_tokens, max_tokens):
+        return prompt_tokens + max_tokens <= self.TOKEN_LIMITS[model_name]
+
+    def _fallback(self, engine, prompt_tokens, max_tokens):
+        """Returns the engine and the reason for the second attempt after a timeout.
+        """
+        if max_tokens is None:
+            max_tokens = self.max_response_tokens
+        cost = self._cost_per_1k_tokens(engine.model_name)
+        latency = self.stats.median_latency(engine.model_name)
+        for model_name in self._candidates(prompt_tokens, max_tokens):
+            if model_name == engine.model_name:
+                continue
+            model_latency = self.stats.median_latency(model_name)
+            is_faster = latency is not None and model_latency is not None and model_latency < latency
+            if self._cost_per_1k_tokens(model_name) < cost or is_faster:
+                return self._engine(model_name), "fallback"
+        return engine, "retry"
+
+    def _cost_per_1k_tokens(self, model_name):
+        return self.config["models"].get(model_name, {}).get("cost_per_1k_tokens", 0)
+
+    def _call(self, engine, reason, prompt_tokens, call):
+        start = time.monotonic()
+        try:
+            response = call(engine, self._timeout(engine.model_name))
+        except openai.error.Timeout:
+            self.stats.record(engine.model_name, reason, time.monotonic() - start, prompt_tokens, timeout=True)
+            raise
+        except Exception:
+            self.stats.record(engine.model_name, reason, time.monotonic() - start, prompt_tokens, error=True)
+            raise
+        self.stats.record(engine.model_name, reason, time.monotonic() - start, prompt_tokens, engine.count_tokens(response))
+        return response
+
+    async def _acall(self, engine, reason, prompt_tokens, call):
+        start = time.monotonic()
+        try:
+            response = await call(engine, self._timeout(engine.model_name))
+        except openai.error.Timeout:
+            self.stats.record(engine.model_name, reason, time.monotonic() - start, prompt_tokens, timeout=True)
+            raise
+        except Exception:
+            self.stats.record(engine.model_name, reason, time.monotonic() - start, prompt_tokens, error=True)
+            raise
+        self.stats.record(engine.model_name, reason, time.monotonic() - start, prompt_tokens, engine.count_tokens(response))
+        return response
+
+    def _timeout(self, model_name):
+        return self.config["models"].get(model_name, {}).get("timeout")
+
+    def _engine(self, model_name):
+        """The engine of the model, created on the first use. Its retry policy doesn't retry timeouts, they fall back to another model.
+        """
+        with self.lock:
+            if model_name not in self.engines:
+                engine = self.model_engine_class(model_name, self.temperature, self.max_response_tokens)
+                engine.retry_policy = RetryPolicy(retryable_errors=tuple(e for e in RetryPolicy.RETRYABLE_ERRORS if e is not openai.error.Timeout))
+                self.engines[model_name] = engine
+            return self.engines[model_name]
+
+    @staticmethod
+    def _as_conversation(conversation):
+        if isinstance(conversation, str):
+            return [{"role": "user", "content": conversation}]
+        return conversation
+
+    @staticmethod
+    def _copy(conversation):
+        # the engines truncate the messages in place, the fallback must see the original ones
+        return [dict(message) for message in conversation]
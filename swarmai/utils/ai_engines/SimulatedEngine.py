@@ -0,0 +1,346 @@
+import re
+import math
+import time
+import random
+import asyncio
+import hashlib
+import threading
+from typing import List, Optional
+
+import openai
+from langchain.llms.base import LLM
+from langchain.embeddings.base import Embeddings
+
+from swarmai.utils.ai_engines.EngineBase import EngineBase
+from swarmai.utils.ai_engines.GPTConversEngine import GPTConversEngine
+from swarmai.utils.ai_engines.EnginePool import EnginePool
+
+WORDS = (
+    "market startup funding investor revenue growth product platform customer technology research competitor "
+    "brain interface neural signal device clinical study partnership team founder patent regulation pricing "
+    "segment europe usa asia series seed round valuation trend risk adoption hardware software data analysis"
+).split()
+
+class LatencyDistribution:
+    """Latency of a simulated call in seconds, from the config:
+        {distribution: constant, value: 1.0}
+        {distribution: uniform, low: 0.5, high: 2.0}
+        {distribution: exponential, mean: 1.0}
+        {distribution: lognormal, median: 1.0, sigma: 0.5}
+    """
+
+    def __init__(self, distribution="constant", **params):
+        if distribution not in ["constant", "uniform", "exponential", "lognormal"]:
+            raise ValueError(f"Latency distribution {distribution} is not supported. Supported distributions are: constant, uniform, exponential, lognormal")
+        self.distribution = distribution
+        self.params = params
+
+    def sample(self, rng) -> float:
+        if self.distribution == "constant":
+            return self.params.get("value", 0.0)
+        if self.distribution == "uniform":
+            return rng.uniform(self.params.get("low", 0.0), self.params.get("high", 1.0))
+        if self.distribution == "exponential":
+            return rng.expovariate(1 / self.params.get("mean", 1.0))
+        return rng.lognormvariate(math.log(self.params.get("median", 1.0)), self.params.get("sigma", 0.5))
+
+
+class Simulation:
+    """Process-wide settings and counters of the simulated engines, set from the swarm config (swarm.simulation):
+
+        simulation:
+            latency: # per kind of call: llm, search, embedding. See LatencyDistribution
+                llm: {distribution: lognormal, median: 2.0, sigma: 0.5}
+                search: {distribution: uniform, low: 0.5, high: 2.0}
+                embedding: {distribution: constant, value: 0.05}
+            error_rate: 0.01 # probability that a llm call fails with a retryable api error, or a search fails
+            seed: 0
+    """
+
+    DEFAULT_LATENCY = {
+        "llm": {"distribution": "lognormal", "median": 1.0, "sigma": 0.5},
+        "search": {"distribution": "uniform", "low": 0.2, "high": 1.0},
+        "embedding": {"distribution": "constant", "value": 0.0},
+    }
+
+    _lock = threading.Lock()
+    _rng = random.Random()
+    latency = {kind: LatencyDistribution(**params) for kind, params in DEFAULT_LATENCY.items()}
+    error_rate = 0.0
+    calls = {}
+    errors = {}
+
+    @classmethod
+    def configure(cls, config: dict):
+        with cls._lock:
+            latency = dict(cls.DEFAULT_LATENCY)
+            latency.update(config.get("latency") or {})
+            cls.latency = {kind: LatencyDistribution(**params) for kind, params in latency.items()}
+            cls.error_rate = config.get("error_rate", 0.0)
+            cls._rng = random.Random(config.get("seed"))
+            cls.calls = {}
+            cls.errors = {}
+
+    @classmethod
+    def enable(cls, config: dict):
+        """Configures the simulation and replaces the real engines of the EnginePool by the simulated ones.
+        """
+        cls.configure(config)
+        from langchain.utilities import ApifyWrapper
+        from swarmai.utils.ai_engines.LanchainGoogleEngine import LanchainGoogleEngine
+        EnginePool.substitute({
+            GPTConversEngine: SimulatedEngine,
+            LanchainGoogleEngine: SimulatedSearchEngine,
+            ApifyWrapper: SimulatedScraper,
+        })
+
+    @classmethod
+    def start_call(cls, kind) -> tuple:
+        """Counts the call and returns its latency and whether it fails. The error is raised after the latency, see wait_or_fail.
+        """
+        with cls._lock:
+            cls.calls[kind] = cls.calls.get(kind, 0) + 1
+            latency = cls.latency[kind].sample(cls._rng)
+            fails = kind != "embedding" and cls._rng.random() < cls.error_rate
+            if fails:
+                cls.errors[kind] = cls.errors.get(kind, 0) + 1
+            return latency, fails
+
+    @classmethod
+    def wait_or_fail(cls, kind, timeout=None):
+        """Sleeps for the latency of the call. Raises the injected error, or openai.error.Timeout if the latency is above the timeout.
+        """
+        latency, fails = cls.start_call(kind)
+        if timeout is not None and latency > timeout:
+            time.sleep(timeout)
+            cls._raise_timeout(kind)
+        time.sleep(latency)
+        if fails:
+            cls._raise(kind)
+
+    @classmethod
+    async def wait_or_fail_async(cls, kind, timeout=None):
+        latency, fails = cls.start_call(kind)
+        if timeout is not None and latency > timeout:
+            await asyncio.sleep(timeout)
+            cls._raise_timeout(kind)
+        await asyncio.sleep(latency)
+        if fails:
+            cls._raise(kind)
+
+    @classmethod
+    def random(cls):
+        """Returns a random.Random seeded from the shared generator, for the content of one response.
+        """
+        with cls._lock:
+            return random.Random(cls._rng.random())
+
+    @classmethod
+    def get_stats(cls) -> dict:
+        with cls._lock:
+            return {"calls": dict(cls.calls), "errors": dict(cls.errors)}
+
+    @classmethod
+    def _raise_timeout(cls, kind):
+        with cls._lock:
+            cls.errors[f"{kind}_timeout"] = cls.errors.get(f"{kind}_timeout", 0) + 1
+        raise openai.error.Timeout(f"Simulated {kind} timeout")
+
+    @staticmethod
+    def _raise(kind):
+        if kind == "llm":
+            raise openai.error.RateLimitError("Simulated rate limit error")
+        raise RuntimeError(f"Simulated {kind} error")
+
+
+def _sentence(rng, n_words=12):
+    return " ".join(rng.choice(WORDS) for _ in range(n_words)).capitalize() + "."
+
+def _link(rng):
+    return f"https://example.com/{rng.choice(WORDS)}/{rng.randrange(10**6)}"
+
+
+class SimulatedEngine(GPTConversEngine):
+    """Drop-in replacement of GPTConversEngine for load tests: no api calls, synthetic but structurally valid responses
+    (subtask lists, missing information lists, summaries with links) after a latency drawn from Simulation.latency["llm"].
+    Only the api call is simulated: the response cache, single-flight, rate limiter and retries work as with the real engine.
+    Tokens are estimated from the length of the text, so no tokenizer files are needed.
+    """
+
+    CHARS_PER_TOKEN = 4
+    EXCLUDED_SUBTASK_TYPES = ["breakdown_to_subtasks", "report_preparation"] # the simulated breakdown doesn't grow the task tree without bounds
+
+    def __init__(self, model_name: str, temperature: float, max_response_tokens: int):
+        if model_name not in self.SUPPORTED_MODELS:
+            raise ValueError(f"Model {model_name} is not supported. Supported models are: {self.SUPPORTED_MODELS}")
+        EngineBase.__init__(self, "simulated", model_name, temperature, max_response_tokens)
+        self.tiktoken_encoding = None
+
+    def truncate_message_with_count(self, message, token_limit=None):
+        max_tokens = self.max_input_length()
+        if token_limit is not None:
+            max_tokens = max(min(max_tokens, token_limit), 0)
+        n_tokens = self.count_tokens(message)
+        if n_tokens <= max_tokens:
+            return message, n_tokens
+        return message[:max_tokens * self.CHARS_PER_TOKEN], max_tokens
+
+    def count_tokens(self, message) -> int:
+        return math.ceil(len(message) / self.CHARS_PER_TOKEN)
+
+    def _create(self, **params):
+        Simulation.wait_or_fail("llm", params.get("request_timeout"))
+        content = self.simulate_response(params["messages"], params["max_tokens"])
+        if params.get("stream"):
+            return self._chunks(content)
+        return self._response(content)
+
+    async def _acreate(self, **params):
+        await Simulation.wait_or_fail_async("llm", params.get("request_timeout"))
+        content = self.simulate_response(params["messages"], params["max_tokens"])
+        if params.get("stream"):
+            return self._achunks(content)
+        return self._response(content)
+
+    def simulate_response(self, conversation, max_tokens) -> str:
+        """Returns a synthetic response in the format the prompt asks for.
+        """
+        rng = Simulation.random()
+        text = "\n".join(message["content"] for message in conversation)
+
+        allowed_types = re.search(r"Following subtasks are allowed:(.*?)\n", text)
+        if allowed_types is not None:
+            subtask_types = [t.strip() for t in allowed_types.group(1).split(",") if t.strip() not in self.EXCLUDED_SUBTASK_TYPES]
+            subtasks = [f"({rng.choice(subtask_types)}; {_sentence(rng, 8)}; {rng.randint(0, 100)})" for _ in range(rng.randint(1, 5))]
+            return "[[" + ", ".join(subtasks) + "]]"
+
+        if "Which information is missing" in text:
+            if rng.random() < 0.3:
+                return "['no_missing_info']"
+            return "[" + ", ".join(f"'{_sentence(rng, 5)[:-1]}'" for _ in range(rng.randint(1, 3))) + "]"
+
+        if "Summary of the global task" in text:
+            return _sentence(rng, 20)
+
+        n_words = rng.randint(20, max(20, min(max_tokens, 400) * 3 // 4))
+        sentences = []
+        while sum(len(s.split()) for s in sentences) < n_words:
+            sentences.append(f"{_sentence(rng)} ({_link(rng)})")
+        return " ".join(sentences)
+
+    def _response(self, content):
+        return {
+            "object": "chat.completion",
+            "model": self.model_name,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": len(content) // self.CHARS_PER_TOKEN, "total_tokens": 0},
+        }
+
+    def _chunks(self, content):
+        for word in re.findall(r"\S+\s*", content):
+            yield {"object": "chat.completion.chunk", "choices": [{"index": 0, "delta": {"content": word}, "finish_reason": None}]}
+
+    async def _achunks(self, content):
+        for chunk in self._chunks(content):
+            yield chunk
+
+
+class SimulatedSearchEngine(EngineBase):
+    """Drop-in replacement of LanchainGoogleEngine: synthetic search results after a latency drawn from Simulation.latency["search"].
+    """
+
+    def __init__(self, model_name: str, temperature: float, max_response_tokens: int):
+        super().__init__("simulated", model_name, temperature, max_response_tokens)
+
+    def call_model(self, conversation) -> str:
+        query = conversation[-1]["content"] if isinstance(conversation, list) else conversation
+        results = self.search_sources(query)
+        steps = [f"Action: google_search\nAction Input: {query[:100]}\nObservation: {r['snippet']} ({r['link']})" for r in results]
+        return "\n".join(steps) + "\n" + _sentence(Simulation.random(), 30)
+
+    def google_query(self, query: str) -> str:
+        return " ".join(r["snippet"] for r in self.search_sources(query))
+
+    def search_sources(self, query: str, n=5):
+        """Same format as GoogleSearchAPIWrapper.results: [{"title": ..., "link": ..., "snippet": ...}]
+        """
+        Simulation.wait_or_fail("search")
+        rng = Simulation.random()
+        results = []
+        for _ in range(n):
+            link = _link(rng)
+            if "crunchbase.com" in query:
+                link = f"https://www.crunchbase.com/organization/{rng.choice(WORDS)}-{rng.randrange(10**4)}"
+            results.append({"title": _sentence(rng, 4), "link": link, "snippet": _sentence(rng, 25)})
+        return results
+
+    def truncate_message(self, message, token_limit=None):
+        return message
+
+
+class SimulatedScraper:
+    """Stand-in for the ApifyWrapper of the CrunchbaseSearcher: synthetic crunchbase records passed through the mapping function of the caller.
+    """
+
+    def call_actor(self, actor_id, run_input, dataset_mapping_function):
+        Simulation.wait_or_fail("search")
+        rng = Simulation.random()
+        items = []
+        for url in run_input.get("startUrls", []):
+            name = url.rstrip("/").split("/")[-1]
+            items.append({
+                "properties": {"identifier": {"value": name}, "title": name.title(), "short_description": _sentence(rng)},
+                "cards": {
+                    "company_about_fields2": {"website": {"value": f"https://{name}.com"}, "location_identifiers": [{"location_type": "country", "value": rng.choice(["Germany", "United States", "France"])}]},
+                    "funding_rounds_summary": {"funding_total": {"value_usd": rng.randrange(10**5, 10**8)}},
+                },
+            })
+        mapped = [dataset_mapping_function(item) for item in items]
+        return SimulatedLoader(mapped)
+
+
+class SimulatedLoader:
+    def __init__(self, items):
+        self.items = items
+
+    def load(self):
+        return self.items
+
+
+class SimulatedEmbeddings(Embeddings):
+    """Deterministic embeddings for the VectorMemory without the api: hashed bag of words, L2-normalized,
+    so that texts sharing words are close. Latency from Simulation.latency["embedding"] per call.
+    """
+
+    def __init__(self, dim=256):
+        self.dim = dim
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        Simulation.wait_or_fail("embedding")
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        Simulation.wait_or_fail("embedding")
+        return self._embed(text)
+
+    def _embed(self, text):
+        vector = [0.0] * self.dim
+        for word in re.findall(r"\w+", text.lower()):
+            vector[int(hashlib.md5(word.encode("utf-8")).hexdigest(), 16) % self.dim] += 1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+
+class SimulatedLLM(LLM):
+    """LangChain LLM backed by the SimulatedEngine, for the question answering chain of the VectorMemory.
+    """
+
+    model_name: str = "gpt-3.5-turbo"
+
+    @property
+    def _llm_type(self) -> str:
+        return "simulated"
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None) -> str:
+        engine = EnginePool.get(SimulatedEngine, self.model_name, 0.0, 1000)
+        return engine.call_model([{"role": "user", "content": prompt}])
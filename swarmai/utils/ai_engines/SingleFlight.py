@@ -0,0 +1,75 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+
+class SingleFlight:
+    """Coalesces identical requests that are in flight at the same time: the first caller (leader) performs the request,
+    the callers with the same key that arrive before it finishes wait for the leader's result instead of sending their own.
+
+    The futures are concurrent.futures.Future, so threads (call) and coroutines (call_async) can wait on the same request,
+    no matter which of them is the leader. Errors of the leader are raised to all the waiting callers.
+    Nothing is kept after the request finished, that's the job of the ResponseCache.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = {} # key -> Future
+        self.leaders = 0
+        self.coalesced = 0
+
+    def call(self, key, function):
+        """Returns function(), or the result of the identical request that is already in flight.
+        """
+        future, is_leader = self._join(key)
+        if not is_leader:
+            return future.result()
+
+        try:
+            result = function()
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result=result)
+        return result
+
+    async def call_async(self, key, coroutine_function):
+        """Coroutine version of call.
+        """
+        future, is_leader = self._join(key)
+        if not is_leader:
+            # shielded, so that a cancelled follower doesn't cancel the request of the leader
+            return await asyncio.shield(asyncio.wrap_future(future))
+
+        try:
+            result = await coroutine_function()
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result=result)
+        return result
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return {"requests": self.leaders, "coalesced": self.coalesced, "in_flight": len(self.in_flight)}
+
+    def _join(self, key):
+        with self.lock:
+            future = self.in_flight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = Future()
+            self.in_flight[key] = future
+            self.leaders += 1
+            return future, True
+
+    def _finish(self, key, future, result=None, error=None):
+        with self.lock:
+            del self.in_flight[key]
+        if error is None:
+            future.set_result(result)
+        elif isinstance(error, Exception):
+            future.set_exception(error)
+        else:
+            # the leader was cancelled or interrupted, the followers (e.g. agent threads) should only see a regular failure
+            future.set_exception(RuntimeError(f"The coalesced request was interrupted: {type(error).__name__}"))
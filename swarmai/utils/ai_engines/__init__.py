@@ -1,3 +1,10 @@
 from .EngineBase import EngineBase
 from .GPTConversEngine import GPTConversEngine
-from .LanchainGoogleEngine import LanchainGoogleEngine
\ No newline at end of file
+from .LanchainGoogleEngine import LanchainGoogleEngine
+from .ResponseCache import ResponseCache
+from .RateLimiter import RateLimiter, RetryPolicy
+from .EnginePool import EnginePool
+from .SingleFlight import SingleFlight
+from .ContextPacker import ContextPacker
+from .RoutingEngine import RoutingEngine
+from .SimulatedEngine import Simulation, SimulatedEngine, SimulatedSearchEngine, SimulatedEmbeddings, SimulatedLLM
\ No newline at end of file
@@ -0,0 +1,44 @@
+import uuid
+
+import numpy as np
+from langchain.vectorstores import Chroma
+
+class ChromaStore:
+    """Vector store of the VectorMemory on a persistent Chroma db (duckdb + parquet in loc), same interface as the NumpyVectorStore.
+    """
+
+    # the duckdb connection of Chroma 0.3 is not safe for concurrent queries, so the reads are exclusive too (but short)
+    concurrent_reads = False
+
+    # placeholder document that the older versions inserted every time the db was opened
+    _PLACEHOLDER = "init"
+
+    def __init__(self, loc, embeddings):
+        self.db = Chroma(embedding_function=embeddings, persist_directory=str(loc))
+        self._remove_placeholders()
+
+    def _remove_placeholders(self):
+        """Deletes the "init" placeholders of a db written by an older version, so they can't be returned by the searches.
+        """
+        results = self.db._collection.get(where_document={"$contains": self._PLACEHOLDER}, include=["documents"])
+        ids = [id for id, text in zip(results["ids"], results["documents"]) if text == self._PLACEHOLDER]
+        if len(ids) > 0:
+            self.db._collection.delete(ids=ids)
+            self.db.persist()
+
+    def add(self, texts, embeddings):
+        self.db._collection.add(embeddings=embeddings, documents=texts, ids=[str(uuid.uuid1()) for _ in texts])
+
+    def count(self) -> int:
+        return self.db._collection.count()
+
+    def query(self, embedding, n_results, include_vectors=False):
+        """Returns the texts of the n_results nearest chunks, their distances and, with include_vectors, their embeddings.
+        """
+        include = ["documents", "distances"] + (["embeddings"] if include_vectors else [])
+        results = self.db._collection.query(query_embeddings=[embedding], n_results=n_results, include=include)
+        vectors = np.array(results["embeddings"][0], dtype=np.float32) if include_vectors else None
+        return results["documents"][0], np.array(results["distances"][0]), vectors
+
+    def persist(self):
+        self.db.persist()
@@ -0,0 +1,227 @@
+import json
+import time
+import hashlib
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from typing import List
+
+import numpy as np
+from langchain.embeddings.base import Embeddings
+
+class EmbeddingCache:
+    """Content-addressed cache of the embeddings, so the chunks that several agents found (and the repeated questions) are embedded once.
+
+    The key is a sha256 of the embedding model and the text. Storage (outside of run_dir, which is wiped on start):
+    - vectors.f32: memory-mapped float32 matrix, one row per entry, grown by doubling up to max_entries
+    - index.bin: memory-mapped (key, last access) per row, the in-memory LRU is rebuilt from it on start
+    - meta.json: dimension of the vectors, the cache is reset if the model's dimension changes
+    Once full, the least recently used row is reused. A row's key is cleared while its vector is overwritten,
+    so an interrupted write is a miss and not a wrong vector.
+
+    Every lookup (get_many) stands for one embedding call: the call is avoided if all the texts are cached. Thread-safe.
+    """
+
+    DEFAULT_PATH = Path.home() / ".cache" / "swarmai" / "embedding_cache"
+    INDEX_DTYPE = np.dtype([("key", "S64"), ("last_access", "f8")])
+    INITIAL_CAPACITY = 1024
+
+    def __init__(self, path=None, max_entries=100000):
+        """
+        Args:
+            - path (str or Path): directory of the cache files, ~/.cache/swarmai/embedding_cache by default. None in the config means default,
+                use ":memory:" for no persistence
+            - max_entries (int): max number of cached embeddings
+        """
+        self.path = Path(path) if path is not None else self.DEFAULT_PATH
+        self.persistent = str(self.path) != ":memory:"
+        self.max_entries = max_entries
+
+        self.lock = threading.Lock()
+        self.rows = OrderedDict() # key -> row, least recently used first
+        self.free_rows = [] # unused rows of the files, popped from the end
+        self.dim = None
+        self.vectors = None
+        self.index = None
+        self.hits = 0
+        self.misses = 0
+        self.calls = 0
+        self.calls_avoided = 0
+
+        if self.persistent:
+            self.path.mkdir(parents=True, exist_ok=True)
+            self._load()
+
+    @staticmethod
+    def key(model_name, text) -> str:
+        return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys) -> list:
+        """Returns the cached vectors (np.ndarray), None for the missing keys.
+        """
+        with self.lock:
+            now = time.time()
+            vectors = []
+            for key in keys:
+                row = self.rows.get(key)
+                if row is None:
+                    self.misses += 1
+                    vectors.append(None)
+                    continue
+                self.rows.move_to_end(key)
+                self.index["last_access"][row] = now
+                self.hits += 1
+                vectors.append(np.array(self.vectors[row]))
+            if len(keys) > 0:
+                if any(vector is None for vector in vectors):
+                    self.calls += 1
+                else:
+                    self.calls_avoided += 1
+            return vectors
+
+    def put_many(self, keys, vectors):
+        with self.lock:
+            vectors = np.asarray(vectors, dtype=np.float32)
+            if self.dim != vectors.shape[1]:
+                self._reset(vectors.shape[1])
+            now = time.time()
+            for key, vector in zip(keys, vectors):
+                if key in self.rows:
+                    self.rows.move_to_end(key)
+                    continue
+                row = self._free_row()
+                self.index[row] = (b"", 0.0)
+                self.vectors[row] = vector
+                self.index[row] = (key.encode("ascii"), now)
+                self.rows[key] = row
+
+    def flush(self):
+        with self.lock:
+            if self.persistent and self.vectors is not None:
+                self.vectors.flush()
+                self.index.flush()
+
+    def close(self):
+        self.flush()
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            n_lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / n_lookups if n_lookups > 0 else None,
+                "embedding_calls": self.calls,
+                "embedding_calls_avoided": self.calls_avoided,
+                "entries": len(self.rows),
+            }
+
+    def _free_row(self):
+        """Returns the row for a new entry: the least recently used one if the cache is full, an unused one,
+        or a new one after growing the files. Must be called with the lock held.
+        """
+        if len(self.rows) >= self.max_entries:
+            _, row = self.rows.popitem(last=False)
+            return row
+        if len(self.free_rows) == 0:
+            self._grow(min(2 * len(self.index), self.max_entries))
+        return self.free_rows.pop()
+
+    def _load(self):
+        meta_file = self.path / "meta.json"
+        if not meta_file.exists():
+            return
+        with open(meta_file) as f:
+            self.dim = json.load(f)["dim"]
+        self._open(self._file_capacity())
+        keys = self.index["key"]
+        used = np.flatnonzero(keys != b"")
+        # the least recently used first, the entries beyond max_entries are dropped
+        used = used[np.argsort(self.index["last_access"][used], kind="stable")][-self.max_entries:]
+        for row in used:
+            self.rows[keys[row].decode("ascii")] = int(row)
+        self.free_rows = sorted(set(range(len(self.index))) - set(self.rows.values()), reverse=True)
+
+    def _reset(self, dim):
+        """Drops all the entries, e.g. the first vectors or a model with another dimension. Must be called with the lock held.
+        """
+        self.dim = dim
+        self.rows.clear()
+        if self.persistent:
+            for name in ["vectors.f32", "index.bin"]:
+                (self.path / name).unlink(missing_ok=True)
+            with open(self.path / "meta.json", "w") as f:
+                json.dump({"dim": dim}, f)
+        self.vectors = None
+        self.index = None
+        capacity = min(self.INITIAL_CAPACITY, self.max_entries)
+        self._open(capacity)
+        self.free_rows = list(range(capacity - 1, -1, -1))
+
+    def _grow(self, capacity):
+        old_capacity = len(self.index)
+        if self.persistent:
+            self.vectors.flush()
+            self.index.flush()
+            self._open(capacity)
+        else:
+            vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+            index = np.zeros(capacity, dtype=self.INDEX_DTYPE)
+            vectors[:old_capacity] = self.vectors
+            index[:old_capacity] = self.index
+            self.vectors, self.index = vectors, index
+        self.free_rows = list(range(capacity - 1, old_capacity - 1, -1)) + self.free_rows
+
+    def _open(self, capacity):
+        """(Re)maps the files with capacity rows, extending them with empty rows if needed.
+        """
+        if not self.persistent:
+            self.vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+            self.index = np.zeros(capacity, dtype=self.INDEX_DTYPE)
+            return
+        for name, row_bytes in [("vectors.f32", 4 * self.dim), ("index.bin", self.INDEX_DTYPE.itemsize)]:
+            with open(self.path / name, "ab") as f:
+                if f.tell() < capacity * row_bytes:
+                    f.truncate(capacity * row_bytes)
+        self.vectors = np.memmap(self.path / "vectors.f32", dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+        self.index = np.memmap(self.path / "index.bin", dtype=self.INDEX_DTYPE, mode="r+", shape=(capacity,))
+
+    def _file_capacity(self):
+        index_file = self.path / "index.bin"
+        vectors_file = self.path / "vectors.f32"
+        if not index_file.exists() or not vectors_file.exists():
+            return min(self.INITIAL_CAPACITY, self.max_entries)
+        return min(index_file.stat().st_size // self.INDEX_DTYPE.itemsize, vectors_file.stat().st_size // (4 * self.dim))
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings that look up the EmbeddingCache first and embed only the missing texts (each distinct text once).
+    """
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.document_model_name = getattr(embeddings, "document_model_name", None) or self._model_name(embeddings)
+        self.query_model_name = getattr(embeddings, "query_model_name", None) or self._model_name(embeddings)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts, self.document_model_name, self.embeddings.embed_documents)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text], self.query_model_name, lambda texts: [self.embeddings.embed_query(texts[0])])[0]
+
+    def _embed(self, texts, model_name, embed):
+        keys = [self.cache.key(model_name, text) for text in texts]
+        vectors = self.cache.get_many(keys)
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        if len(missing) > 0:
+            embedded = dict(zip(missing, embed(missing)))
+            self.cache.put_many([self.cache.key(model_name, text) for text in missing], [embedded[text] for text in missing])
+            vectors = [vector if vector is not None else np.asarray(embedded[text], dtype=np.float32) for text, vector in zip(texts, vectors)]
+        return [vector.tolist() for vector in vectors]
+
+    @staticmethod
+    def _model_name(embeddings):
+        name = type(embeddings).__name__
+        dim = getattr(embeddings, "dim", None)
+        return f"{name}-{dim}" if dim is not None else name
@@ -0,0 +1,148 @@
+import numpy as np
+
+class IVFIndex:
+    """Inverted file index (IVF-flat) over the rows of the NumpyVectorStore matrix, for approximate nearest neighbour search
+    in large memories (long runs, memory reused across the runs).
+
+    The normalized vectors are clustered by spherical k-means into n_lists lists. A query is compared with the centroids
+    and scans only the rows of the n_probe nearest lists, instead of the whole matrix. New rows are appended to the list of
+    their nearest centroid, and the centroids are retrained once the store has grown retrain_factor times since the last training.
+    Below min_size rows the store searches exactly, the index isn't even built.
+
+    Tuning: recall and latency both grow with n_probe / n_lists (the scanned fraction of the rows). n_lists=None is sqrt(rows)
+    at training time.
+    """
+
+    ASSIGN_CHUNK = 4096 # rows compared with the centroids at once, bounds the memory of the assignment
+
+    def __init__(self, n_lists=None, n_probe=16, min_size=50000, retrain_factor=4, max_train_size=50000, n_iter=10, seed=0):
+        """
+        Args:
+            - n_lists (int): number of lists (clusters), sqrt of the rows at training time if None
+            - n_probe (int): lists scanned per query
+            - min_size (int): rows below which the store searches exactly
+            - retrain_factor (float): the centroids are retrained when the rows grow by this factor since the last training
+            - max_train_size (int): rows sampled for the k-means
+            - n_iter (int): k-means iterations
+            - seed (int): seed of the k-means sampling
+        """
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.min_size = min_size
+        self.retrain_factor = retrain_factor
+        self.max_train_size = max_train_size
+        self.n_iter = n_iter
+        self.rng = np.random.default_rng(seed)
+
+        self.centroids = None
+        self.trained_size = 0
+        self.assignments = np.empty(0, dtype=np.int32) # list of each row, grown by doubling
+        self.size = 0
+        self.list_ids = [] # rows per list, grown by doubling
+        self.list_sizes = None
+
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def needs_training(self, size) -> bool:
+        if not self.is_trained():
+            return size >= self.min_size
+        return size >= self.retrain_factor * self.trained_size
+
+    def train(self, vectors):
+        """Clusters the rows and (re)builds the lists of all of them.
+        """
+        n_lists = self.n_lists or max(1, int(np.sqrt(len(vectors))))
+        n_lists = min(n_lists, len(vectors))
+        sample = vectors[np.sort(self.rng.choice(len(vectors), min(len(vectors), max(self.max_train_size, n_lists)), replace=False))]
+        sample = np.asarray(sample, dtype=np.float32)
+        centroids = sample[self.rng.choice(len(sample), n_lists, replace=False)].copy()
+        for _ in range(self.n_iter):
+            assignments = self._assign(sample, centroids)
+            order = np.argsort(assignments, kind="stable")
+            lists, starts = np.unique(assignments[order], return_index=True)
+            centroids[lists] = np.add.reduceat(sample[order], starts, axis=0)
+            # empty lists restart from random rows
+            empty = np.setdiff1d(np.arange(n_lists), lists)
+            centroids[empty] = sample[self.rng.choice(len(sample), len(empty), replace=False)]
+            centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+
+        self.centroids = centroids
+        self.trained_size = len(vectors)
+        self._clear_lists()
+        self.add(0, vectors)
+
+    def add(self, first_id, vectors):
+        """Appends the rows first_id, first_id + 1, ... to the lists of their nearest centroids.
+        """
+        self._append(first_id, self._assign(vectors, self.centroids))
+
+    def _append(self, first_id, assignments):
+        if self.size + len(assignments) > len(self.assignments):
+            grown = np.empty(max(2 * len(self.assignments), self.size + len(assignments)), dtype=np.int32)
+            grown[:self.size] = self.assignments[:self.size]
+            self.assignments = grown
+        self.assignments[self.size:self.size + len(assignments)] = assignments
+        self.size += len(assignments)
+        order = np.argsort(assignments, kind="stable")
+        lists, starts, counts = np.unique(assignments[order], return_index=True, return_counts=True)
+        ids = first_id + order
+        for l, start, count in zip(lists, starts, counts):
+            size = self.list_sizes[l]
+            if size + count > len(self.list_ids[l]):
+                grown = np.empty(max(2 * len(self.list_ids[l]), size + count), dtype=np.int64)
+                grown[:size] = self.list_ids[l][:size]
+                self.list_ids[l] = grown
+            self.list_ids[l][size:size + count] = ids[start:start + count]
+            self.list_sizes[l] = size + count
+
+    def search(self, vectors, query, k):
+        """Returns the rows of the (approximately) k nearest vectors to the normalized query and their similarities, the nearest first.
+        More lists than n_probe are scanned if they hold less than k rows.
+        """
+        centroid_similarities = self.centroids @ query
+        n_probe = min(self.n_probe, len(self.centroids))
+        probe = np.argpartition(-centroid_similarities, n_probe - 1)[:n_probe]
+        if self.list_sizes[probe].sum() < k:
+            order = np.argsort(-centroid_similarities)
+            n_probe = int(np.searchsorted(np.cumsum(self.list_sizes[order]), k)) + 1
+            probe = order[:n_probe]
+        ids = np.concatenate([self.list_ids[l][:self.list_sizes[l]] for l in probe])
+        similarities = vectors[ids] @ query
+        k = min(k, len(ids))
+        top = np.argpartition(-similarities, k - 1)[:k]
+        top = top[np.argsort(-similarities[top], kind="stable")]
+        return ids[top], similarities[top]
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            np.savez(f, centroids=self.centroids, assignments=self.assignments[:self.size], trained_size=self.trained_size)
+
+    def load(self, path, size) -> bool:
+        """Restores the index saved for the first size rows. Returns False if there is no such index (it must be trained again).
+        """
+        if not path.exists():
+            return False
+        state = np.load(path)
+        if len(state["assignments"]) != size:
+            return False
+        self.centroids = state["centroids"]
+        self.trained_size = int(state["trained_size"])
+        self._clear_lists()
+        self._append(0, state["assignments"].astype(np.int32))
+        return True
+
+    def _clear_lists(self):
+        self.assignments = np.empty(0, dtype=np.int32)
+        self.size = 0
+        self.list_ids = [np.empty(16, dtype=np.int64) for _ in range(len(self.centroids))]
+        self.list_sizes = np.zeros(len(self.centroids), dtype=np.int64)
+
+    def _assign(self, vectors, centroids):
+        """Nearest centroid of every row, in chunks of ASSIGN_CHUNK rows.
+        """
+        assignments = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), self.ASSIGN_CHUNK):
+            chunk = np.asarray(vectors[start:start + self.ASSIGN_CHUNK], dtype=np.float32)
+            assignments[start:start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+        return assignments
@@ -0,0 +1,159 @@
+import os
+import json
+from pathlib import Path
+
+import numpy as np
+
+from swarmai.utils.memory.IVFIndex import IVFIndex
+
+def maximal_marginal_relevance(query_embedding, embeddings, k=4, lambda_mult=0.5) -> list:
+    """Indices of the k embeddings selected by maximal marginal relevance, same selection as langchain's,
+    but with the similarities computed by two matrix products instead of pairwise in every step.
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    if len(embeddings) == 0 or k <= 0:
+        return []
+    embeddings = embeddings / _norms(embeddings)
+    query_embedding = np.asarray(query_embedding, dtype=np.float32)
+    relevance = embeddings @ (query_embedding / (np.linalg.norm(query_embedding) or 1.0))
+    similarity = embeddings @ embeddings.T
+
+    selected = []
+    redundancy = np.zeros(len(embeddings), dtype=np.float32) # max similarity to the selected ones
+    for _ in range(min(k, len(embeddings))):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[selected] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        np.maximum(redundancy, similarity[best], out=redundancy)
+    return selected
+
+def _norms(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return norms
+
+
+class NumpyVectorStore:
+    """Vector store of the VectorMemory on a contiguous float32 matrix of the L2-normalized embeddings, for the memories of one run
+    (thousands of chunks), without the startup and per-write costs of Chroma.
+
+    Search is one matrix-vector product and argpartition for the top k. The matrix is grown by doubling,
+    so adding is amortized O(1) per chunk. The distances are the squared L2 of the normalized vectors (2 - 2 cos),
+    the same scale as Chroma's default, so the distance thresholds of the searches don't change.
+
+    Files in loc: vectors.f32 (np.memmap of the matrix), texts.jsonl (one chunk per line) and meta.json (dimension and number
+    of persisted chunks, written last, so the chunks of an interrupted persist are ignored on load).
+    With ann (kwargs of the IVFIndex), the searches of large stores are approximate: they scan only the nearest lists of an
+    IVF index (ivf.npz), exact below ann["min_size"] rows.
+    Not thread-safe, the VectorMemory guards it: concurrent queries are fine, adding is exclusive.
+    """
+
+    concurrent_reads = True
+    INITIAL_CAPACITY = 1024
+
+    def __init__(self, loc, ann=None):
+        """
+        Args:
+            - loc (str or Path): directory of the files
+            - ann (dict): kwargs of the IVFIndex for approximate search, exact search only if None
+        """
+        self.loc = Path(loc)
+        self.loc.mkdir(parents=True, exist_ok=True)
+        self.dim = None
+        self.vectors = None # memmap of capacity rows, the first size are used
+        self.size = 0
+        self.texts = []
+        self.persisted_size = 0
+        self.index = IVFIndex(**ann) if ann is not None else None
+        self._load()
+
+    def add(self, texts, embeddings):
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+            self._open(self.INITIAL_CAPACITY)
+        if self.size + len(vectors) > len(self.vectors):
+            capacity = len(self.vectors)
+            while capacity < self.size + len(vectors):
+                capacity *= 2
+            self._open(capacity)
+        first = self.size
+        self.vectors[first:first + len(vectors)] = vectors / _norms(vectors)
+        self.texts += texts
+        self.size += len(vectors)
+        if self.index is not None:
+            if self.index.needs_training(self.size):
+                self.index.train(self.vectors[:self.size])
+            elif self.index.is_trained():
+                self.index.add(first, self.vectors[first:self.size])
+
+    def count(self) -> int:
+        return self.size
+
+    def query(self, embedding, n_results, include_vectors=False):
+        """Returns the texts of the n_results nearest chunks, their distances and, with include_vectors, their normalized embeddings.
+        """
+        n_results = min(n_results, self.size)
+        if n_results <= 0:
+            return [], np.empty(0, dtype=np.float32), np.empty((0, self.dim or 0), dtype=np.float32) if include_vectors else None
+        query = np.asarray(embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        if self.index is not None and self.index.is_trained():
+            top, similarities = self.index.search(self.vectors, query, n_results)
+        else:
+            similarities = self.vectors[:self.size] @ query
+            top = np.argpartition(-similarities, n_results - 1)[:n_results]
+            top = top[np.argsort(-similarities[top], kind="stable")]
+            similarities = similarities[top]
+        distances = 2 - 2 * similarities
+        vectors = np.array(self.vectors[top]) if include_vectors else None
+        return [self.texts[i] for i in top], distances, vectors
+
+    def persist(self):
+        if self.vectors is None or self.persisted_size == self.size:
+            return
+        self.vectors.flush()
+        with open(self.loc / "texts.jsonl", "a") as f:
+            for text in self.texts[self.persisted_size:self.size]:
+                f.write(json.dumps(text) + "\n")
+        if self.index is not None and self.index.is_trained():
+            self.index.save(self.loc / "ivf.npz")
+        meta_file = self.loc / "meta.json"
+        with open(meta_file.with_suffix(".tmp"), "w") as f:
+            json.dump({"dim": self.dim, "size": self.size}, f)
+        os.replace(meta_file.with_suffix(".tmp"), meta_file)
+        self.persisted_size = self.size
+
+    def _load(self):
+        meta_file = self.loc / "meta.json"
+        if not meta_file.exists():
+            # chunks of an interrupted first persist
+            (self.loc / "texts.jsonl").unlink(missing_ok=True)
+            return
+        with open(meta_file) as f:
+            meta = json.load(f)
+        self.dim = meta["dim"]
+        with open(self.loc / "texts.jsonl") as f:
+            self.texts = [json.loads(line) for _, line in zip(range(meta["size"]), f)]
+        self.size = self.persisted_size = len(self.texts)
+        capacity = self.INITIAL_CAPACITY
+        while capacity < self.size:
+            capacity *= 2
+        self._open(capacity)
+        if self.index is not None and not self.index.load(self.loc / "ivf.npz", self.size) and self.index.needs_training(self.size):
+            self.index.train(self.vectors[:self.size])
+        # drop the lines of an interrupted persist, so the next one appends after the persisted chunks
+        with open(self.loc / "texts.jsonl", "w") as f:
+            f.writelines(json.dumps(text) + "\n" for text in self.texts)
+
+    def _open(self, capacity):
+        """(Re)maps vectors.f32 with capacity rows, extending the file if needed.
+        """
+        if self.vectors is not None:
+            self.vectors.flush()
+        vectors_file = self.loc / "vectors.f32"
+        with open(vectors_file, "ab") as f:
+            if f.tell() < capacity * 4 * self.dim:
+                f.truncate(capacity * 4 * self.dim)
+        self.vectors = np.memmap(vectors_file, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
@@ -0,0 +1,40 @@
+import threading
+from contextlib import contextmanager
+
+class ReadWriteLock:
+    """Many readers or one writer. A waiting writer blocks the new readers, so a steady stream of searches can't starve the writes.
+    Not reentrant.
+    """
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.readers = 0
+        self.writer = False
+        self.waiting_writers = 0
+
+    @contextmanager
+    def read(self):
+        with self.cond:
+            self.cond.wait_for(lambda: not self.writer and self.waiting_writers == 0)
+            self.readers += 1
+        try:
+            yield
+        finally:
+            with self.cond:
+                self.readers -= 1
+                if self.readers == 0:
+                    self.cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self.cond:
+            self.waiting_writers += 1
+            self.cond.wait_for(lambda: not self.writer and self.readers == 0)
+            self.waiting_writers -= 1
+            self.writer = True
+        try:
+            yield
+        finally:
+            with self.cond:
+                self.writer = False
+                self.cond.notify_all()
@@ -1,67 +1,236 @@
+import time
 import threading
-from langchain.vectorstores import Chroma
 from langchain.embeddings.openai import OpenAIEmbeddings
 from langchain.text_splitter import CharacterTextSplitter
 from pathlib import Path
 from langchain.chat_models import ChatOpenAI
-from langchain.chains import RetrievalQA
 from langchain.chains.question_answering import load_qa_chain
+from langchain.docstore.document import Document
 
-def synchronized_mem(method):
+from swarmai.utils.memory.EmbeddingCache import CachedEmbeddings
+from swarmai.utils.memory.ReadWriteLock import ReadWriteLock
+from swarmai.utils.memory.ChromaStore import ChromaStore
+from swarmai.utils.memory.NumpyVectorStore import NumpyVectorStore, maximal_marginal_relevance
+
+def catch_mem_errors(method):
     def wrapper(self, *args, **kwargs):
-        with self.lock:
-            try:
-                return method(self, *args, **kwargs)
-            except Exception as e:
-                print(f"Failed to execute {method.__name__}: {e}")
+        try:
+            return method(self, *args, **kwargs)
+        except Exception as e:
+            print(f"Failed to execute {method.__name__}: {e}")
     return wrapper
 
 class VectorMemory:
-    """Simple vector memory implementation using langchain and Chroma"""
+    """Simple vector memory implementation using langchain and a vector store: Chroma (ChromaStore) or a NumPy matrix (NumpyVectorStore)
+
+    Writes are buffered: add_entry only splits the entry and queues the chunks. A writer thread embeds them in batches
+    (one embedding call per batch_size chunks) and persists the db by group commit, after persist_every chunks or persist_interval seconds.
+    Searches see all the entries added before them (read your writes) without writing the buffer themselves: every chunk gets a sequence
+    number, and a search wakes the writer and waits until all the chunks queued before it are in the db (the committed watermark),
+    i.e. at most for the batches in progress, not for flush_interval. flush() makes all the added entries searchable, close() also persists them.
+
+    Concurrency: the store is guarded by a ReadWriteLock. Writes hold it only to add the already embedded chunks and to persist,
+    searches only for the query on the store (shared if the store supports concurrent reads). Embedding the chunks and the queries,
+    the MMR re-ranking and the answer of ask_question run without any lock, so a slow question doesn't block the other agents.
+    """
 
-    def __init__(self, loc=None, chunk_size=1000, chunk_overlap_frac=0.1, *args, **kwargs):
+    BACKENDS = ["chroma", "numpy"]
+
+    def __init__(self, loc=None, chunk_size=1000, chunk_overlap_frac=0.1, embeddings=None, qa_llm=None, embedding_cache=None,
+                 batch_size=64, flush_interval=1.0, persist_every=256, persist_interval=30.0, backend="chroma", ann=None,
+                 search_wait_timeout=30.0, *args, **kwargs):
+        """
+        Args:
+            - backend (str): vector store, "chroma" or "numpy" (faster to start, add and search for the thousands of chunks of a run)
+            - ann (dict): numpy backend only, kwargs of the IVFIndex for approximate search in large memories
+            - embeddings (langchain Embeddings): OpenAIEmbeddings by default
+            - qa_llm (langchain LLM): model of the question answering chain, gpt-3.5-turbo by default
+            - embedding_cache (EmbeddingCache): if set, the chunks and the queries are embedded only if they are not in the cache
+            - batch_size (int): max chunks embedded per call
+            - flush_interval (float): seconds the chunks wait in the buffer for a full batch
+            - persist_every (int): chunks written to the db before it's persisted
+            - persist_interval (float): seconds after which the written chunks are persisted anyway
+            - search_wait_timeout (float): max seconds a search waits for the entries added before it (e.g. the embedding api is down),
+                then it searches the chunks already in the db
+        """
         if loc is None:
             loc = "./tmp/vector_memory"
         self.loc = Path(loc)
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_size*chunk_overlap_frac
-        self.embeddings = OpenAIEmbeddings()
+        self.embeddings = embeddings if embeddings is not None else OpenAIEmbeddings()
+        if embedding_cache is not None:
+            self.embeddings = CachedEmbeddings(self.embeddings, embedding_cache)
+        self.qa_llm = qa_llm
         self.count = 0
-        self.lock = threading.Lock()
-
-        self.db = self._init_db()
-        self.qa = self._init_retriever()
-
-    def _init_db(self):
-        texts = ["init"] # TODO find how to initialize Chroma without any text
-        chroma_db = Chroma.from_texts(
-            texts=texts,
-            embedding=self.embeddings,
-            persist_directory=str(self.loc),
-        )
-        self.count = chroma_db._collection.count()
-        return chroma_db
-    
-    def _init_retriever(self):
-        model = ChatOpenAI(model='gpt-3.5-turbo', temperature=0)
-        qa_chain = load_qa_chain(model, chain_type="stuff")
-        retriever = self.db.as_retriever(search_type="mmr", search_kwargs={"k":10})
-        qa = RetrievalQA(combine_documents_chain=qa_chain, retriever=retriever)
-        return qa
+        self.lock = ReadWriteLock()
+        self.text_splitter = CharacterTextSplitter(chunk_size=self.chunk_size, chunk_overlap=self.chunk_overlap, separator=" ")
+
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.persist_every = persist_every
+        self.persist_interval = persist_interval
+        self.search_wait_timeout = search_wait_timeout
+        self.pending = [] # (sequence number, chunk) that are not in the db yet, in the order of the sequence numbers
+        self.pending_cond = threading.Condition()
+        self.queued = 0 # sequence number of the next chunk
+        self.writing = set() # first sequence numbers of the batches being embedded and added to the db
+        self.search_waiters = 0 # searches waiting for the committed watermark
+        self.unpersisted = 0 # chunks in the db since the last persist
+        self.last_persist = time.monotonic()
+        self.closed = False
+
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Backend {backend} is not supported. Supported backends are: {self.BACKENDS}")
+        if ann is not None and backend != "numpy":
+            raise ValueError("Approximate search (ann) requires the numpy backend")
+        self.store = ChromaStore(self.loc, self.embeddings) if backend == "chroma" else NumpyVectorStore(self.loc, ann=ann)
+        self.count = self.store.count()
+        self.qa = self._init_qa_chain()
+        self.writer = threading.Thread(target=self._writer_loop, name="VectorMemory writer", daemon=True)
+        self.writer.start()
+
+    def _init_qa_chain(self):
+        model = self.qa_llm if self.qa_llm is not None else ChatOpenAI(model='gpt-3.5-turbo', temperature=0)
+        return load_qa_chain(model, chain_type="stuff")
     
-    @synchronized_mem
+    @catch_mem_errors
     def add_entry(self, entry: str):
-        """Add an entry to the internal memory.
+        """Add an entry to the internal memory. The entry is embedded and persisted in the background (see the class docstring).
         """
-        text_splitter = CharacterTextSplitter(chunk_size=self.chunk_size, chunk_overlap=self.chunk_overlap, separator=" ")
-        texts = text_splitter.split_text(entry)
-
-        self.db.add_texts(texts)
-        self.count += self.db._collection.count()
-        self.db.persist()
+        texts = self.text_splitter.split_text(entry)
+        with self.pending_cond:
+            if self.closed:
+                raise RuntimeError("The memory is closed")
+            self.pending += [(self.queued + i, text) for i, text in enumerate(texts)]
+            self.queued += len(texts)
+            if len(self.pending) >= self.batch_size:
+                # notify_all: the searches wait on the same condition
+                self.pending_cond.notify_all()
         return True
-    
-    @synchronized_mem
+
+    def flush(self):
+        """Writes the pending chunks to the db and persists it.
+        """
+        self._write_pending(wait=True)
+        self._persist()
+
+    def close(self):
+        """Stops the writer and flushes the pending writes. Called by the swarm on shutdown.
+        """
+        with self.pending_cond:
+            if self.closed:
+                return
+            self.closed = True
+            self.pending_cond.notify_all()
+        self.writer.join()
+        self.flush()
+
+    def _writer_loop(self):
+        while True:
+            with self.pending_cond:
+                # wait for a full batch or a waiting search, or write what is there after flush_interval
+                self.pending_cond.wait_for(lambda: self.closed or len(self.pending) >= self.batch_size or (self.search_waiters > 0 and len(self.pending) > 0),
+                                           timeout=self.flush_interval)
+                if self.closed:
+                    return
+            try:
+                self._write_pending()
+                if self.unpersisted >= self.persist_every or (self.unpersisted > 0 and time.monotonic() - self.last_persist >= self.persist_interval):
+                    self._persist()
+            except Exception as e:
+                print(f"Failed to write the memory: {e}")
+                time.sleep(self.flush_interval)
+
+    def _write_pending(self, wait=False):
+        """Embeds the pending chunks in batches and adds them to the db. Called by the writer thread and by flush.
+
+        Args:
+            - wait (bool): also wait for the batches that other threads are writing, so that all the entries added so far are in the db
+        """
+        while True:
+            with self.pending_cond:
+                batch = self.pending[:self.batch_size]
+                del self.pending[:self.batch_size]
+                if len(batch) == 0:
+                    if wait:
+                        self.pending_cond.wait_for(lambda: len(self.writing) == 0)
+                    return
+                first = batch[0][0]
+                self.writing.add(first)
+            texts = [text for _, text in batch]
+            try:
+                embeddings = self.embeddings.embed_documents(texts)
+                with self.lock.write():
+                    self.store.add(texts, embeddings)
+                    self.unpersisted += len(texts)
+            except Exception:
+                # keep the chunks for the next attempt, other batches may have been taken in the meantime
+                with self.pending_cond:
+                    self.pending[:0] = batch
+                    self.pending.sort(key=lambda chunk: chunk[0])
+                raise
+            finally:
+                with self.pending_cond:
+                    self.writing.discard(first)
+                    self.pending_cond.notify_all()
+
+    def _committed(self):
+        """Returns the committed watermark: all the chunks with a lower sequence number are in the db. Must be called with pending_cond held.
+        """
+        committed = self.pending[0][0] if self.pending else self.queued
+        if self.writing:
+            committed = min(committed, min(self.writing))
+        return committed
+
+    def _wait_committed(self, target):
+        """Waits until the chunks with a sequence number below target are in the db. The writer is woken up to write them right away.
+        """
+        with self.pending_cond:
+            if self.closed or self._committed() >= target:
+                # after close there is no writer, flush has written everything it could
+                return
+            self.search_waiters += 1
+            self.pending_cond.notify_all()
+            try:
+                if not self.pending_cond.wait_for(lambda: self._committed() >= target, timeout=self.search_wait_timeout):
+                    print(f"The latest memory entries are not written after {self.search_wait_timeout} s, searching without them")
+            finally:
+                self.search_waiters -= 1
+
+    def _persist(self):
+        with self.lock.write():
+            if self.unpersisted > 0:
+                self.store.persist()
+            self.unpersisted = 0
+            self.last_persist = time.monotonic()
+
+    def _reading(self):
+        return self.lock.read() if self.store.concurrent_reads else self.lock.write()
+
+    def _search(self, query, k, type="mmr", fetch_k=20):
+        """Returns the texts most similar to the query with their distances, k of the fetch_k nearest for "mmr" in the order of their selection.
+        """
+        with self.pending_cond:
+            target = self.queued
+        embedding = self.embeddings.embed_query(query)
+        # read your writes: the entries added before the search, embedded by the writer meanwhile
+        self._wait_committed(target)
+        with self._reading():
+            self.count = self.store.count()
+            k = min(k, self.count)
+            if k <= 0:
+                return []
+            n_results = min(fetch_k, self.count) if type == "mmr" else k
+            texts, distances, vectors = self.store.query(embedding, n_results, include_vectors=type == "mmr")
+
+        results = list(zip(texts, distances))
+        if type == "mmr":
+            selected = maximal_marginal_relevance(embedding, vectors, k=k)
+            results = [results[i] for i in selected]
+        return results
+
+    @catch_mem_errors
     def search_memory(self, query: str, k=10, type="mmr", distance_threshold=0.5):
         """Searching the vector memory for similar entries
         
@@ -74,22 +243,20 @@ class VectorMemory:
         Returns:
             - texts (list[str]): a list of the top k results
         """
-        self.count = self.db._collection.count()
-        if k > self.count:
-            k = self.count - 1
-        if k <= 0:
+        if type not in ["mmr", "cos"]:
+            raise ValueError(f"Search type {type} is not supported. Supported types are: mmr, cos")
+        results = self._search(query, k, type)
+        if len(results) == 0:
             return None
 
         if type == "mmr":
-            texts = self.db.max_marginal_relevance_search(query=query, k=k, fetch_k = min(20,self.count))
-            texts = [text.page_content for text in texts]
+            texts = [text for text, _ in results]
         elif type == "cos":
-            texts = self.db.similarity_search_with_score(query=query, k=k)
-            texts = [text[0].page_content for text in texts if text[-1] < distance_threshold]
+            texts = [text for text, distance in results if distance < distance_threshold]
 
         return texts
     
-    @synchronized_mem
+    @catch_mem_errors
     def ask_question(self, question: str):
         """Ask a question to the vector memory
         
@@ -99,5 +266,7 @@ class VectorMemory:
         Returns:
             - answer (str): the answer to the question
         """
-        answer = self.qa.run(question)
+        documents = [Document(page_content=text) for text, _ in self._search(question, k=10, type="mmr")]
+        # the model answers outside of the lock
+        answer = self.qa.run(input_documents=documents, question=question)
         return answer
@@ -1 +1,5 @@
-from .VectorMemory import VectorMemory
\ No newline at end of file
+from .VectorMemory import VectorMemory
+from .EmbeddingCache import EmbeddingCache, CachedEmbeddings
+from .NumpyVectorStore import NumpyVectorStore
+from .ChromaStore import ChromaStore
+from .IVFIndex import IVFIndex
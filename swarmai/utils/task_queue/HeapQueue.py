@@ -0,0 +1,522 @@
+import uuid
+import time
+import heapq
+import itertools
+import threading
+from collections import Counter
+from datetime import datetime
+
+from swarmai.utils.task_queue.TaskQueueBase import TaskQueueBase
+from swarmai.utils.task_queue.Task import Task
+from swarmai.utils.task_queue.SchedulingPolicy import PriorityPolicy
+from swarmai.utils.task_queue.TaskDependencyGraph import TaskDependencyGraph
+from swarmai.agents.AgentBase import AgentBase
+
+class HeapQueue(TaskQueueBase):
+    """In-memory task queue with one priority heap per task type and a task_id -> record dictionary.
+    Drop-in replacement for the PandasQueue: same statuses, same agent-type association and the same timestamps,
+    but claiming, completing and resetting a task are O(log n) instead of copying and sorting the whole DataFrame.
+
+    Heap entries are (key, sequence number, task_id), the key is given by the scheduling policy (by default (-priority, sequence number),
+    i.e. strict priority and FIFO between equal priorities). The policy also decides which task type is served next, see SchedulingPolicy.
+    The sequence number allows to lazily drop stale entries: an entry is only valid if the record is still pending and has the same sequence number.
+
+    Records have the same columns as in the PandasQueue:
+    - task_id, priority, task_type, task_description, status, add_time, claim_time, complete_time, claim_agent_id
+
+    If a TaskQueueWAL is provided, every event is logged and the queue is rebuilt from the log on start:
+    tasks that were in progress go back to pending, completed tasks stay completed.
+
+    If lease_duration is set, every claim is a lease: the claiming agent has to renew it (renew_lease) before it expires,
+    otherwise a background reaper puts the task back to pending. Each claim gets a new fencing token, and complete_task/reset_task
+    with an outdated token are rejected, so an abandoned job can't complete or reset a task that was handed to another agent.
+
+    If a TaskDeduplicator is provided, add_task suppresses near-duplicates of pending, in progress or recently completed tasks of the same type.
+
+    Tasks with depends_on are added as "blocked" and only pushed to the heap when the last of their parents completes,
+    or after dependency_timeout seconds if a parent never completes, see TaskDependencyGraph.
+    Tasks with dependencies are never suppressed as near-duplicates, the dependencies would be lost.
+    """
+
+    def __init__(self, task_types: list, agent_types: list, task_association: dict, wal=None, lease_duration=None, reap_interval=1, deduplicator=None, scheduling_policy=None, dependency_timeout=600):
+        """
+        Task association is a dictionary that returns a list of task_types for a given agent_type.
+
+        Attributes:
+            - task_types (list[str]): list of task types that are supported by the task queue
+            - agent_types (list[str]): list of agent types that are supported by the task queue
+            - task_association (dict): dictionary that returns a list of task_types for a given agent_type
+            - wal (TaskQueueWAL): optional write-ahead log to persist the queue to and to resume from
+            - lease_duration (float or dict): seconds a claim stays valid without renewal. Either one value for all task types
+                or a dict task_type -> seconds, with an optional "default" key. None disables the leases.
+            - reap_interval (float): how often the reaper checks for expired leases, in seconds
+            - deduplicator (TaskDeduplicator): optional index of the task descriptions to suppress near-duplicate tasks
+            - scheduling_policy (SchedulingPolicy): order in which the tasks are handed out, PriorityPolicy by default
+            - dependency_timeout (float): seconds after which a blocked task is released even if its parents didn't complete.
+                None blocks until they complete
+        """
+        super().__init__()
+        self.columns = ["task_id", "priority", "task_type", "task_description", "status", "add_time", "claim_time", "complete_time", "claim_agent_id"]
+        self.task_types = task_types
+        self.agent_types = agent_types
+        self.task_association = task_association
+
+        self.tasks = {} # task_id -> record
+        self.heaps = {task_type: [] for task_type in self.task_types}
+        self._heap_seq = {} # task_id -> sequence number of the valid heap entry
+        self._counter = itertools.count()
+        self.scheduling_policy = scheduling_policy if scheduling_policy is not None else PriorityPolicy()
+
+        self.lease_duration = lease_duration
+        self._leases = [] # heap of (lease expiry, task_id, fencing token), lazily invalidated
+        self._fencing_counter = itertools.count(1)
+
+        self.deduplicator = deduplicator
+        self.dependencies = TaskDependencyGraph()
+        self.dependency_timeout = dependency_timeout
+
+        self.wal = wal
+        self.resumed = False
+        if self.wal is not None:
+            self._restore(self.wal.replay())
+
+        self._reaper_stop = threading.Event()
+        self._reaper = None
+        if self.lease_duration is not None:
+            self._reaper = threading.Thread(target=self._reap_loop, args=(reap_interval,), name="TaskQueueReaper", daemon=True)
+            self._reaper.start()
+
+    def add_task(self, task: Task) -> str:
+        """Adds a task to the queue.
+
+        Returns:
+            - task_id (str): the id assigned to the task. If the task was merged into a near-duplicate, the id of the existing task.
+                None if the task was rejected as a near-duplicate.
+        """
+        prepared = self._prepare(task)
+        with self.lock:
+            self._validate_dependencies(task)
+            task_id, inserted = self._insert(*prepared)
+            if inserted:
+                self._notify_task_available(task.task_type)
+            return task_id
+
+    def add_tasks(self, tasks: list) -> list:
+        """Adds a list of tasks (e.g. a breakdown into subtasks) under one lock, with one notification per task type.
+        All the tasks are validated first, so either all of them are added or none (ValueError).
+
+        Returns:
+            - task_ids (list[str]): the ids as returned by add_task, in the order of the tasks
+        """
+        prepared = [self._prepare(task) for task in tasks]
+        with self.lock:
+            for task in tasks:
+                self._validate_dependencies(task)
+            task_ids = []
+            n_inserted = Counter()
+            for task, dedup_text, signature in prepared:
+                task_id, inserted = self._insert(task, dedup_text, signature)
+                task_ids.append(task_id)
+                if inserted:
+                    n_inserted[task.task_type] += 1
+
+            for task_type, n in n_inserted.items():
+                self._notify_task_available(task_type, n)
+            return task_ids
+
+    def _prepare(self, task: Task):
+        """Validates the task and computes its deduplication signature. Doesn't need the lock.
+        """
+        self._validate_task(task)
+
+        dedup_text = task.dedup_text if task.dedup_text is not None else task.task_description
+        signature = None
+        if self.deduplicator is not None and self.deduplicator.applies_to(task.task_type) and not task.depends_on:
+            signature = self.deduplicator.signature(dedup_text)
+        return task, dedup_text, signature
+
+    def _insert(self, task: Task, dedup_text, signature):
+        """Inserts a prepared task. Must be called with the lock held.
+
+        Returns:
+            - task_id (str): see add_task
+            - inserted (bool): whether a new pending task was added (blocked tasks are not pending yet)
+        """
+        if signature is not None:
+            duplicate_id = self.deduplicator.find(task.task_type, signature)
+            if duplicate_id is not None:
+                return self._suppress_duplicate(task, duplicate_id), False
+
+        task_id = str(uuid.uuid4())
+        depends_on = [str(parent_id) for parent_id in task.depends_on or []]
+        blocked = self.dependencies.add(task_id, [parent_id for parent_id in depends_on if self.tasks[parent_id]["status"] != "completed"])
+        self.tasks[task_id] = {
+            "task_id": task_id,
+            "priority": task.priority,
+            "task_type": task.task_type,
+            "task_description": task.task_description,
+            "status": "blocked" if blocked else "pending",
+            "add_time": datetime.now(),
+            "ready_time": None,
+            "claim_time": None,
+            "complete_time": None,
+            "claim_agent_id": None,
+            "fencing_token": None,
+            "lease_expiry": None,
+            "dedup_text": dedup_text,
+            "depends_on": depends_on,
+        }
+        if signature is not None:
+            self.deduplicator.add(task.task_type, task_id, signature)
+        if not blocked:
+            self._push(task_id)
+        self._log_event("add", task_id)
+        self.metrics.on_add(task.task_type, blocked=blocked)
+        return task_id, not blocked
+
+    def get_task(self, agent: AgentBase, timeout=0) -> Task:
+        """Gets the next task from the queue, based on the agent type.
+        If there is no pending task, waits up to timeout seconds (None = forever) until add_task or reset_task makes one available.
+        """
+        supported_tasks = self._get_supported_tasks(agent.agent_type)
+        return self._claim_or_wait(agent.agent_type, lambda: self._claim(agent, supported_tasks), timeout)
+
+    def _claim(self, agent: AgentBase, supported_tasks) -> Task:
+        """Claims the best pending task. Must be called with the lock held.
+        """
+        self._reap_expired()
+        self._release_expired_dependencies()
+        task_id = self._pop_best(supported_tasks)
+        if task_id is None:
+            return None
+
+        record = self.tasks[task_id]
+        record["status"] = "in progress"
+        record["claim_time"] = datetime.now()
+        record["claim_agent_id"] = agent.agent_id
+        record["fencing_token"] = next(self._fencing_counter)
+        ready_time = record["ready_time"] if record.get("ready_time") is not None else record["add_time"]
+        self.metrics.on_claim(record["task_type"], (record["claim_time"] - ready_time).total_seconds())
+        lease_duration = self.get_lease_duration(record["task_type"])
+        if lease_duration is not None:
+            record["lease_expiry"] = time.monotonic() + lease_duration
+            heapq.heappush(self._leases, (record["lease_expiry"], task_id, record["fencing_token"]))
+        self._log_event("claim", task_id)
+        return Task(task_id=task_id, priority=record["priority"], task_type=record["task_type"], task_description=record["task_description"], status=record["status"], fencing_token=record["fencing_token"])
+
+    def get_lease_duration(self, task_type):
+        """Returns the lease duration in seconds for the given task type, None if the claims don't expire.
+        """
+        if isinstance(self.lease_duration, dict):
+            return self.lease_duration.get(task_type, self.lease_duration.get("default"))
+        return self.lease_duration
+
+    def renew_lease(self, task_id, fencing_token) -> bool:
+        """Extends the lease of a claimed task. Returns False if the lease was lost (expired and reset, or claimed by someone else).
+        """
+        with self.lock:
+            record = self.tasks.get(task_id)
+            if record is None or record["status"] != "in progress" or record["fencing_token"] != fencing_token:
+                return False
+
+            lease_duration = self.get_lease_duration(record["task_type"])
+            if lease_duration is not None:
+                # the old entry in the lease heap is re-pushed with the new expiry when the reaper reaches it
+                record["lease_expiry"] = time.monotonic() + lease_duration
+            return True
+
+    def complete_task(self, task_id, fencing_token=None):
+        """Completes the task with the given task_id.
+        If the fencing token is given, it must match the current claim of the task.
+        """
+        with self.lock:
+            return self._complete(task_id, fencing_token)
+
+    def complete_tasks(self, task_ids: list, fencing_tokens=None) -> list:
+        """Completes several tasks under one lock. Returns a list of bools, as complete_task.
+        """
+        if fencing_tokens is None:
+            fencing_tokens = [None] * len(task_ids)
+        with self.lock:
+            return [self._complete(task_id, fencing_token) for task_id, fencing_token in zip(task_ids, fencing_tokens)]
+
+    def reset_task(self, task_id: str, fencing_token=None):
+        """Puts the task back to pending, so that another agent can claim it.
+        If the fencing token is given, it must match the current claim of the task.
+        """
+        with self.lock:
+            return self._reset(task_id, fencing_token)
+
+    def reset_tasks(self, task_ids: list, fencing_tokens=None) -> list:
+        """Resets several tasks under one lock. Returns a list of bools, as reset_task.
+        """
+        if fencing_tokens is None:
+            fencing_tokens = [None] * len(task_ids)
+        with self.lock:
+            return [self._reset(task_id, fencing_token) for task_id, fencing_token in zip(task_ids, fencing_tokens)]
+
+    def _complete(self, task_id, fencing_token):
+        """Must be called with the lock held.
+        """
+        record = self.tasks.get(task_id)
+        if record is None:
+            """In case task was deleted from the queue"""
+            return False
+
+        if record["status"] != "in progress":
+            return False
+
+        if fencing_token is not None and record["fencing_token"] != fencing_token:
+            return False
+
+        record["status"] = "completed"
+        record["complete_time"] = datetime.now()
+        self.metrics.on_complete(record["task_type"], (record["complete_time"] - record["claim_time"]).total_seconds())
+        self._log_event("complete", task_id)
+        self._unblock(self.dependencies.complete(task_id))
+        if self.deduplicator is not None:
+            self.deduplicator.on_complete(task_id)
+        return True
+
+    def _reset(self, task_id, fencing_token):
+        """Must be called with the lock held.
+        """
+        record = self.tasks.get(task_id)
+        if record is None:
+            """In case task was deleted from the queue"""
+            return False
+
+        if fencing_token is not None and record["fencing_token"] != fencing_token:
+            return False
+
+        if record["status"] == "blocked":
+            # has to wait for its dependencies anyway
+            return False
+
+        self._reset_record(task_id, "reset")
+        return True
+
+    def close(self):
+        """Stops the lease reaper, compacts and closes the write-ahead log, if there is one.
+        """
+        self._reaper_stop.set()
+        if self._reaper is not None:
+            self._reaper.join()
+
+        with self.lock:
+            if self.wal is not None:
+                self.wal.compact(self.tasks)
+                self.wal.close()
+                self.wal = None
+
+    def to_dataframe(self):
+        """Exports the tasks as a pandas DataFrame with the same columns as the PandasQueue.
+        """
+        import pandas as pd
+
+        with self.lock:
+            rows = [[record[column] for column in self.columns] for record in self.tasks.values()]
+        return pd.DataFrame(rows, columns=self.columns)
+
+    def get_all_tasks(self):
+        """Returns all tasks in the queue.
+        """
+        with self.lock:
+            return [dict(record) for record in self.tasks.values()]
+
+    def _validate_task(self, task: Task):
+        if task.task_type not in self.task_types:
+            raise ValueError(f"Task type {task.task_type} is not supported.")
+
+        if task.task_description is None:
+            raise ValueError(f"Task description {task.task_description} is not valid.")
+
+        if isinstance(task.task_description, str) == False:
+            raise ValueError(f"Task description {task.task_description} is not valid.")
+
+        if task.task_description == "":
+            raise ValueError(f"Task description {task.task_description} is not valid.")
+
+    def _validate_dependencies(self, task: Task):
+        """Must be called with the lock held.
+        """
+        for parent_id in task.depends_on or []:
+            if str(parent_id) not in self.tasks:
+                raise ValueError(f"Task {task.task_description[:20]}... depends on the task {parent_id} that is not in the queue.")
+
+    def _unblock(self, task_ids):
+        """Makes the tasks whose dependencies completed claimable. Must be called with the lock held.
+        """
+        n_ready = Counter()
+        for task_id in task_ids:
+            record = self.tasks[task_id]
+            record["status"] = "pending"
+            record["ready_time"] = datetime.now()
+            self._push(task_id)
+            self._log_event("unblock", task_id)
+            self.metrics.on_unblock(record["task_type"])
+            n_ready[record["task_type"]] += 1
+
+        for task_type, n in n_ready.items():
+            self._notify_task_available(task_type, n)
+
+    def _suppress_duplicate(self, task: Task, duplicate_id):
+        """Counts the suppressed task and, in merge mode, raises the priority of the pending duplicate. Must be called with the lock held.
+        """
+        self.deduplicator.suppressed[task.task_type] += 1
+        if self.deduplicator.mode == "reject":
+            return None
+
+        record = self.tasks[duplicate_id]
+        if record["status"] == "pending" and task.priority > record["priority"]:
+            record["priority"] = task.priority
+            self._push(duplicate_id) # the old heap entry becomes stale
+            self._log_event("merge", duplicate_id)
+        return duplicate_id
+
+    def _reset_record(self, task_id, event):
+        """Puts the task back to pending. Must be called with the lock held.
+        """
+        record = self.tasks[task_id]
+        was_pending = record["status"] == "pending"
+        if record["status"] == "in progress":
+            self.metrics.on_reset(record["task_type"], expired=event == "expire")
+        elif record["status"] == "completed":
+            self.metrics.on_add(record["task_type"])
+        record["status"] = "pending"
+        record["claim_time"] = None
+        record["complete_time"] = None
+        record["claim_agent_id"] = None
+        record["lease_expiry"] = None
+        if not was_pending:
+            self._push(task_id)
+            self._log_event(event, task_id)
+            self._notify_task_available(record["task_type"])
+
+    def _reap_expired(self):
+        """Returns the tasks with expired leases to pending. Must be called with the lock held.
+        """
+        now = time.monotonic()
+        while self._leases and self._leases[0][0] <= now:
+            _, task_id, fencing_token = heapq.heappop(self._leases)
+            record = self.tasks.get(task_id)
+            if record is None or record["status"] != "in progress" or record["fencing_token"] != fencing_token:
+                continue
+            if record["lease_expiry"] > now:
+                # the lease was renewed in the meantime
+                heapq.heappush(self._leases, (record["lease_expiry"], task_id, fencing_token))
+                continue
+            self._reset_record(task_id, "expire")
+
+    def _release_expired_dependencies(self):
+        """Makes the tasks that waited longer than dependency_timeout for their parents claimable. Must be called with the lock held.
+        """
+        if self.dependency_timeout is not None:
+            self._unblock(self.dependencies.release_expired(self.dependency_timeout))
+
+    def _reap_loop(self, reap_interval):
+        while not self._reaper_stop.wait(reap_interval):
+            with self.lock:
+                self._reap_expired()
+                self._release_expired_dependencies()
+
+    def _log_event(self, event, task_id):
+        """Appends the event to the write-ahead log and compacts it when needed. Must be called with the lock held.
+        """
+        if self.wal is None:
+            return
+        self.wal.append(event, self.tasks[task_id])
+        if self.wal.needs_compaction(len(self.tasks)):
+            self.wal.compact(self.tasks)
+
+    def _restore(self, records):
+        """Rebuilds the queue from the replayed records: in progress tasks are returned to pending.
+        """
+        for task_id, record in records.items():
+            if record["task_type"] not in self.heaps:
+                continue
+            if record["status"] == "in progress":
+                record["status"] = "pending"
+                record["claim_time"] = None
+                record["claim_agent_id"] = None
+                record["lease_expiry"] = None
+            self.tasks[task_id] = record
+
+            if self.deduplicator is not None and self.deduplicator.applies_to(record["task_type"]):
+                dedup_text = record.get("dedup_text") or record["task_description"]
+                self.deduplicator.add(record["task_type"], task_id, self.deduplicator.signature(dedup_text))
+                if record["status"] == "completed":
+                    self.deduplicator.on_complete(task_id)
+
+        # fencing tokens of the new claims must be larger than any token handed out before the restart
+        max_token = max([record.get("fencing_token") or 0 for record in self.tasks.values()], default=0)
+        self._fencing_counter = itertools.count(max_token + 1)
+
+        # the dependency graph is rebuilt from the parents that are still not completed
+        for task_id, record in self.tasks.items():
+            if record["status"] == "blocked":
+                parents = [parent_id for parent_id in record.get("depends_on") or [] if parent_id in self.tasks and self.tasks[parent_id]["status"] != "completed"]
+                if not self.dependencies.add(task_id, parents):
+                    record["status"] = "pending"
+
+        # push in the original order, so that FIFO between equal priorities is preserved
+        for task_id, record in sorted(self.tasks.items(), key=lambda item: item[1]["add_time"]):
+            if record["status"] == "pending":
+                self._push(task_id)
+            if record["status"] in ["pending", "blocked"]:
+                self.metrics.on_add(record["task_type"], blocked=record["status"] == "blocked")
+
+        self.resumed = len(self.tasks) > 0
+        self.wal.compact(self.tasks)
+
+    def _push(self, task_id):
+        """Pushes a pending task to the heap of its type. Must be called with the lock held.
+        """
+        record = self.tasks[task_id]
+        seq = next(self._counter)
+        self._heap_seq[task_id] = seq
+        heapq.heappush(self.heaps[record["task_type"]], (self.scheduling_policy.heap_key(record, seq), seq, task_id))
+
+    def _peek(self, task_type):
+        """Returns the valid head of the heap for the given type, dropping stale entries. Must be called with the lock held.
+        """
+        heap = self.heaps[task_type]
+        while heap:
+            _, seq, task_id = heap[0]
+            record = self.tasks.get(task_id)
+            if record is not None and record["status"] == "pending" and self._heap_seq.get(task_id) == seq:
+                return heap[0]
+            heapq.heappop(heap)
+        return None
+
+    def _pop_best(self, supported_tasks):
+        """Pops the pending task chosen by the scheduling policy among the supported task types. Must be called with the lock held.
+        """
+        heads = {}
+        for task_type in supported_tasks:
+            if task_type not in self.heaps:
+                continue
+            entry = self._peek(task_type)
+            if entry is not None:
+                heads[task_type] = entry
+
+        if len(heads) == 0:
+            return None
+
+        best_type = self.scheduling_policy.select(heads)
+        _, _, task_id = heapq.heappop(self.heaps[best_type])
+        del self._heap_seq[task_id]
+        self.scheduling_policy.on_claim(best_type)
+        return task_id
+
+    def _get_supported_tasks(self, agent_type):
+        """Returns a list of supported tasks for a given agent type.
+        """
+        if agent_type not in self.agent_types:
+            raise ValueError(f"Agent type {agent_type} is not supported.")
+
+        if self.task_association is None:
+            # get all present task types
+            return self.task_types
+
+        return self.task_association[agent_type]
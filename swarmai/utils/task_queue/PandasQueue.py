@@ -4,6 +4,7 @@ from datetime import datetime
 
 from swarmai.utils.task_queue.TaskQueueBase import TaskQueueBase
 from swarmai.utils.task_queue.Task import Task
+from swarmai.utils.task_queue.TaskDependencyGraph import TaskDependencyGraph
 from swarmai.agents.AgentBase import AgentBase
 
 class PandasQueue(TaskQueueBase):
@@ -16,10 +17,13 @@ class PandasQueue(TaskQueueBase):
     - priority: priority of the task. Task queue will first return high priority tasks.
     - task_type: type of the task, so that specific agents can filter tasks
     - task_description: description of the task
-    - status: status of the task, e.g. "pending", "in progress", "completed", "failed", 'cancelled'
+    - status: status of the task, e.g. "blocked", "pending", "in progress", "completed", "failed", 'cancelled'
+
+    Tasks with depends_on are "blocked" until all their parents are completed, or for at most dependency_timeout seconds,
+    see TaskDependencyGraph.
     """
 
-    def __init__(self, task_types: list, agent_types: list, task_association: dict):
+    def __init__(self, task_types: list, agent_types: list, task_association: dict, dependency_timeout=600):
         """
         Task association is a dictionary that returns a list of task_types for a given agent_type.
 
@@ -27,6 +31,8 @@ class PandasQueue(TaskQueueBase):
             - task_types (list[str]): list of task types that are supported by the task queue
             - agent_types (list[str]): list of agent types that are supported by the task queue
             - task_association (dict): dictionary that returns a list of task_types for a given agent_type
+            - dependency_timeout (float): seconds after which a blocked task is released even if its parents didn't complete.
+                None blocks until they complete
         """
         super().__init__()
         self.columns = ["task_id", "priority", "task_type", "task_description", "status", "add_time", "claim_time", "complete_time", "claim_agent_id"]
@@ -34,12 +40,54 @@ class PandasQueue(TaskQueueBase):
         self.task_types = task_types
         self.agent_types = agent_types
         self.task_association = task_association
+        self.dependencies = TaskDependencyGraph()
+        self.dependency_timeout = dependency_timeout
+        self._ready_times = {} # task_id -> time the dependencies of the task completed
 
     def add_task(self, task: Task) -> bool:
         """Adds a task to the queue.
 
         Task attr = (task_id, priority, task_type, task_description, status)
         """
+        return self.add_tasks([task])[0]
+
+    def add_tasks(self, tasks: list) -> list:
+        """Adds several tasks with one pd.concat and one notification per task type.
+        All the tasks are validated first, so either all of them are added or none (ValueError).
+        """
+        for task in tasks:
+            self._validate_task(task)
+
+        if len(tasks) == 0:
+            return []
+
+        add_time = datetime.now()
+        with self.lock:
+            statuses = {}
+            if any(task.depends_on for task in tasks):
+                statuses = dict(zip(self.tasks["task_id"], self.tasks["status"]))
+                for task in tasks:
+                    for parent_id in task.depends_on or []:
+                        if str(parent_id) not in statuses:
+                            raise ValueError(f"Task {task.task_description[:20]}... depends on the task {parent_id} that is not in the queue.")
+
+            rows = []
+            for task in tasks:
+                # string ids, as the HeapQueue's, so that they survive the json of the TaskQueueServer
+                task_id = str(uuid.uuid4())
+                depends_on = [str(parent_id) for parent_id in task.depends_on or []]
+                blocked = self.dependencies.add(task_id, [parent_id for parent_id in depends_on if statuses[parent_id] != "completed"])
+                rows.append([task_id, task.priority, task.task_type, task.task_description, "blocked" if blocked else "pending", add_time, None, None, None])
+
+            tasks_df = pd.DataFrame(rows, columns=self.columns)
+            self.tasks = pd.concat([self.tasks, tasks_df], ignore_index=True)
+            for (task_type, status), n in tasks_df[["task_type", "status"]].value_counts().items():
+                self.metrics.on_add(task_type, int(n), blocked=status == "blocked")
+                if status == "pending":
+                    self._notify_task_available(task_type, int(n))
+        return [row[0] for row in rows]
+
+    def _validate_task(self, task: Task):
         if task.task_type not in self.task_types:
             raise ValueError(f"Task type {task.task_type} is not supported.")
 
@@ -51,20 +99,19 @@ class PandasQueue(TaskQueueBase):
 
         if task.task_description == "":
             raise ValueError(f"Task description {task.task_description} is not valid.")
-        
-        priority = task.priority
-        task_type = task.task_type
-        task_description = task.task_description
-        status = "pending"
-        add_time = datetime.now()
-
-        task_i = pd.DataFrame([[uuid.uuid4(), priority, task_type, task_description, status, add_time, None, None, None]], columns=self.columns)
-        self.tasks = pd.concat([self.tasks, task_i], ignore_index=True)
 
-    def get_task(self, agent: AgentBase) -> Task:
-        """Gets the next task from the queue, based on the agent type
-        """        
+    def get_task(self, agent: AgentBase, timeout=0) -> Task:
+        """Gets the next task from the queue, based on the agent type.
+        If there is no pending task, waits up to timeout seconds (None = forever) until add_task or reset_task makes one available.
+        """
         supported_tasks = self._get_supported_tasks(agent.agent_type)
+        return self._claim_or_wait(agent.agent_type, lambda: self._claim(agent, supported_tasks), timeout)
+
+    def _claim(self, agent: AgentBase, supported_tasks) -> Task:
+        """Claims the highest priority pending task. Must be called with the lock held.
+        """
+        if self.dependency_timeout is not None:
+            self._unblock(self.dependencies.release_expired(self.dependency_timeout))
 
         df_clone = self.tasks.copy()
 
@@ -87,6 +134,8 @@ class PandasQueue(TaskQueueBase):
         status = "in progress"
         claim_time = datetime.now()
         claim_agent_id = agent.agent_id
+        ready_time = self._ready_times.pop(task["task_id"], task["add_time"])
+        self.metrics.on_claim(task["task_type"], (claim_time - ready_time).total_seconds())
         task_obj = Task(task_id=task["task_id"], priority=task["priority"], task_type=task["task_type"], task_description=task["task_description"], status=status)
 
         # update the task in the queue
@@ -96,37 +145,68 @@ class PandasQueue(TaskQueueBase):
 
         return task_obj
     
-    def complete_task(self, task_id):
+    def complete_task(self, task_id, fencing_token=None):
         """Completes the task with the given task_id.
+        The status is checked and updated under one lock, so concurrent calls complete the task only once.
         """
-        task = self.tasks[self.tasks["task_id"] == task_id]
-        if len(task) == 0:
-            """In case task was deleted from the queue"""
-            return False
-
-        task = task.iloc[0]
-
-        if task["status"] != "in progress":
-            return False
-
-        status = "completed"
-        complete_time = datetime.now()
-        df_i = pd.DataFrame([[task["task_id"], task["priority"], task["task_type"], task["task_description"], status, task["add_time"], task["claim_time"], complete_time, task["claim_agent_id"]]], columns=self.columns)
-        self.tasks = self.tasks[self.tasks["task_id"] != task["task_id"]]
-        self.tasks = pd.concat([self.tasks, df_i], ignore_index=True)
+        with self.lock:
+            task = self.tasks[self.tasks["task_id"] == task_id]
+            if len(task) == 0:
+                """In case task was deleted from the queue"""
+                return False
+
+            task = task.iloc[0]
+
+            if task["status"] != "in progress":
+                return False
+
+            status = "completed"
+            complete_time = datetime.now()
+            df_i = pd.DataFrame([[task["task_id"], task["priority"], task["task_type"], task["task_description"], status, task["add_time"], task["claim_time"], complete_time, task["claim_agent_id"]]], columns=self.columns)
+            self.tasks = self.tasks[self.tasks["task_id"] != task["task_id"]]
+            self.tasks = pd.concat([self.tasks, df_i], ignore_index=True)
+            self.metrics.on_complete(task["task_type"], (complete_time - task["claim_time"]).total_seconds())
+            self._unblock(self.dependencies.complete(task["task_id"]))
         return True
+
+    def _unblock(self, task_ids):
+        """Makes the tasks whose dependencies completed claimable. Must be called with the lock held.
+        """
+        if len(task_ids) == 0:
+            return
+
+        ready_mask = self.tasks["task_id"].isin(task_ids)
+        self.tasks.loc[ready_mask, "status"] = "pending"
+        ready_time = datetime.now()
+        for task_id in task_ids:
+            self._ready_times[task_id] = ready_time
+        for task_type, n in self.tasks.loc[ready_mask, "task_type"].value_counts().items():
+            self.metrics.on_unblock(task_type, int(n))
+            self._notify_task_available(task_type, int(n))
     
-    def reset_task(self, task_id: str):
-        task = self.tasks[self.tasks["task_id"] == task_id]
-        if len(task) == 0:
-            """In case task was deleted from the queue"""
-            return False
-
-        task = task.iloc[0]
-        status = "pending"
-        df_i = pd.DataFrame([[task["task_id"], task["priority"], task["task_type"], task["task_description"], status, task["add_time"], None, None, None]], columns=self.columns)
-        self.tasks = self.tasks[self.tasks["task_id"] != task["task_id"]]
-        self.tasks = pd.concat([self.tasks, df_i], ignore_index=True)
+    def reset_task(self, task_id: str, fencing_token=None):
+        """Puts the task back to pending. The status is checked and updated under one lock.
+        """
+        with self.lock:
+            task = self.tasks[self.tasks["task_id"] == task_id]
+            if len(task) == 0:
+                """In case task was deleted from the queue"""
+                return False
+
+            task = task.iloc[0]
+            if task["status"] == "blocked":
+                # has to wait for its dependencies anyway
+                return False
+
+            status = "pending"
+            df_i = pd.DataFrame([[task["task_id"], task["priority"], task["task_type"], task["task_description"], status, task["add_time"], None, None, None]], columns=self.columns)
+            self.tasks = self.tasks[self.tasks["task_id"] != task["task_id"]]
+            self.tasks = pd.concat([self.tasks, df_i], ignore_index=True)
+            if task["status"] == "in progress":
+                self.metrics.on_reset(task["task_type"])
+            elif task["status"] == "completed":
+                self.metrics.on_add(task["task_type"])
+            self._notify_task_available(task["task_type"])
         return True
 
     def _get_supported_tasks(self, agent_type):
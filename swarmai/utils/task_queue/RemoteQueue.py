@@ -0,0 +1,131 @@
+import json
+import time
+import socket
+import threading
+
+from swarmai.utils.task_queue.TaskQueueBase import TaskQueueBase
+from swarmai.utils.task_queue.Task import Task
+from swarmai.utils.task_queue.TaskQueueServer import parse_address, id_to_str, task_to_dict, task_from_dict
+from swarmai.agents.AgentBase import AgentBase
+
+class RemoteQueue(TaskQueueBase):
+    """Client of the TaskQueueServer. Agents use it exactly like a local task queue, without knowing where the queue lives.
+    Every thread gets its own connection, so a blocking get_task of one agent doesn't block the other agents.
+
+    get_task blocks on the server in slices of at most poll_interval seconds,
+    so that interrupt_waiters works locally without stopping the agents of the other processes.
+    """
+
+    def __init__(self, address: str, poll_interval=1, connect_timeout=10):
+        """
+        Args:
+            - address (str): tcp://host:port or unix:///path/to/socket of the TaskQueueServer
+            - poll_interval (float): max seconds of a single blocking get_task on the server
+            - connect_timeout (float): timeout for establishing the connection
+        """
+        super().__init__()
+        self.address = address
+        self.poll_interval = poll_interval
+        self.connect_timeout = connect_timeout
+        self._local = threading.local()
+        self._connections = []
+        self._lease_durations = {}
+
+    def add_task(self, task: Task) -> str:
+        return self._call("add_task", task=task_to_dict(task))
+
+    def add_tasks(self, tasks: list) -> list:
+        return self._call("add_tasks", tasks=[task_to_dict(task) for task in tasks])
+
+    def get_task(self, agent: AgentBase, timeout=0) -> Task:
+        """Gets the next task from the server queue, waiting up to timeout seconds (None = forever).
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.lock:
+            interrupt_count = self._interrupt_count
+
+        while True:
+            remaining = self.poll_interval if deadline is None else min(self.poll_interval, max(0, deadline - time.monotonic()))
+            task = self._call("get_task", agent_id=agent.agent_id, agent_type=agent.agent_type, timeout=remaining)
+            if task is not None:
+                return task_from_dict(task)
+            if (deadline is not None and time.monotonic() >= deadline) or self._interrupt_count != interrupt_count:
+                return None
+
+    def complete_task(self, task_id: str, fencing_token=None):
+        return self._call("complete_task", task_id=id_to_str(task_id), fencing_token=fencing_token)
+
+    def complete_tasks(self, task_ids: list, fencing_tokens=None) -> list:
+        return self._call("complete_tasks", task_ids=[id_to_str(task_id) for task_id in task_ids], fencing_tokens=fencing_tokens)
+
+    def reset_task(self, task_id: str, fencing_token=None):
+        return self._call("reset_task", task_id=id_to_str(task_id), fencing_token=fencing_token)
+
+    def reset_tasks(self, task_ids: list, fencing_tokens=None) -> list:
+        return self._call("reset_tasks", task_ids=[id_to_str(task_id) for task_id in task_ids], fencing_tokens=fencing_tokens)
+
+    def renew_lease(self, task_id: str, fencing_token) -> bool:
+        return self._call("renew_lease", task_id=id_to_str(task_id), fencing_token=fencing_token)
+
+    def get_lease_duration(self, task_type):
+        if task_type not in self._lease_durations:
+            self._lease_durations[task_type] = self._call("get_lease_duration", task_type=task_type)
+        return self._lease_durations[task_type]
+
+    def get_metrics(self) -> dict:
+        """Returns the metrics of the server queue, shared by all the processes.
+        """
+        return self._call("get_metrics")
+
+    def _get_supported_tasks(self, agent_type):
+        return self._call("get_supported_tasks", agent_type=agent_type)
+
+    def close(self):
+        with self.lock:
+            for connection in self._connections:
+                try:
+                    connection.close()
+                except OSError:
+                    pass
+            self._connections = []
+
+    def _connection(self):
+        """Returns the connection of the current thread, connecting if needed.
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            family, address = parse_address(self.address)
+            if family == "unix":
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            else:
+                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.settimeout(self.connect_timeout)
+            sock.connect(address)
+            sock.settimeout(None)
+            connection = sock.makefile("rwb")
+            self._local.connection = connection
+            with self.lock:
+                self._connections.append(connection)
+        return connection
+
+    def _call(self, method, **kwargs):
+        connection = self._connection()
+        try:
+            connection.write((json.dumps({"method": method, "kwargs": kwargs}) + "\n").encode("utf-8"))
+            connection.flush()
+            line = connection.readline()
+        except OSError:
+            # the server went away, reconnect on the next call
+            self._local.connection = None
+            raise
+        if not line:
+            self._local.connection = None
+            raise ConnectionError(f"Task queue server {self.address} closed the connection")
+
+        response = json.loads(line)
+        if "error" in response:
+            if response["error"] == "ValueError":
+                raise ValueError(response["message"])
+            raise RuntimeError(f"Task queue server failed to execute {method}: {response['error']}: {response['message']}")
+        return response["result"]
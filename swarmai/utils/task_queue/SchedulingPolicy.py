@@ -0,0 +1,110 @@
+from abc import ABC, abstractmethod
+
+class SchedulingPolicy(ABC):
+    """Decides which pending task the HeapQueue hands out next.
+
+    The queue keeps one heap per task type, ordered by heap_key(record, seq) (smaller is served first),
+    and asks select() which of the heap heads of the supported task types to claim.
+    Keys must not change while the task waits in the heap, so time-dependent policies have to be expressed with static keys.
+    """
+
+    @abstractmethod
+    def heap_key(self, record: dict, seq: int):
+        """Returns the sort key of a pending task inside the heap of its type. seq grows with every push, use it for FIFO.
+        """
+        raise NotImplementedError
+
+    def select(self, heads: dict):
+        """Returns the task type to claim from, given the heap heads {task_type: heap entry} of the non-empty supported types.
+        By default the smallest key wins, so the keys of different types must be comparable.
+        """
+        return min(heads, key=lambda task_type: heads[task_type])
+
+    def on_claim(self, task_type):
+        """Called after a task of the given type was claimed.
+        """
+        pass
+
+
+class PriorityPolicy(SchedulingPolicy):
+    """Strict priority, FIFO between the tasks with the same priority. Same as the PandasQueue, but with a defined order of the ties.
+    """
+
+    def heap_key(self, record, seq):
+        return (-record["priority"], seq)
+
+
+class AgingPolicy(SchedulingPolicy):
+    """Priority aging: the effective priority grows by aging_rate per second since add_time, so low priority tasks can't starve forever.
+
+    effective priority = priority + aging_rate * (now - add_time) = (priority - aging_rate * add_time) + aging_rate * now
+    The last term is the same for all the tasks, so the order only depends on (priority - aging_rate * add_time) and the key is static.
+    """
+
+    def __init__(self, aging_rate=1.0):
+        """
+        Args:
+            - aging_rate (float): priority points gained per second of waiting
+        """
+        self.aging_rate = aging_rate
+
+    def heap_key(self, record, seq):
+        return (-(record["priority"] - self.aging_rate * record["add_time"].timestamp()), seq)
+
+
+class FairSharePolicy(SchedulingPolicy):
+    """Weighted fair sharing between the task types (stride scheduling), inside a type the tasks are ordered by the base policy.
+
+    Every type has a pass value that grows by 1/weight with every claim, and the type with the smallest pass among the non-empty
+    supported types is served. A type with weight 2 gets twice as many claims as a type with weight 1 while both have pending tasks.
+    A type that was idle is moved to the current virtual time, so it can't monopolize the agents with the credit saved while idle.
+    """
+
+    def __init__(self, weights=None, default_weight=1.0, base_policy=None):
+        """
+        Args:
+            - weights (dict): task_type -> weight
+            - default_weight (float): weight of the task types not in weights
+            - base_policy (SchedulingPolicy): order inside a task type, PriorityPolicy by default
+        """
+        self.weights = weights if weights is not None else {}
+        self.default_weight = default_weight
+        self.base_policy = base_policy if base_policy is not None else PriorityPolicy()
+        self.passes = {}
+        self.virtual_time = 0.0
+
+    def heap_key(self, record, seq):
+        return self.base_policy.heap_key(record, seq)
+
+    def select(self, heads):
+        for task_type in heads:
+            self.passes[task_type] = max(self.passes.get(task_type, 0.0), self.virtual_time)
+        # ties between the types are broken by the base policy
+        return min(heads, key=lambda task_type: (self.passes[task_type], heads[task_type]))
+
+    def on_claim(self, task_type):
+        self.virtual_time = self.passes[task_type]
+        self.passes[task_type] += 1.0 / self.weights.get(task_type, self.default_weight)
+
+
+def create_scheduling_policy(config: dict) -> SchedulingPolicy:
+    """Creates a scheduling policy from the swarm config (swarm.task_queue.scheduling):
+
+    scheduling:
+        policy: fair_share # priority (default), aging, fair_share
+        aging_rate: 1.0 # aging, and fair_share inside a task type if set
+        weights: # fair_share
+            google_search: 2
+    """
+    if config is None:
+        return PriorityPolicy()
+
+    policy = config.get("policy", "priority")
+    if policy == "priority":
+        return PriorityPolicy()
+    if policy == "aging":
+        return AgingPolicy(config.get("aging_rate", 1.0))
+    if policy == "fair_share":
+        base_policy = AgingPolicy(config["aging_rate"]) if config.get("aging_rate") is not None else PriorityPolicy()
+        return FairSharePolicy(config.get("weights"), config.get("default_weight", 1.0), base_policy)
+    raise ValueError(f"Scheduling policy {policy} is not supported. Supported policies are: priority, aging, fair_share")
@@ -9,7 +9,10 @@ class Task:
     - priority: priority of the task. Task queue will first return high priority tasks.
     - task_type: type of the task, so that specific agents can filter tasks
     - task_description: description of the task
-    - status: status of the task, e.g. "pending", "in progress", "completed", "failed", 'cancelled'
+    - status: status of the task, e.g. "blocked", "pending", "in progress", "completed", "failed", 'cancelled'
+    - fencing_token: token of the claim, set by task queues with leases. Must be passed back when completing or resetting the task
+    - dedup_text: text used by the task queue to detect near-duplicate tasks, if different from the description (e.g. without a common prefix)
+    - depends_on: ids of the tasks that must be completed before this task can be claimed. The task is "blocked" until then
     """
 
     class TaskTypes:
@@ -22,12 +25,15 @@ class Task:
         report_preparation = "report_preparation"
         crunchbase_search = "crunchbase_search"
 
-    def __init__(self, priority, task_type, task_description, status="pending", task_id=uuid.uuid4()):
+    def __init__(self, priority, task_type, task_description, status="pending", task_id=uuid.uuid4(), fencing_token=None, dedup_text=None, depends_on=None):
         self.task_id = task_id
         self.priority = priority
         self.task_type = task_type
         self.task_description = task_description
         self.status = status
+        self.fencing_token = fencing_token
+        self.dedup_text = dedup_text
+        self.depends_on = depends_on
 
     def __str__(self):
         return f"task_id: {self.task_id}\npriority: {self.priority}\ntask_type: {self.task_type}\ntask_description: {self.task_description}\nstatus: {self.status}"
@@ -0,0 +1,142 @@
+import re
+import zlib
+from collections import defaultdict, OrderedDict
+
+import numpy as np
+
+class TaskDeduplicator:
+    """Near-duplicate detection of the task descriptions, used by the task queue at enqueue time.
+
+    Descriptions are normalized (lowercase, only letters, digits and single spaces) and split into character shingles.
+    Each description gets a MinHash signature, and the signatures are indexed with LSH (banding) separately for every task type.
+    A new task is a duplicate if one of the LSH candidates has the Jaccard similarity of the shingle sets above the threshold.
+    The candidates are verified exactly, so the LSH only decides how many tasks are compared, not the result.
+
+    Modes:
+    - "reject": the duplicate is not added to the queue
+    - "merge": the duplicate is not added, but the existing task gets the higher of the two priorities
+
+    The signatures of the pending and in progress tasks stay indexed. Those of the completed tasks are kept for the max_completed
+    most recently completed or matched tasks, older ones are evicted, so the index doesn't grow with the length of the run.
+    """
+
+    _MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+
+    def __init__(self, threshold=0.7, mode="reject", task_types=None, num_perm=64, bands=16, shingle_size=5, seed=1, max_completed=10000):
+        """
+        Args:
+            - threshold (float): Jaccard similarity of the shingles above which two tasks are duplicates
+            - mode (str): "reject" or "merge"
+            - task_types (list[str]): task types to deduplicate, None for all
+            - num_perm (int): number of MinHash permutations
+            - bands (int): number of LSH bands, num_perm must be divisible by it
+            - shingle_size (int): number of characters in a shingle
+            - seed (int): seed of the MinHash permutations
+            - max_completed (int): number of completed tasks whose signatures are kept, None to keep all of them
+        """
+        if mode not in ("reject", "merge"):
+            raise ValueError(f"Deduplication mode {mode} is not supported. Supported modes are: reject, merge")
+        if num_perm % bands != 0:
+            raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+
+        self.threshold = threshold
+        self.mode = mode
+        self.task_types = task_types
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.max_completed = max_completed
+
+        rng = np.random.default_rng(seed)
+        # a*x fits in uint64 as long as a and x are below 2^32
+        self._a = rng.integers(1, 1 << 31, size=(num_perm, 1), dtype=np.uint64)
+        self._b = rng.integers(0, 1 << 31, size=(num_perm, 1), dtype=np.uint64)
+
+        self.buckets = defaultdict(lambda: defaultdict(set)) # task_type -> (band, band signature) -> set of task_ids
+        self.entries = {} # task_id -> (task_type, frozenset of shingle hashes, band keys)
+        self.completed = OrderedDict() # task_ids of the indexed completed tasks, least recently completed or matched first
+        self.suppressed = defaultdict(int) # task_type -> number of suppressed tasks
+
+    def applies_to(self, task_type) -> bool:
+        return self.task_types is None or task_type in self.task_types
+
+    def normalize(self, text: str) -> str:
+        text = re.sub(r"[^a-z0-9]+", " ", text.lower())
+        return text.strip()
+
+    def signature(self, text: str):
+        """Returns the (shingle hashes, band keys) of the text. Doesn't need the lock, so it can be computed before entering the queue.
+        """
+        text = self.normalize(text)
+        if len(text) <= self.shingle_size:
+            shingles = {text}
+        else:
+            shingles = {text[i:i + self.shingle_size] for i in range(len(text) - self.shingle_size + 1)}
+        shingle_hashes = frozenset(zlib.crc32(shingle.encode("utf-8")) for shingle in shingles)
+
+        x = np.fromiter(shingle_hashes, dtype=np.uint64, count=len(shingle_hashes))
+        minhash = ((self._a * x + self._b) % self._MERSENNE_PRIME).min(axis=1)
+        band_keys = [(band, minhash[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+        return shingle_hashes, band_keys
+
+    def find(self, task_type, signature):
+        """Returns the id of the most similar indexed task above the threshold, None if there is no such task.
+        """
+        shingle_hashes, band_keys = signature
+        buckets = self.buckets[task_type]
+
+        candidates = set()
+        for band_key in band_keys:
+            bucket = buckets.get(band_key)
+            if bucket:
+                candidates.update(bucket)
+
+        best_id, best_similarity = None, self.threshold
+        for task_id in candidates:
+            other = self.entries[task_id][1]
+            similarity = len(shingle_hashes & other) / len(shingle_hashes | other)
+            if similarity >= best_similarity:
+                best_id, best_similarity = task_id, similarity
+        if best_id in self.completed:
+            self.completed.move_to_end(best_id)
+        return best_id
+
+    def add(self, task_type, task_id, signature):
+        shingle_hashes, band_keys = signature
+        self.entries[task_id] = (task_type, shingle_hashes, band_keys)
+        buckets = self.buckets[task_type]
+        for band_key in band_keys:
+            buckets[band_key].add(task_id)
+
+    def on_complete(self, task_id):
+        """Marks an indexed task as completed and evicts the signatures of the least recently completed tasks above max_completed.
+        """
+        if task_id not in self.entries:
+            return
+        self.completed[task_id] = None
+        self.completed.move_to_end(task_id)
+        if self.max_completed is not None:
+            while len(self.completed) > self.max_completed:
+                evicted_id, _ = self.completed.popitem(last=False)
+                self.remove(evicted_id)
+
+    def remove(self, task_id):
+        """Removes the signature of the task from the index.
+        """
+        entry = self.entries.pop(task_id, None)
+        if entry is None:
+            return
+        self.completed.pop(task_id, None)
+        task_type, _, band_keys = entry
+        buckets = self.buckets[task_type]
+        for band_key in band_keys:
+            bucket = buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(task_id)
+                if not bucket:
+                    del buckets[band_key]
+
+    def get_suppressed_count(self):
+        """Returns a dict task_type -> number of suppressed near-duplicate tasks.
+        """
+        return dict(self.suppressed)
@@ -0,0 +1,73 @@
+import time
+from collections import defaultdict, OrderedDict
+
+class TaskDependencyGraph:
+    """Dependencies between the tasks of a queue (task.depends_on), so that a task only becomes claimable once all its parents completed.
+
+    The ready set is tracked incrementally: every blocked task keeps the number of its parents that are not completed yet,
+    and every parent keeps the list of its children. Completing a task only touches its own children, O(children),
+    independently of the size of the graph. A task can only depend on tasks that already exist in the queue, so the graph can't have cycles.
+
+    Once a child was unblocked it stays unblocked, even if a parent is reset afterwards (the child may already be running).
+    A parent may never complete (abandoned, rejected as a duplicate, failing again and again), so the task queues release the children
+    that have been blocked for longer than their dependency timeout (release_expired), instead of blocking them forever.
+    Thread-safeness must be handled by the task queue.
+    """
+
+    def __init__(self):
+        self.children = defaultdict(list) # parent task_id -> children task_ids
+        self.n_waiting = {} # blocked task_id -> number of parents that are not completed yet
+        self.blocked_since = OrderedDict() # blocked task_id -> time.monotonic() when it was added, oldest first
+
+    def add(self, task_id, parents: list) -> bool:
+        """Registers the task with the parents that are not completed yet.
+
+        Returns:
+            - blocked (bool): whether the task has to wait for its parents
+        """
+        parents = set(parents)
+        if len(parents) == 0:
+            return False
+
+        for parent_id in parents:
+            self.children[parent_id].append(task_id)
+        self.n_waiting[task_id] = len(parents)
+        self.blocked_since[task_id] = time.monotonic()
+        return True
+
+    def complete(self, task_id) -> list:
+        """Marks the task as completed.
+
+        Returns:
+            - ready (list): the children that have no uncompleted parents anymore
+        """
+        ready = []
+        for child_id in self.children.pop(task_id, []):
+            if child_id not in self.n_waiting:
+                continue
+            self.n_waiting[child_id] -= 1
+            if self.n_waiting[child_id] == 0:
+                del self.n_waiting[child_id]
+                del self.blocked_since[child_id]
+                ready.append(child_id)
+        return ready
+
+    def release_expired(self, timeout) -> list:
+        """Unblocks the tasks that have been waiting for their parents for timeout seconds or longer, O(released).
+
+        Returns:
+            - released (list): the tasks that are not blocked anymore
+        """
+        released = []
+        now = time.monotonic()
+        while self.blocked_since:
+            task_id, since = next(iter(self.blocked_since.items()))
+            if now - since < timeout:
+                break
+            del self.blocked_since[task_id]
+            del self.n_waiting[task_id]
+            released.append(task_id)
+        return released
+
+    def is_blocked(self, task_id) -> bool:
+        return task_id in self.n_waiting
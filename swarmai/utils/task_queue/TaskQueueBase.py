@@ -1,7 +1,9 @@
 import threading
+import time
 from abc import ABC, abstractmethod
 
 from swarmai.utils.task_queue.Task import Task
+from swarmai.utils.task_queue.TaskQueueMetrics import TaskQueueMetrics
 from swarmai.agents.AgentBase import AgentBase
 
 def synchronized_queue(method):
@@ -24,9 +26,66 @@ class TaskQueueBase(ABC):
     Not every implementatino is inherently thread safe, so we also put the locks here.
 
     Made a pull queue, just for the ease of implementation.
+    Agents that don't find a task can block in get_task(agent, timeout=...) instead of polling:
+    there is one condition variable per agent type (sharing the queue lock), and add_task/reset_task
+    notify only the agent types that can claim the new task.
+
+    Implementations report their events to self.metrics (TaskQueueMetrics), readable live with get_metrics().
     """
     def __init__(self):
         self.lock = threading.Lock()
+        self.metrics = TaskQueueMetrics()
+        self._task_conditions = {} # agent_type -> threading.Condition on self.lock
+        self._interrupt_count = 0
+
+    def get_metrics(self) -> dict:
+        """Returns the queue depth, wait/service time percentiles, rates and reset counts per task type, see TaskQueueMetrics.
+        """
+        return self.metrics.get_metrics()
+
+    def close(self):
+        """Releases the resources of the queue (files, connections, threads) when the swarm stops.
+        """
+        pass
+
+    def interrupt_waiters(self):
+        """Wakes up all agents blocked in get_task, they return None. Used when the swarm stops.
+        """
+        with self.lock:
+            self._interrupt_count += 1
+            for condition in self._task_conditions.values():
+                condition.notify_all()
+
+    def _claim_or_wait(self, agent_type, claim, timeout=0):
+        """Calls claim() under the lock until it returns a task, the timeout expires or the waiters are interrupted.
+
+        Args:
+            - agent_type (str): the type of the waiting agent
+            - claim (callable): returns a claimed task or None. Is called with the lock held.
+            - timeout (float): 0 to return immediately, None to wait forever, otherwise max seconds to wait
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.lock:
+            interrupt_count = self._interrupt_count
+            while True:
+                task = claim()
+                if task is not None:
+                    return task
+
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if (remaining is not None and remaining <= 0) or self._interrupt_count != interrupt_count:
+                    return None
+
+                if agent_type not in self._task_conditions:
+                    self._task_conditions[agent_type] = threading.Condition(self.lock)
+                self._task_conditions[agent_type].wait(remaining)
+
+    def _notify_task_available(self, task_type, n=1):
+        """Wakes up to n agents of every agent type that can claim tasks of the given type. Must be called with the lock held.
+        """
+        for agent_type, condition in self._task_conditions.items():
+            if task_type in self._get_supported_tasks(agent_type):
+                condition.notify(n)
 
     @synchronized_queue
     @abstractmethod
@@ -37,22 +96,60 @@ class TaskQueueBase(ABC):
 
     @synchronized_queue
     @abstractmethod
-    def get_task(self, agent: AgentBase) -> Task:
+    def get_task(self, agent: AgentBase, timeout=0) -> Task:
         """Gets the next task from the queue.
+        Blocks for up to timeout seconds if no task is available (None = wait forever).
         """
         raise NotImplementedError
     
+    @abstractmethod
+    def _get_supported_tasks(self, agent_type) -> list:
+        """Returns a list of task types that the given agent type can claim.
+        """
+        raise NotImplementedError
+
     @synchronized_queue
     @abstractmethod
-    def complete_task(self, task_id: str):
+    def complete_task(self, task_id: str, fencing_token=None):
         """Sets the task as completed.
         """
         raise NotImplementedError
     
     @synchronized_queue
     @abstractmethod
-    def reset_task(self, task_id: str):
+    def reset_task(self, task_id: str, fencing_token=None):
         """Resets the task if the agent failed to complete it.
         """
         raise NotImplementedError
 
+    def add_tasks(self, tasks: list) -> list:
+        """Adds several tasks at once, e.g. a breakdown into subtasks. Returns the list of the results of add_task.
+        Implementations should override it to take the lock and notify the agents only once.
+        """
+        return [self.add_task(task) for task in tasks]
+
+    def complete_tasks(self, task_ids: list, fencing_tokens=None) -> list:
+        """Completes several tasks at once. Returns the list of the results of complete_task.
+        """
+        if fencing_tokens is None:
+            fencing_tokens = [None] * len(task_ids)
+        return [self.complete_task(task_id, fencing_token=fencing_token) for task_id, fencing_token in zip(task_ids, fencing_tokens)]
+
+    def reset_tasks(self, task_ids: list, fencing_tokens=None) -> list:
+        """Resets several tasks at once. Returns the list of the results of reset_task.
+        """
+        if fencing_tokens is None:
+            fencing_tokens = [None] * len(task_ids)
+        return [self.reset_task(task_id, fencing_token=fencing_token) for task_id, fencing_token in zip(task_ids, fencing_tokens)]
+
+    def get_lease_duration(self, task_type):
+        """Returns how long a claim of the given task type stays valid without renewal, None if the claims don't expire.
+        """
+        return None
+
+    def renew_lease(self, task_id: str, fencing_token) -> bool:
+        """Extends the lease of a claimed task. Returns False if the claim was lost.
+        Queues without leases never lose the claims.
+        """
+        return True
+
@@ -0,0 +1,171 @@
+import math
+import time
+import threading
+from collections import deque, defaultdict
+
+class LatencyHistogram:
+    """Histogram with logarithmic buckets, so that percentiles can be kept incrementally in O(1) per sample and O(buckets) per read.
+    Bucket i covers [min_value * growth^i, min_value * growth^(i+1)), the relative error of the percentiles is below growth - 1.
+    """
+
+    def __init__(self, min_value=0.001, max_value=24*3600, growth=1.05):
+        self.min_value = min_value
+        self.growth = growth
+        self._log_growth = math.log(growth)
+        self.n_buckets = int(math.ceil(math.log(max_value / min_value) / self._log_growth)) + 1
+        self.buckets = [0] * (self.n_buckets + 1) # the first bucket is [0, min_value)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value: float):
+        value = max(value, 0.0)
+        if value < self.min_value:
+            bucket = 0
+        else:
+            bucket = min(int(math.log(value / self.min_value) / self._log_growth) + 1, self.n_buckets)
+        self.buckets[bucket] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def percentile(self, q: float):
+        """Returns the upper bound of the bucket that contains the q-th percentile (0-100), None if empty.
+        """
+        if self.count == 0:
+            return None
+        rank = q / 100 * self.count
+        cumulative = 0
+        for bucket, n in enumerate(self.buckets):
+            cumulative += n
+            if cumulative >= rank and n > 0:
+                upper = self.min_value * self.growth ** bucket
+                return min(upper, self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count > 0 else None,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "max": self.max if self.count > 0 else None,
+        }
+
+
+class TaskQueueMetrics:
+    """Queue latency and throughput metrics, updated by the task queue on every event instead of being recomputed from the tasks.
+
+    Per task type:
+    - depth: number of blocked (waiting for their dependencies), pending and in progress tasks
+    - wait time: from add_time (or from the moment the dependencies completed) to claim_time, histogram with p50/p95/p99
+    - service time: from claim_time to complete_time, histogram with p50/p95/p99
+    - claim and completion rates: per second over the last rate_window seconds, and totals
+    - resets (agent failed or dropped the task) and expirations (lease expired)
+
+    High wait times with short service times mean the swarm is queue-bound (not enough agents of the type),
+    long service times mean it is bound by the LLM/search calls.
+    Thread-safe on its own, the queues call it while holding their lock anyway.
+    """
+
+    def __init__(self, rate_window=60):
+        """
+        Args:
+            - rate_window (float): window of the claim and completion rates, in seconds
+        """
+        self.rate_window = rate_window
+        self.start_time = time.monotonic()
+        self.lock = threading.Lock()
+
+        self.blocked = defaultdict(int)
+        self.pending = defaultdict(int)
+        self.in_progress = defaultdict(int)
+        self.added = defaultdict(int)
+        self.claimed = defaultdict(int)
+        self.completed = defaultdict(int)
+        self.resets = defaultdict(int)
+        self.expirations = defaultdict(int)
+        self.wait_time = defaultdict(LatencyHistogram)
+        self.service_time = defaultdict(LatencyHistogram)
+        self._claim_times = defaultdict(deque)
+        self._complete_times = defaultdict(deque)
+
+    def on_add(self, task_type, n=1, blocked=False):
+        with self.lock:
+            if blocked:
+                self.blocked[task_type] += n
+            else:
+                self.pending[task_type] += n
+            self.added[task_type] += n
+
+    def on_unblock(self, task_type, n=1):
+        with self.lock:
+            self.blocked[task_type] -= n
+            self.pending[task_type] += n
+
+    def on_claim(self, task_type, wait_seconds):
+        with self.lock:
+            self.pending[task_type] -= 1
+            self.in_progress[task_type] += 1
+            self.claimed[task_type] += 1
+            self.wait_time[task_type].add(wait_seconds)
+            self._append_event(self._claim_times[task_type])
+
+    def on_complete(self, task_type, service_seconds):
+        with self.lock:
+            self.in_progress[task_type] -= 1
+            self.completed[task_type] += 1
+            self.service_time[task_type].add(service_seconds)
+            self._append_event(self._complete_times[task_type])
+
+    def on_reset(self, task_type, expired=False):
+        with self.lock:
+            self.in_progress[task_type] -= 1
+            self.pending[task_type] += 1
+            if expired:
+                self.expirations[task_type] += 1
+            else:
+                self.resets[task_type] += 1
+
+    def get_metrics(self) -> dict:
+        """Returns the current metrics as a json-serializable dict: {"uptime": seconds, "task_types": {task_type: {...}}}.
+        """
+        with self.lock:
+            now = time.monotonic()
+            task_types = set(self.added) | set(self.pending) | set(self.in_progress)
+            metrics = {}
+            for task_type in sorted(task_types):
+                metrics[task_type] = {
+                    "blocked": self.blocked[task_type],
+                    "pending": self.pending[task_type],
+                    "in_progress": self.in_progress[task_type],
+                    "added": self.added[task_type],
+                    "claimed": self.claimed[task_type],
+                    "completed": self.completed[task_type],
+                    "resets": self.resets[task_type],
+                    "expirations": self.expirations[task_type],
+                    "claim_rate": self._rate(self._claim_times[task_type], now),
+                    "completion_rate": self._rate(self._complete_times[task_type], now),
+                    "wait_time": self.wait_time[task_type].summary(),
+                    "service_time": self.service_time[task_type].summary(),
+                }
+            return {"uptime": now - self.start_time, "task_types": metrics}
+
+    def _append_event(self, event_times: deque):
+        """Must be called with the lock held.
+        """
+        now = time.monotonic()
+        event_times.append(now)
+        self._drop_old_events(event_times, now)
+
+    def _drop_old_events(self, event_times: deque, now: float):
+        while event_times and event_times[0] < now - self.rate_window:
+            event_times.popleft()
+
+    def _rate(self, event_times: deque, now: float) -> float:
+        """Events per second over the rate window. Must be called with the lock held.
+        """
+        self._drop_old_events(event_times, now)
+        window = min(self.rate_window, now - self.start_time)
+        return len(event_times) / window if window > 0 else 0.0
@@ -0,0 +1,193 @@
+import os
+import json
+import argparse
+import threading
+import socketserver
+from types import SimpleNamespace
+
+from swarmai.utils.task_queue.Task import Task
+
+def parse_address(address: str):
+    """Parses "tcp://host:port" or "unix:///path/to/socket" into (family, address).
+    """
+    if address.startswith("tcp://"):
+        host, port = address[len("tcp://"):].rsplit(":", 1)
+        return "tcp", (host, int(port))
+    if address.startswith("unix://"):
+        return "unix", address[len("unix://"):]
+    raise ValueError(f"Task queue address {address} is not supported. Use tcp://host:port or unix:///path/to/socket")
+
+def id_to_str(task_id):
+    """Task ids travel as strings on both sides of the protocol (queues may use other types, e.g. uuid.UUID).
+    None and False (no task, rejected task) are kept as they are.
+    """
+    return task_id if task_id is None or isinstance(task_id, bool) else str(task_id)
+
+def task_to_dict(task: Task) -> dict:
+    return {
+        "task_id": id_to_str(task.task_id),
+        "priority": task.priority,
+        "task_type": task.task_type,
+        "task_description": task.task_description,
+        "status": task.status,
+        "fencing_token": task.fencing_token,
+        "dedup_text": task.dedup_text,
+        "depends_on": None if task.depends_on is None else [id_to_str(task_id) for task_id in task.depends_on],
+    }
+
+def task_from_dict(task_dict: dict) -> Task:
+    return Task(**task_dict)
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """One thread per client connection. Requests and responses are JSON lines:
+    {"method": "get_task", "kwargs": {...}} -> {"result": ...} or {"error": "ValueError", "message": "..."}
+    A line that is not valid JSON gets an error response too, the connection keeps reading the next requests.
+    """
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+            except ValueError as e: # JSONDecodeError, or UnicodeDecodeError for invalid utf-8
+                response = {"error": type(e).__name__, "message": str(e)}
+            else:
+                response = self.server.task_queue_server.dispatch(request)
+            self.wfile.write((json.dumps(response) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+
+class _ThreadingUnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class _ThreadingTCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class TaskQueueServer:
+    """Serves a task queue over a TCP or a Unix socket, so that agents in other processes (or on other machines) can share it.
+    The storage is the wrapped queue, by default an in-memory HeapQueue (optionally with the write-ahead log).
+    Use RemoteQueue as the client, it has the same add_task/get_task/complete_task/reset_task contract.
+
+    Example:
+        server = TaskQueueServer(HeapQueue(task_types, agent_types, task_associations), "tcp://127.0.0.1:5555")
+        server.start()
+        ...
+        server.stop()
+    """
+
+    METHODS = [
+        "add_task", "add_tasks", "get_task", "complete_task", "complete_tasks", "reset_task", "reset_tasks",
+        "renew_lease", "get_lease_duration", "get_supported_tasks", "get_metrics",
+    ]
+
+    def __init__(self, task_queue, address: str):
+        self.task_queue = task_queue
+        self.address = address
+        family, bind_address = parse_address(address)
+        if family == "unix":
+            if os.path.exists(bind_address):
+                os.remove(bind_address)
+            self.server = _ThreadingUnixServer(bind_address, _RequestHandler)
+        else:
+            self.server = _ThreadingTCPServer(bind_address, _RequestHandler)
+            # port 0 means any free port
+            self.address = f"tcp://{bind_address[0]}:{self.server.server_address[1]}"
+        self.server.task_queue_server = self
+        self._thread = None
+
+    def start(self):
+        """Serves the requests in a background thread.
+        """
+        self._thread = threading.Thread(target=self.server.serve_forever, name="TaskQueueServer", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self.server.serve_forever()
+
+    def stop(self):
+        self.server.shutdown()
+        self.task_queue.interrupt_waiters()
+        self.server.server_close()
+        self.task_queue.close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def dispatch(self, request: dict) -> dict:
+        if not isinstance(request, dict):
+            return {"error": "ValueError", "message": f"A request must be a JSON object, got {type(request).__name__}"}
+        method = request.get("method")
+        kwargs = request.get("kwargs", {})
+        if method not in self.METHODS:
+            return {"error": "ValueError", "message": f"Unknown task queue method {method}"}
+
+        try:
+            return {"result": getattr(self, "_" + method)(**kwargs)}
+        except ValueError as e:
+            return {"error": "ValueError", "message": str(e)}
+        except Exception as e:
+            return {"error": type(e).__name__, "message": str(e)}
+
+    def _add_task(self, task):
+        return id_to_str(self.task_queue.add_task(task_from_dict(task)))
+
+    def _add_tasks(self, tasks):
+        return [id_to_str(task_id) for task_id in self.task_queue.add_tasks([task_from_dict(task) for task in tasks])]
+
+    def _get_task(self, agent_id, agent_type, timeout=0):
+        # the queue only needs the id and the type of the agent
+        agent = SimpleNamespace(agent_id=agent_id, agent_type=agent_type)
+        task = self.task_queue.get_task(agent, timeout=timeout)
+        return None if task is None else task_to_dict(task)
+
+    def _complete_task(self, task_id, fencing_token=None):
+        return self.task_queue.complete_task(task_id, fencing_token=fencing_token)
+
+    def _complete_tasks(self, task_ids, fencing_tokens=None):
+        return self.task_queue.complete_tasks(task_ids, fencing_tokens=fencing_tokens)
+
+    def _reset_task(self, task_id, fencing_token=None):
+        return self.task_queue.reset_task(task_id, fencing_token=fencing_token)
+
+    def _reset_tasks(self, task_ids, fencing_tokens=None):
+        return self.task_queue.reset_tasks(task_ids, fencing_tokens=fencing_tokens)
+
+    def _renew_lease(self, task_id, fencing_token):
+        return self.task_queue.renew_lease(task_id, fencing_token)
+
+    def _get_lease_duration(self, task_type):
+        return self.task_queue.get_lease_duration(task_type)
+
+    def _get_supported_tasks(self, agent_type):
+        return list(self.task_queue._get_supported_tasks(agent_type))
+
+    def _get_metrics(self):
+        return self.task_queue.get_metrics()
+
+
+if __name__ == "__main__":
+    # standalone server for the swarm task types: python -m swarmai.utils.task_queue.TaskQueueServer --address tcp://127.0.0.1:5555
+    from swarmai.Swarm import Swarm
+    from swarmai.utils.task_queue.HeapQueue import HeapQueue
+    from swarmai.utils.task_queue.TaskQueueWAL import TaskQueueWAL
+
+    parser = argparse.ArgumentParser(description="Serves the swarm task queue to agents in other processes")
+    parser.add_argument("--address", default="tcp://127.0.0.1:5555", help="tcp://host:port or unix:///path/to/socket")
+    parser.add_argument("--wal_dir", default=None, help="directory of the write-ahead log, no log if not set")
+    parser.add_argument("--lease_duration", type=float, default=None, help="seconds a claim is valid without renewal")
+    args = parser.parse_args()
+
+    wal = TaskQueueWAL(args.wal_dir) if args.wal_dir is not None else None
+    task_queue = HeapQueue(Swarm.TASK_TYPES, list(Swarm.WORKER_ROLES.keys()), Swarm.TASK_ASSOCIATIONS, wal=wal, lease_duration=args.lease_duration)
+    server = TaskQueueServer(task_queue, args.address)
+    print(f"Serving the task queue on {server.address}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server.server_close()
+        task_queue.close()
@@ -0,0 +1,66 @@
+"""Benchmark of the approximate search of the NumPy vector store (swarm.shared_memory.ann, IVFIndex): recall@k and queries per second
+vs the exact search, at 10k, 100k and 1M vectors.
+
+The synthetic embeddings are clustered like the chunks of a memory (N_TOPICS topics, gaussian noise around them) and the queries
+are noisy copies of random chunks. The vectors are added in batches, so the index is trained and retrained as it grows.
+DIM is smaller than the OpenAI embeddings (1536), so that 1M vectors fit into the memory of a laptop.
+
+Run from the repo root: python tests/benchmark_ann.py [max_vectors]
+"""
+import sys
+import time
+import shutil
+import tempfile
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import numpy as np
+
+from swarmai.utils.memory import NumpyVectorStore
+
+SIZES = [10_000, 100_000, 1_000_000]
+DIM = 128
+N_TOPICS = 2000
+NOISE = 0.5
+BATCH_SIZE = 10_000
+N_QUERIES = 200
+K = 10
+N_PROBES = [1, 4, 16, 64]
+
+def make_store(n_vectors, rng):
+    topics = rng.normal(size=(N_TOPICS, DIM)).astype(np.float32)
+    store = NumpyVectorStore(Path(tempfile.mkdtemp()) / "shared_memory", ann={"min_size": 10_000})
+    start = time.perf_counter()
+    for i in range(0, n_vectors, BATCH_SIZE):
+        n = min(BATCH_SIZE, n_vectors - i)
+        vectors = topics[rng.integers(0, N_TOPICS, n)] + NOISE * rng.normal(size=(n, DIM)).astype(np.float32)
+        store.add([str(j) for j in range(i, i + n)], vectors)
+    return store, time.perf_counter() - start
+
+def search(store, queries):
+    start = time.perf_counter()
+    results = [store.query(query, K)[0] for query in queries]
+    return results, len(queries) / (time.perf_counter() - start)
+
+def main():
+    sizes = [n for n in SIZES if n <= int(sys.argv[1])] if len(sys.argv) > 1 else SIZES
+    print(f"{DIM}-dimensional embeddings in {N_TOPICS} topics, {N_QUERIES} queries, recall@{K}")
+    for n_vectors in sizes:
+        rng = np.random.default_rng(0)
+        store, build_time = make_store(n_vectors, rng)
+        queries = store.vectors[rng.integers(0, n_vectors, N_QUERIES)] + 0.1 * rng.normal(size=(N_QUERIES, DIM)).astype(np.float32)
+
+        index, store.index = store.index, None
+        exact, exact_qps = search(store, queries)
+        store.index = index
+        print(f"{n_vectors:>9} vectors: built in {build_time:6.1f} s ({len(index.centroids)} lists), exact {exact_qps:8.1f} qps")
+        for n_probe in N_PROBES:
+            index.n_probe = n_probe
+            approximate, qps = search(store, queries)
+            recall = np.mean([len(set(a) & set(e)) / K for a, e in zip(approximate, exact)])
+            print(f"{'':>9}  n_probe {n_probe:3d}: recall@{K} {recall:.3f}, {qps:8.1f} qps ({qps / exact_qps:5.1f}x)")
+        shutil.rmtree(store.loc.parent, ignore_errors=True)
+        del store, index
+
+if __name__ == "__main__":
+    main()
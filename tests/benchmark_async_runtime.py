@@ -0,0 +1,103 @@
+"""Benchmark of the asyncio agent runtime against the thread runtime, offline against the stub OpenAI server.
+
+1. Engine: N_CALLS completions with GPTConversEngine.call_model in N_THREADS threads vs acall_model on one event loop.
+2. Agents: N_TASKS analysis tasks performed by N_AGENTS GeneralPurposeAgents on the AsyncAgentRuntime.
+Every completion takes DELAY seconds on the stub server, so the wall time is bound by the number of calls in flight.
+
+Run from the repo root: python tests/benchmark_async_runtime.py
+"""
+import os
+import sys
+import time
+import asyncio
+import logging
+from pathlib import Path
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(str(Path(__file__).parent.parent))
+sys.path.append(str(Path(__file__).parent))
+
+import openai
+
+from stub_openai_server import StubOpenAIServer
+from swarmai.utils.ai_engines.GPTConversEngine import GPTConversEngine
+from swarmai.utils.ai_engines.RateLimiter import RateLimiter
+from swarmai.utils.task_queue.HeapQueue import HeapQueue
+from swarmai.utils.task_queue.Task import Task
+from swarmai.agents.GeneralPurposeAgent import GeneralPurposeAgent
+from swarmai.agents.AsyncAgentRuntime import AsyncAgentRuntime
+
+DELAY = 0.2 # seconds per completion
+N_CALLS = 400
+N_THREADS = 16
+N_TASKS = 1000
+N_AGENTS = 250
+MAX_CONCURRENCY = 200
+
+def benchmark_engine(server):
+    engine = GPTConversEngine("gpt-3.5-turbo", 0.5, 100)
+    conversations = [[{"role": "user", "content": f"question {i}"}] for i in range(N_CALLS)]
+
+    server.reset_stats()
+    start = time.monotonic()
+    with ThreadPoolExecutor(N_THREADS) as executor:
+        results = list(executor.map(engine.call_model, conversations))
+    print(f"call_model, {N_THREADS} threads: {N_CALLS} calls in {time.monotonic() - start:.2f} s, max in flight {server.max_in_flight}, empty answers {results.count('')}")
+
+    async def run_async():
+        semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+        async def call(conversation):
+            async with semaphore:
+                return await engine.acall_model(conversation)
+        return await asyncio.gather(*[call(conversation) for conversation in conversations])
+
+    server.reset_stats()
+    start = time.monotonic()
+    results = asyncio.run(run_async())
+    print(f"acall_model, {MAX_CONCURRENCY} concurrent: {N_CALLS} calls in {time.monotonic() - start:.2f} s, max in flight {server.max_in_flight}, empty answers {results.count('')}")
+
+def benchmark_runtime(server):
+    task_queue = HeapQueue(["analysis"], ["analyst"], {"analyst": ["analysis"]})
+    task_queue.add_tasks([Task(50, "analysis", f"Analyse the item {i}") for i in range(N_TASKS)])
+    swarm = SimpleNamespace(
+        shared_memory=SimpleNamespace(add_entry=lambda data: None),
+        task_queue=task_queue,
+        max_task_duration=60,
+        TASK_TYPES=["analysis"],
+    )
+    logger = logging.getLogger("benchmark_async_runtime")
+    agents = [GeneralPurposeAgent(i, "analyst", swarm, logger) for i in range(N_AGENTS)]
+    for agent in agents:
+        agent.max_cycles = N_TASKS
+
+    server.reset_stats()
+    runtime = AsyncAgentRuntime(agents, max_concurrency=MAX_CONCURRENCY)
+
+    async def run_until_done():
+        async def watch():
+            while task_queue.get_metrics()["task_types"]["analysis"]["completed"] < N_TASKS:
+                await asyncio.sleep(0.05)
+            runtime.stop()
+        watcher = asyncio.create_task(watch())
+        await runtime.run(timeout=120)
+        watcher.cancel()
+
+    start = time.monotonic()
+    asyncio.run(run_until_done())
+    completed = task_queue.get_metrics()["task_types"]["analysis"]["completed"]
+    print(f"AsyncAgentRuntime, {N_AGENTS} agents, max {MAX_CONCURRENCY} concurrent: {completed}/{N_TASKS} tasks in {time.monotonic() - start:.2f} s, max in flight {server.max_in_flight}")
+
+def main():
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    server = StubOpenAIServer(delay=DELAY).start()
+    openai.api_base = server.api_base
+    # the stub has no rate limits, the default budget of the real api would dominate the timings
+    RateLimiter.configure({"gpt-3.5-turbo": None})
+    try:
+        benchmark_engine(server)
+        benchmark_runtime(server)
+    finally:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
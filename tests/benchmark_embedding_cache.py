@@ -0,0 +1,78 @@
+"""Benchmark of the embedding cache of the shared memory: embedding calls without the cache, with an empty cache,
+and with the cache persisted by a previous run (the re-run of the same swarm config).
+
+N_AGENTS googlers add N_ENTRIES search summaries drawn from N_DISTINCT ones (the overlapping search results) and ask N_QUERIES questions
+drawn from the goals. The SimulatedEmbeddings embed locally with EMBEDDING_LATENCY seconds per call, so no api key is needed.
+Small batches (BATCH_SIZE) are used, as in a swarm where the entries arrive slower than the flush interval.
+
+Run from the repo root: python tests/benchmark_embedding_cache.py
+"""
+import sys
+import time
+import random
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from swarmai.utils.memory import VectorMemory, EmbeddingCache
+from swarmai.utils.ai_engines.SimulatedEngine import Simulation, SimulatedEmbeddings, SimulatedLLM
+
+N_AGENTS = 8
+N_ENTRIES = 400
+N_DISTINCT = 100
+N_QUERIES = 100
+BATCH_SIZE = 4
+EMBEDDING_LATENCY = 0.05
+WORDS = "brain computer interface startup funding market growth investor device neural signal eeg headset software revenue".split()
+GOALS = ["description of the startup", "news mentions", "top competitors", "top investors", "market size and growth",
+         "problems and challenges", "technology overview", "questions to the startup"]
+
+def workload(seed=0):
+    rng = random.Random(seed)
+    distinct = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(50, 150))) for _ in range(N_DISTINCT)]
+    entries = [rng.choice(distinct) for _ in range(N_ENTRIES)]
+    queries = [f"try to find information about {rng.choice(GOALS)}" for _ in range(N_QUERIES)]
+    return entries, queries
+
+def run(name, cache_dir):
+    loc = Path(tempfile.mkdtemp()) / "shared_memory"
+    cache = EmbeddingCache(cache_dir) if cache_dir is not None else None
+    memory = VectorMemory(loc, embeddings=SimulatedEmbeddings(), qa_llm=SimulatedLLM(), embedding_cache=cache, batch_size=BATCH_SIZE, flush_interval=0.01)
+    Simulation.calls = {}
+    entries, queries = workload()
+
+    def agent(i):
+        for text in entries[i::N_AGENTS]:
+            memory.add_entry(text)
+        for query in queries[i::N_AGENTS]:
+            memory.search_memory(query, k=3, type="cos", distance_threshold=10)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=agent, args=(i,)) for i in range(N_AGENTS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    memory.close()
+    elapsed = time.perf_counter() - start
+
+    calls = Simulation.get_stats()["calls"].get("embedding", 0)
+    avoided = cache.get_stats()["embedding_calls_avoided"] if cache is not None else 0
+    print(f"{name:>12}: {calls:4d} embedding calls, {avoided:4d} avoided, {elapsed:6.2f} s")
+    if cache is not None:
+        cache.close()
+    shutil.rmtree(loc.parent, ignore_errors=True)
+
+def main():
+    Simulation.configure({"latency": {"embedding": {"distribution": "constant", "value": EMBEDDING_LATENCY}}})
+    print(f"{N_AGENTS} agents, {N_ENTRIES} entries ({N_DISTINCT} distinct), {N_QUERIES} queries, {EMBEDDING_LATENCY * 1000:.0f} ms per embedding call")
+    cache_dir = Path(tempfile.mkdtemp()) / "embedding_cache"
+    run("no cache", None)
+    run("cold cache", cache_dir)
+    run("warm cache", cache_dir)
+    shutil.rmtree(cache_dir.parent, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
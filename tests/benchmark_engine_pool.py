@@ -0,0 +1,64 @@
+"""Benchmark of the swarm startup: constructing N_AGENTS agents with per-agent engines vs engines borrowed from the EnginePool.
+
+"Per agent" clears the pool before every agent, which is the same as every agent constructing its own engines.
+Googlers and crunchbase searchers are only included if GOOGLE_API_KEY and GOOGLE_CSE_ID are set (the swarm replaces them by analysts otherwise).
+
+Run from the repo root: python tests/benchmark_engine_pool.py
+"""
+import os
+import sys
+import time
+import logging
+import tracemalloc
+from pathlib import Path
+from types import SimpleNamespace
+sys.path.append(str(Path(__file__).parent.parent))
+
+from swarmai.utils.ai_engines.EnginePool import EnginePool
+from swarmai.utils.task_queue.HeapQueue import HeapQueue
+from swarmai.agents import ManagerAgent, GeneralPurposeAgent, GooglerAgent
+
+N_AGENTS = 50
+
+def agent_classes():
+    roles = [ManagerAgent, GeneralPurposeAgent]
+    if "GOOGLE_API_KEY" in os.environ and "GOOGLE_CSE_ID" in os.environ:
+        roles.append(GooglerAgent)
+    return [roles[i % len(roles)] for i in range(N_AGENTS)]
+
+def create_agents(classes, shared_engines):
+    swarm = SimpleNamespace(
+        shared_memory=None,
+        task_queue=HeapQueue(["analysis"], ["analyst"], {"analyst": ["analysis"]}),
+        max_task_duration=600,
+        TASK_TYPES=["breakdown_to_subtasks", "google_search", "analysis", "report_preparation"],
+    )
+    logger = logging.getLogger("benchmark_engine_pool")
+    EnginePool.clear()
+    agents = []
+    for i, agent_class in enumerate(classes):
+        if not shared_engines:
+            EnginePool.clear()
+        agents.append(agent_class(i, "agent", swarm, logger))
+    return agents
+
+def main():
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    classes = agent_classes()
+    print(f"{N_AGENTS} agents: {sorted(set(c.__name__ for c in classes))}")
+
+    # warm up the imports and the tiktoken files
+    create_agents(classes[:3], shared_engines=True)
+
+    for name, shared_engines in [("per-agent engines", False), ("EnginePool", True)]:
+        tracemalloc.start()
+        start = time.perf_counter()
+        agents = create_agents(classes, shared_engines)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        n_engines = len({id(engine) for agent in agents for engine in vars(agent).values() if type(engine).__name__.endswith("Engine")})
+        print(f"{name:<18} startup {elapsed*1000:8.1f} ms, {n_engines:3d} distinct engines, peak allocated {peak/1e6:6.1f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Benchmark of the shared memory under the mixed load of a swarm: throughput with one global lock (the previous VectorMemory)
+vs the read-write lock with the embedding and the answer outside of the lock.
+
+N_GOOGLERS agents add a search summary and search the memory, N_MANAGERS agents ask report questions, for DURATION seconds.
+Embeddings and answers are simulated locally (EMBEDDING_LATENCY and LLM_LATENCY seconds per call), so no api key is needed.
+
+Run from the repo root: python tests/benchmark_memory_concurrency.py
+"""
+import sys
+import time
+import random
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from swarmai.utils.memory import VectorMemory
+from swarmai.utils.ai_engines.SimulatedEngine import Simulation, SimulatedEmbeddings, SimulatedLLM
+
+N_GOOGLERS = 14
+N_MANAGERS = 6
+DURATION = 20
+EMBEDDING_LATENCY = 0.05
+LLM_LATENCY = 1.0
+WORDS = "brain computer interface startup funding market growth investor device neural signal eeg headset software revenue".split()
+
+class GlobalLockMemory(VectorMemory):
+    """The previous concurrency model: one lock around add_entry (embedded and persisted right away), search_memory and ask_question.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.global_lock = threading.Lock()
+
+    def add_entry(self, entry):
+        with self.global_lock:
+            super().add_entry(entry)
+            self.flush()
+            return True
+
+    def search_memory(self, *args, **kwargs):
+        with self.global_lock:
+            return super().search_memory(*args, **kwargs)
+
+    def ask_question(self, *args, **kwargs):
+        with self.global_lock:
+            return super().ask_question(*args, **kwargs)
+
+def run(name, memory_class):
+    loc = Path(tempfile.mkdtemp()) / "shared_memory"
+    memory = memory_class(loc, embeddings=SimulatedEmbeddings(), qa_llm=SimulatedLLM())
+    for i in range(50):
+        memory.add_entry(" ".join(random.Random(i).choice(WORDS) for _ in range(100)))
+    memory.flush()
+
+    counts = {"add_entry": 0, "search_memory": 0, "ask_question": 0}
+    latencies = {"search_memory": [], "ask_question": []}
+    lock = threading.Lock()
+    deadline = time.monotonic() + DURATION
+
+    def record(op, latency=None):
+        with lock:
+            counts[op] += 1
+            if latency is not None:
+                latencies[op].append(latency)
+
+    def googler(i):
+        rng = random.Random(1000 + i)
+        while time.monotonic() < deadline:
+            memory.add_entry(" ".join(rng.choice(WORDS) for _ in range(rng.randint(50, 300))))
+            record("add_entry")
+            start = time.monotonic()
+            memory.search_memory(" ".join(rng.choice(WORDS) for _ in range(5)), k=3, type="cos", distance_threshold=10)
+            record("search_memory", time.monotonic() - start)
+
+    def manager(i):
+        rng = random.Random(2000 + i)
+        while time.monotonic() < deadline:
+            start = time.monotonic()
+            memory.ask_question(f"question {rng.random()}: what do we know about " + " ".join(rng.choice(WORDS) for _ in range(5)))
+            record("ask_question", time.monotonic() - start)
+
+    threads = [threading.Thread(target=googler, args=(i,)) for i in range(N_GOOGLERS)]
+    threads += [threading.Thread(target=manager, args=(i,)) for i in range(N_MANAGERS)]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - start
+    memory.close()
+
+    total = sum(counts.values())
+    p50 = {op: sorted(values)[len(values) // 2] if values else float("nan") for op, values in latencies.items()}
+    print(f"{name:>12}: {total / elapsed:6.1f} ops/s ({', '.join(f'{op} {n}' for op, n in counts.items())}), "
+          f"p50 search {p50['search_memory']:.2f} s, p50 question {p50['ask_question']:.2f} s")
+    shutil.rmtree(loc.parent, ignore_errors=True)
+
+def main():
+    Simulation.configure({"latency": {
+        "embedding": {"distribution": "constant", "value": EMBEDDING_LATENCY},
+        "llm": {"distribution": "constant", "value": LLM_LATENCY},
+    }})
+    print(f"{N_GOOGLERS} googlers (add + search), {N_MANAGERS} managers (questions), {DURATION} s, "
+          f"{EMBEDDING_LATENCY * 1000:.0f} ms per embedding call, {LLM_LATENCY * 1000:.0f} ms per answer")
+    run("global lock", GlobalLockMemory)
+    run("read-write", VectorMemory)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Benchmark of the shared memory ingestion: synchronous writes (embed + persist per entry, the old add_entry) vs the buffered writes
+(batched embedding calls, group-committed persists).
+
+N_AGENTS threads add N_ENTRIES search summaries to a VectorMemory backed by Chroma, embedded locally by the SimulatedEmbeddings
+with EMBEDDING_LATENCY seconds per call (an api round trip), so no api key is needed.
+The time includes the final flush, i.e. all the entries are embedded and persisted.
+
+Run from the repo root: python tests/benchmark_memory_ingestion.py
+"""
+import sys
+import time
+import random
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from swarmai.utils.memory import VectorMemory
+from swarmai.utils.ai_engines.SimulatedEngine import Simulation, SimulatedEmbeddings, SimulatedLLM
+
+N_AGENTS = 8
+N_ENTRIES = 400
+EMBEDDING_LATENCY = 0.05
+WORDS = "brain computer interface startup funding market growth investor device neural signal eeg headset software revenue".split()
+
+def entries(seed=0):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(50, 300))) for _ in range(N_ENTRIES)]
+
+def run(name, synchronous):
+    loc = Path(tempfile.mkdtemp()) / "shared_memory"
+    memory = VectorMemory(loc, embeddings=SimulatedEmbeddings(), qa_llm=SimulatedLLM())
+    Simulation.calls = {}
+    texts = entries()
+
+    def agent(i):
+        for text in texts[i::N_AGENTS]:
+            memory.add_entry(text)
+            if synchronous:
+                memory.flush()
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=agent, args=(i,)) for i in range(N_AGENTS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    added = time.perf_counter() - start
+    memory.close()
+    elapsed = time.perf_counter() - start
+
+    # the buffered entries are visible to the searches
+    assert len(memory.search_memory(texts[-1][:200], k=3, type="cos", distance_threshold=10)) == 3
+    chunks = memory.store.count()
+    calls = Simulation.get_stats()["calls"].get("embedding")
+    print(f"{name:>12}: {N_ENTRIES / elapsed:7.1f} entries/s, {chunks} chunks, {calls} embedding calls, "
+          f"add_entry returned after {added:.2f} s, all persisted after {elapsed:.2f} s")
+    shutil.rmtree(loc.parent, ignore_errors=True)
+
+def main():
+    Simulation.configure({"latency": {"embedding": {"distribution": "constant", "value": EMBEDDING_LATENCY}}})
+    print(f"{N_AGENTS} agents, {N_ENTRIES} entries, {EMBEDDING_LATENCY * 1000:.0f} ms per embedding call")
+    run("synchronous", synchronous=True)
+    run("buffered", synchronous=False)
+
+if __name__ == "__main__":
+    main()
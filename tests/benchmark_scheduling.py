@@ -0,0 +1,109 @@
+"""Benchmark of the task queue scheduling policies on a synthetic swarm-like workload.
+
+A producer adds high priority "breakdown" tasks (priority 100), "report" tasks (50) and a flood of low priority
+"search" subtasks (0-30) slightly faster than the generalist workers can process them, so the queue is overloaded.
+For every policy prints the percentiles of the time from add to completion per task type and the number of tasks
+that were never completed. Strict priority starves the subtasks, aging and fair sharing should not.
+
+Run from the repo root: python tests/benchmark_scheduling.py
+"""
+import sys
+import time
+import random
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+sys.path.append(str(Path(__file__).parent.parent))
+
+import numpy as np
+
+from swarmai.utils.task_queue.HeapQueue import HeapQueue
+from swarmai.utils.task_queue.Task import Task
+from swarmai.utils.task_queue.SchedulingPolicy import PriorityPolicy, AgingPolicy, FairSharePolicy
+
+TASK_TYPES = ["breakdown", "report", "search"]
+ARRIVAL_RATES = {"breakdown": 60, "report": 60, "search": 700} # tasks per second
+N_WORKERS = 4
+MEAN_SERVICE_TIME = 0.005 # seconds, 4 workers => ~800 tasks per second capacity
+DURATION = 3 # seconds of arrivals
+DRAIN = 1 # seconds after the arrivals stop
+
+def generate_arrivals(seed=0):
+    rng = random.Random(seed)
+    arrivals = []
+    for task_type, rate in ARRIVAL_RATES.items():
+        t = 0
+        while True:
+            t += rng.expovariate(rate)
+            if t > DURATION:
+                break
+            if task_type == "breakdown":
+                priority = 100
+            elif task_type == "report":
+                priority = 50
+            else:
+                priority = rng.randint(0, 30)
+            arrivals.append((t, task_type, priority))
+    return sorted(arrivals)
+
+def run_policy(policy, arrivals, seed=0):
+    queue = HeapQueue(TASK_TYPES, ["worker"], {"worker": TASK_TYPES}, scheduling_policy=policy)
+    stop = threading.Event()
+
+    def producer():
+        start = time.monotonic()
+        for i, (t, task_type, priority) in enumerate(arrivals):
+            delay = start + t - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            queue.add_task(Task(priority, task_type, f"{task_type} task {i}"))
+
+    def worker(worker_id):
+        rng = random.Random(seed + worker_id)
+        agent = SimpleNamespace(agent_id=worker_id, agent_type="worker")
+        while not stop.is_set():
+            task = queue.get_task(agent, timeout=0.05)
+            if task is None:
+                continue
+            time.sleep(rng.expovariate(1 / MEAN_SERVICE_TIME))
+            queue.complete_task(task.task_id, fencing_token=task.fencing_token)
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(N_WORKERS)]
+    for w in workers:
+        w.start()
+    producer_thread = threading.Thread(target=producer)
+    producer_thread.start()
+    producer_thread.join()
+    time.sleep(DRAIN)
+    stop.set()
+    for w in workers:
+        w.join()
+
+    results = {}
+    for task_type in TASK_TYPES:
+        records = [r for r in queue.get_all_tasks() if r["task_type"] == task_type]
+        done = [(r["complete_time"] - r["add_time"]).total_seconds() for r in records if r["status"] == "completed"]
+        results[task_type] = (done, len(records) - len(done))
+    return results
+
+def main():
+    arrivals = generate_arrivals()
+    policies = {
+        "priority": PriorityPolicy(),
+        "aging (100/s)": AgingPolicy(aging_rate=100),
+        "fair_share (1:1:6)": FairSharePolicy({"breakdown": 1, "report": 1, "search": 6}),
+        "fair_share + aging": FairSharePolicy({"breakdown": 1, "report": 1, "search": 6}, base_policy=AgingPolicy(aging_rate=100)),
+    }
+    print(f"{len(arrivals)} tasks in {DURATION} s, {N_WORKERS} workers, mean service time {MEAN_SERVICE_TIME*1000:.0f} ms")
+    print(f"{'policy':<20} {'type':<10} {'done':>6} {'unfinished':>10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, policy in policies.items():
+        results = run_policy(policy, arrivals)
+        for task_type, (done, unfinished) in results.items():
+            if len(done) > 0:
+                p50, p95, p99 = np.percentile(np.array(done) * 1000, [50, 95, 99])
+            else:
+                p50 = p95 = p99 = float("nan")
+            print(f"{name:<20} {task_type:<10} {len(done):>6} {unfinished:>10} {p50:>8.0f} {p95:>8.0f} {p99:>8.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Benchmark of the single-flight coalescing of identical LLM calls, offline against the stub OpenAI server.
+
+N_CALLERS threads and N_CALLERS coroutines send the same N_PROMPTS prompts at the same moment (like the manager agents
+preparing the same report), with and without EngineBase.single_flight. The response cache is disabled, so only the calls
+that are in flight at the same time are coalesced.
+
+Run from the repo root: python tests/benchmark_single_flight.py
+"""
+import os
+import sys
+import time
+import asyncio
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(str(Path(__file__).parent.parent))
+sys.path.append(str(Path(__file__).parent))
+
+import openai
+
+from stub_openai_server import StubOpenAIServer
+from swarmai.utils.ai_engines.EngineBase import EngineBase
+from swarmai.utils.ai_engines.GPTConversEngine import GPTConversEngine
+from swarmai.utils.ai_engines.RateLimiter import RateLimiter
+from swarmai.utils.ai_engines.SingleFlight import SingleFlight
+
+DELAY = 0.3 # seconds per completion
+N_CALLERS = 50
+N_PROMPTS = 5
+
+def run(engine):
+    prompts = [f"Prepare the report of the section {i % N_PROMPTS}" for i in range(N_CALLERS)]
+    results = []
+
+    async def run_async():
+        return await asyncio.gather(*[engine.acall_model(prompt) for prompt in prompts])
+
+    def async_callers():
+        results.extend(asyncio.run(run_async()))
+
+    start = time.monotonic()
+    loop_thread = threading.Thread(target=async_callers)
+    loop_thread.start()
+    with ThreadPoolExecutor(N_CALLERS) as executor:
+        results.extend(executor.map(engine.call_model, prompts))
+    loop_thread.join()
+    return time.monotonic() - start, results
+
+def main():
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    server = StubOpenAIServer(delay=DELAY).start()
+    openai.api_base = server.api_base
+    RateLimiter.configure({"gpt-3.5-turbo": None})
+    EngineBase.response_cache = None
+    engine = GPTConversEngine("gpt-3.5-turbo", 0.5, 100)
+    try:
+        for name, single_flight in [("no coalescing", None), ("SingleFlight", SingleFlight())]:
+            EngineBase.single_flight = single_flight
+            server.reset_stats()
+            elapsed, results = run(engine)
+            stats = single_flight.get_stats() if single_flight is not None else {}
+            print(f"{name:<14} {len(results)} calls in {elapsed:.2f} s, {server.n_requests} api requests, empty answers {results.count('')}, {stats}")
+    finally:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Benchmark of the streamed task breakdown, offline against the stub OpenAI server.
+
+A ManagerAgent breaks a task down into N_SUBTASKS subtasks, the stub generates every completion at DELAY_PER_WORD seconds per word.
+The summary of the global task is generated alongside the breakdown. With stream_model every subtask is enqueued as soon as its tuple
+is parsed, so the first one must be in the task queue long before the end of the stream. call_model enqueues them after the whole response.
+
+Run from the repo root: python tests/benchmark_streaming.py
+"""
+import os
+import sys
+import time
+import logging
+from pathlib import Path
+from types import SimpleNamespace
+sys.path.append(str(Path(__file__).parent.parent))
+sys.path.append(str(Path(__file__).parent))
+
+import openai
+
+from stub_openai_server import StubOpenAIServer
+from swarmai.utils.ai_engines.EngineBase import EngineBase
+from swarmai.utils.ai_engines.EnginePool import EnginePool
+from swarmai.utils.ai_engines.RateLimiter import RateLimiter
+from swarmai.utils.task_queue.HeapQueue import HeapQueue
+from swarmai.utils.task_queue.Task import Task
+from swarmai.agents.ManagerAgent import ManagerAgent
+
+DELAY_PER_WORD = 0.01 # ~2 s for the breakdown
+N_SUBTASKS = 20
+TASK_TYPES = ["breakdown_to_subtasks", "google_search", "analysis", "report_preparation"]
+
+def responder(body):
+    if "Summary of the global task" in body["messages"][-1]["content"]:
+        return "A short summary of the global task."
+    subtasks = [f"(analysis; Analyse the aspect number {i} of the market in detail; {50 + i})" for i in range(N_SUBTASKS)]
+    return "[[" + ", ".join(subtasks) + "]]"
+
+def run(streaming):
+    task_queue = HeapQueue(["analysis"], ["analyst"], {"analyst": ["analysis"]})
+    swarm = SimpleNamespace(shared_memory=None, task_queue=task_queue, max_task_duration=600, TASK_TYPES=TASK_TYPES)
+    agent = ManagerAgent(0, "manager", swarm, logging.getLogger("benchmark_streaming"))
+    agent.task = Task(100, "breakdown_to_subtasks", "Analyse the market of electric cars")
+    engine = agent.engine
+    # the non-streaming consumer gets the whole response at once
+    stream_model = engine.stream_model if streaming else lambda conversation: iter([engine.call_model(conversation)])
+    stream_end = []
+    def timed_stream_model(conversation):
+        yield from stream_model(conversation)
+        stream_end.append(time.monotonic())
+    # the pooled engine itself is not patched
+    agent.engine = SimpleNamespace(call_model=engine.call_model, stream_model=timed_stream_model)
+
+    enqueue_times = []
+    add_tasks = task_queue.add_tasks
+    def timed_add_tasks(tasks):
+        enqueue_times.append(time.monotonic())
+        return add_tasks(tasks)
+    task_queue.add_tasks = timed_add_tasks
+
+    start = time.monotonic()
+    subtasks = agent.breakdown_to_subtasks(agent.task.task_description)
+    total = time.monotonic() - start
+    return enqueue_times[0] - start, stream_end[0] - start, total, len(subtasks)
+
+def main():
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    server = StubOpenAIServer(responder=responder, delay_per_word=DELAY_PER_WORD).start()
+    openai.api_base = server.api_base
+    RateLimiter.configure({"gpt-3.5-turbo": None})
+    EngineBase.response_cache = None
+    EnginePool.clear()
+    try:
+        for name, streaming in [("call_model", False), ("stream_model", True)]:
+            first, end, total, n_subtasks = run(streaming)
+            print(f"{name:<13} first subtask enqueued after {first:.2f} s, stream ended after {end:.2f} s, {n_subtasks} subtasks after {total:.2f} s")
+            if streaming:
+                assert first < end / 2, "the first subtask must be enqueued while the breakdown is still streaming"
+    finally:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Microbenchmark of the token accounting in GPTConversEngine._prepare_conversation on swarm-like conversations.
+
+Compares the previous truncation (every message encoded twice: to truncate and to count, no cache)
+with the single-pass truncation and the cache of the recurring texts (system prompts, the global goal, the task breakdown template).
+The conversations mimic the manager (report summary with a memory dump), the breakdown and the googler (large search results).
+
+Run from the repo root: python tests/benchmark_token_counting.py
+"""
+import os
+import sys
+import time
+import random
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from swarmai.utils.ai_engines.GPTConversEngine import GPTConversEngine
+from swarmai.utils.PromptFactory import PromptFactory
+
+N_CONVERSATIONS = 300
+N_REPEATS = 3
+
+GLOBAL_GOAL = (
+    "A new startup just send us their pitch. Find if the startup is worth investing in. The startup is called Brainamics and it is in the space "
+    "of brain computer interfaces. More information about them: 'https://brainamics.de', 'https://www.linkedin.com/company/thebrainamics/'"
+)
+WORDS = ("brain computer interface startup funding market investors neural headset eeg signal gaming research user experience company "
+         "series seed valuation competitor product technology growth revenue customers https://example.com/article").split()
+
+def random_text(rng, n_words):
+    return " ".join(rng.choice(WORDS) for _ in range(n_words))
+
+def generate_conversations(seed=0):
+    rng = random.Random(seed)
+    conversations = []
+    for i in range(N_CONVERSATIONS):
+        kind = i % 3
+        if kind == 0:
+            # manager report preparation: unique memory dump + previous answer
+            conversations.append([
+                {"role": "system", "content": PromptFactory.StandardPrompts.summarisation_for_task_prompt},
+                {"role": "user", "content": random_text(rng, 1200) + f"\nUsing all the info above answer the question:\n{GLOBAL_GOAL}\n"},
+            ])
+        elif kind == 1:
+            # breakdown: long recurring system prompt, short task
+            conversations.append([
+                {"role": "system", "content": PromptFactory.StandardPrompts.task_breakdown + PromptFactory.StandardPrompts.tagging_prompt},
+                {"role": "user", "content": f"Task: Act as:\n{GLOBAL_GOAL}\nYour specific task is:\n{random_text(rng, 20)}\nSubtasks:"},
+            ])
+        else:
+            # googler: recurring config prompt, large unique search results
+            conversations.append([
+                {"role": "system", "content": PromptFactory.StandardPrompts.google_search_config_prompt},
+                {"role": "user", "content": f"Global mission: {GLOBAL_GOAL}\nSearch results:\n{random_text(rng, 2500)}"},
+            ])
+    return conversations
+
+def prepare_conversation_two_pass(engine, conversation):
+    """The truncation before the single-pass accounting, for reference.
+    """
+    total_len = 0
+    for message in conversation:
+        max_tokens = min(engine.max_input_length(), engine.max_input_length()-total_len-100)
+        message_tokens = engine.tiktoken_encoding.encode(message["content"])
+        if len(message_tokens) > max_tokens:
+            message["content"] = engine.tiktoken_encoding.decode(message_tokens[:max_tokens])
+        total_len += len(engine.tiktoken_encoding.encode(message["content"]))
+    return conversation, total_len
+
+def copy_conversations(conversations):
+    return [[dict(message) for message in conversation] for conversation in conversations]
+
+def main():
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    engine = GPTConversEngine("gpt-3.5-turbo", 0.5, 1000)
+    conversations = generate_conversations()
+    n_chars = sum(len(message["content"]) for conversation in conversations for message in conversation)
+    print(f"{N_CONVERSATIONS} conversations, {n_chars/1e6:.1f}M characters, best of {N_REPEATS}")
+
+    timings = {}
+    totals = {}
+    for name, prepare in [("two passes, no cache", lambda c: prepare_conversation_two_pass(engine, c)), ("single pass + cache", engine._prepare_conversation)]:
+        best = float("inf")
+        for _ in range(N_REPEATS):
+            batch = copy_conversations(conversations)
+            start = time.perf_counter()
+            totals[name] = sum(prepare(conversation)[1] for conversation in batch)
+            best = min(best, time.perf_counter() - start)
+        timings[name] = best
+        print(f"{name:<22} {best*1000:8.1f} ms  {best/N_CONVERSATIONS*1e6:8.1f} us/conversation  {totals[name]} tokens")
+
+    print(f"speedup: {timings['two passes, no cache'] / timings['single pass + cache']:.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Benchmark of the vector stores of the shared memory: Chroma vs the NumPy matrix (swarm.shared_memory.backend).
+
+For N_CHUNKS chunks with random DIM-dimensional embeddings (the size of the OpenAI ones), measures the startup,
+adding the chunks in batches of BATCH_SIZE with a persist every PERSIST_EVERY chunks (the group commit of the VectorMemory),
+and N_QUERIES searches: top k and MMR (k of fetch_k) as in search_memory. The embeddings are precomputed, so only the stores are timed.
+
+Run from the repo root: python tests/benchmark_vector_store.py
+"""
+import sys
+import time
+import shutil
+import tempfile
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import numpy as np
+
+from swarmai.utils.memory import ChromaStore, NumpyVectorStore
+from swarmai.utils.memory.NumpyVectorStore import maximal_marginal_relevance
+from swarmai.utils.ai_engines.SimulatedEngine import SimulatedEmbeddings
+
+N_CHUNKS = [1000, 5000]
+DIM = 1536
+BATCH_SIZE = 64
+PERSIST_EVERY = 256
+N_QUERIES = 200
+K = 10
+FETCH_K = 20
+
+def run(name, create_store, n_chunks, rng):
+    loc = Path(tempfile.mkdtemp()) / "shared_memory"
+    vectors = rng.normal(size=(n_chunks, DIM)).astype(np.float32)
+    queries = rng.normal(size=(N_QUERIES, DIM)).astype(np.float32)
+    texts = [f"chunk {i}" for i in range(n_chunks)]
+
+    start = time.perf_counter()
+    store = create_store(loc)
+    startup = time.perf_counter() - start
+
+    add_latencies = []
+    for i in range(0, n_chunks, BATCH_SIZE):
+        start = time.perf_counter()
+        store.add(texts[i:i + BATCH_SIZE], vectors[i:i + BATCH_SIZE].tolist())
+        if (i // BATCH_SIZE + 1) * BATCH_SIZE % PERSIST_EVERY == 0:
+            store.persist()
+        add_latencies.append(time.perf_counter() - start)
+    store.persist()
+
+    search_latencies, mmr_latencies = [], []
+    for query in queries:
+        embedding = query.tolist()
+        start = time.perf_counter()
+        store.query(embedding, K)
+        search_latencies.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        _, _, candidates = store.query(embedding, FETCH_K, include_vectors=True)
+        maximal_marginal_relevance(embedding, candidates, k=K)
+        mmr_latencies.append(time.perf_counter() - start)
+
+    ms = lambda latencies, p: 1000 * np.percentile(latencies, p)
+    print(f"{name:>6} {n_chunks:6d} chunks: startup {1000 * startup:7.1f} ms, "
+          f"add batch p50 {ms(add_latencies, 50):7.2f} ms (total {sum(add_latencies):6.2f} s), "
+          f"search p50 {ms(search_latencies, 50):6.2f} ms p99 {ms(search_latencies, 99):6.2f} ms, "
+          f"mmr p50 {ms(mmr_latencies, 50):6.2f} ms")
+    shutil.rmtree(loc.parent, ignore_errors=True)
+
+def main():
+    print(f"{DIM}-dimensional embeddings, batches of {BATCH_SIZE}, persist every {PERSIST_EVERY} chunks, {N_QUERIES} queries, k {K}, fetch_k {FETCH_K}")
+    for n_chunks in N_CHUNKS:
+        run("chroma", lambda loc: ChromaStore(loc, SimulatedEmbeddings(DIM)), n_chunks, np.random.default_rng(0))
+        run("numpy", NumpyVectorStore, n_chunks, np.random.default_rng(0))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Load test of a whole swarm (Swarm.run_swarm) on the simulated llm, search and embeddings: no api keys, no api costs.
+
+Takes swarm_config.yaml, scales the agents, enables swarm.simulation and runs the swarm for TIMEOUT_MIN minutes,
+then prints the task queue metrics and the number of simulated calls.
+
+Run from the repo root: python tests/load_test_simulated_swarm.py [n_managers n_googlers n_analysts]
+"""
+import sys
+import json
+import yaml
+import tempfile
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from swarmai.Swarm import Swarm
+from swarmai.utils.ai_engines.SimulatedEngine import Simulation
+
+TIMEOUT_MIN = 0.5
+SIMULATION = {
+    "latency": {
+        "llm": {"distribution": "lognormal", "median": 0.5, "sigma": 0.5},
+        "search": {"distribution": "uniform", "low": 0.1, "high": 0.5},
+        "embedding": {"distribution": "constant", "value": 0.01},
+    },
+    "error_rate": 0.02,
+    "seed": 0,
+}
+
+def main():
+    n_managers, n_googlers, n_analysts = [int(n) for n in sys.argv[1:4]] if len(sys.argv) > 3 else [4, 8, 8]
+    root = Path(__file__).parent.parent
+    with open(root / "swarm_config.yaml") as f:
+        config = yaml.safe_load(f)
+
+    run_dir = Path(tempfile.mkdtemp(prefix="swarm_load_test_"))
+    config["swarm"]["agents"] = [
+        {"type": "manager", "n": n_managers},
+        {"type": "googler", "n": n_googlers},
+        {"type": "analyst", "n": n_analysts},
+        {"type": "crunchbase_searcher", "n": 1},
+    ]
+    config["swarm"]["timeout_min"] = TIMEOUT_MIN
+    config["swarm"]["run_dir"] = str(run_dir)
+    config["swarm"]["simulation"] = SIMULATION
+    config_file = run_dir / "swarm_config.yaml"
+    with open(config_file, "w") as f:
+        yaml.safe_dump(config, f)
+
+    swarm = Swarm(config_file)
+    swarm.run_swarm()
+
+    metrics = swarm.task_queue.get_metrics()
+    print(f"{n_managers} managers, {n_googlers} googlers, {n_analysts} analysts for {TIMEOUT_MIN*60:.0f} s, run_dir {run_dir}")
+    for task_type, m in metrics["task_types"].items():
+        print(f"{task_type:<22} added {m['added']:5d} completed {m['completed']:5d} pending {m['pending']:5d} resets {m['resets']:4d} wait p50 {m['wait_time']['p50']}")
+    print(f"simulated calls: {json.dumps(Simulation.get_stats())}")
+
+if __name__ == "__main__":
+    main()
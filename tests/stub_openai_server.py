@@ -0,0 +1,141 @@
+"""Local stub of the OpenAI chat completions endpoint, to test and benchmark the engines and the agent runtimes offline.
+
+POST /v1/chat/completions waits for --delay seconds (the latency of the model) and returns a canned completion,
+or a 429 rate limit error with the probability --error_rate.
+With "stream": true the completion is sent as server-sent events word by word, spread evenly over the delay.
+With --delay_per_word the delay is proportional to the length of the completion, like the generation time of a real model.
+The content can be replaced with responder(request_body) -> str, e.g. to return subtask lists.
+GET /stats returns the number of requests and the max number of requests that were in flight at the same time.
+
+Run from the repo root: python tests/stub_openai_server.py --port 8765 --delay 0.5
+and point openai to it: openai.api_base = "http://127.0.0.1:8765/v1"
+"""
+import re
+import json
+import time
+import random
+import asyncio
+import argparse
+import threading
+
+from aiohttp import web
+
+class StubOpenAIServer:
+    def __init__(self, host="127.0.0.1", port=8765, delay=0.5, error_rate=0.0, responder=None, delay_per_word=None):
+        self.host = host
+        self.port = port
+        self.delay = delay
+        self.delay_per_word = delay_per_word
+        self.error_rate = error_rate
+        self.responder = responder
+        self.n_requests = 0
+        self.n_errors = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+        self.app = web.Application()
+        self.app.router.add_post("/v1/chat/completions", self.chat_completions)
+        self.app.router.add_get("/stats", self.stats)
+        self._loop = None
+        self._runner = None
+
+    @property
+    def api_base(self):
+        return f"http://{self.host}:{self.port}/v1"
+
+    async def chat_completions(self, request):
+        body = await request.json()
+        self.n_requests += 1
+        if random.random() < self.error_rate:
+            self.n_errors += 1
+            await asyncio.sleep(self.delay)
+            return web.json_response({"error": {"message": "Rate limit reached for requests", "type": "requests", "param": None, "code": None}}, status=429)
+
+        if self.responder is not None:
+            content = self.responder(body)
+        else:
+            content = f"Stub answer to: {body['messages'][-1]['content'][:50]}"
+
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if body.get("stream"):
+                return await self._stream(request, body, content)
+            await asyncio.sleep(self._delay(content))
+        finally:
+            self.in_flight -= 1
+
+        return web.json_response({
+            "id": f"chatcmpl-stub-{self.n_requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-3.5-turbo"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        })
+
+    async def _stream(self, request, body, content):
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        words = re.findall(r"\S+\s*", content) or [""]
+        for i, word in enumerate(words):
+            await asyncio.sleep(self._delay(content) / len(words))
+            chunk = {
+                "id": f"chatcmpl-stub-{self.n_requests}",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body.get("model", "gpt-3.5-turbo"),
+                "choices": [{"index": 0, "delta": {"role": "assistant", "content": word} if i == 0 else {"content": word}, "finish_reason": None}],
+            }
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    def _delay(self, content):
+        if self.delay_per_word is None:
+            return self.delay
+        return self.delay_per_word * len(content.split())
+
+    async def stats(self, request):
+        return web.json_response({"n_requests": self.n_requests, "n_errors": self.n_errors, "max_in_flight": self.max_in_flight})
+
+    def reset_stats(self):
+        self.n_requests = 0
+        self.n_errors = 0
+        self.max_in_flight = 0
+
+    def start(self):
+        """Serves in a background thread with its own event loop.
+        """
+        started = threading.Event()
+
+        def serve():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            self._runner = web.AppRunner(self.app)
+            self._loop.run_until_complete(self._runner.setup())
+            self._loop.run_until_complete(web.TCPSite(self._runner, self.host, self.port).start())
+            started.set()
+            self._loop.run_forever()
+
+        threading.Thread(target=serve, name="StubOpenAIServer", daemon=True).start()
+        started.wait()
+        return self
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub of the OpenAI chat completions endpoint")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=0.5, help="seconds every completion takes")
+    parser.add_argument("--error_rate", type=float, default=0.0, help="probability of a 429 response")
+    parser.add_argument("--delay_per_word", type=float, default=None, help="seconds per word of the completion, replaces --delay")
+    args = parser.parse_args()
+
+    server = StubOpenAIServer(args.host, args.port, args.delay, args.error_rate, delay_per_word=args.delay_per_word)
+    web.run_app(server.app, host=args.host, port=args.port)
@@ -0,0 +1,78 @@
+"""Abandoned jobs of the thread agents: a stuck job or a lost lease resets or drops the claim the agent waited for,
+even if the job replaced self.task in the meantime.
+
+Run from the repo root: python tests/test_agent_job.py (or with pytest)
+"""
+import sys
+import time
+import logging
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+sys.path.append(str(Path(__file__).parent.parent))
+
+from swarmai.agents.AgentBase import AgentBase, AgentJob
+from swarmai.utils.task_queue.Task import Task
+from swarmai.utils.task_queue.HeapQueue import HeapQueue
+
+TASK_TYPES = [Task.TaskTypes.google_search]
+
+class StuckAgent(AgentBase):
+    """Takes another task into self.task, then hangs until released.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.release = threading.Event()
+
+    def perform_task(self):
+        self._get_task(timeout=0)
+        self.release.wait()
+        return False
+
+    def share(self):
+        pass
+
+def make_agent(lease_duration=None):
+    task_queue = HeapQueue(TASK_TYPES, ["googler"], {"googler": TASK_TYPES}, lease_duration=lease_duration, reap_interval=0.05)
+    swarm = SimpleNamespace(shared_memory=None, task_queue=task_queue, max_task_duration=0.3)
+    agent = StuckAgent(0, "googler", swarm, logging.getLogger("test_agent_job"))
+    task_queue.add_tasks([Task(50, Task.TaskTypes.google_search, f"search {i}") for i in range(2)])
+    return agent, task_queue
+
+def wait_for(agent, task_queue):
+    agent._get_task(timeout=0)
+    task = agent.task
+    agent.job = AgentJob(agent.agent_iteration, (task,))
+    agent.job.start()
+    agent._wait_for_job(task)
+    return task
+
+def statuses(task_queue):
+    return {record["task_id"]: record["status"] for record in task_queue.get_all_tasks()}
+
+def test_stuck_job_resets_its_claim():
+    agent, task_queue = make_agent()
+    task = wait_for(agent, task_queue)
+    other = agent.task
+    assert other is not None and other.task_id != task.task_id
+    # the claim the agent waited for is back to pending, the task taken by the job is untouched
+    assert statuses(task_queue) == {task.task_id: "pending", other.task_id: "in progress"}
+    assert agent.task is other
+    agent.release.set()
+    agent.job.join()
+    task_queue.close()
+
+def test_lost_lease_drops_the_task():
+    agent, task_queue = make_agent(lease_duration=0.1)
+    agent.max_task_duration = 5
+    agent.task_queue.renew_lease = lambda task_id, fencing_token: False
+    task = wait_for(agent, task_queue)
+    assert agent.task is not None and agent.task is not task
+    agent.release.set()
+    agent.job.join()
+    task_queue.close()
+
+if __name__ == "__main__":
+    test_stuck_job_resets_its_claim()
+    test_lost_lease_drops_the_task()
+    print("ok")
@@ -0,0 +1,132 @@
+"""AsyncAgentRuntime claims: idle agents wait for the task queue notification instead of polling and don't hold a slot,
+a task added later is picked up at once, and the runtime stops without waiting for the claim timeout.
+
+Run from the repo root: python tests/test_async_agent_runtime.py (or with pytest)
+"""
+import sys
+import time
+import asyncio
+import logging
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+sys.path.append(str(Path(__file__).parent.parent))
+
+from swarmai.agents.AgentBase import AgentBase
+from swarmai.agents.AsyncAgentRuntime import AsyncAgentRuntime
+from swarmai.utils.ai_engines.EngineBase import current_task_type
+from swarmai.utils.task_queue.Task import Task
+from swarmai.utils.task_queue.HeapQueue import HeapQueue
+
+TASK_TYPES = [Task.TaskTypes.google_search, Task.TaskTypes.analysis]
+TASK_ASSOCIATIONS = {"googler": [Task.TaskTypes.google_search], "analyst": [Task.TaskTypes.analysis]}
+
+class RecordingAgent(AgentBase):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.started = []
+
+    def perform_task(self):
+        raise NotImplementedError
+
+    async def aperform_task(self):
+        self.started.append((self.task.task_description, time.monotonic()))
+        return True
+
+    def share(self):
+        pass
+
+class BlockingAgent(AgentBase):
+    """Like the Manager or the Googler: perform_task blocks its thread for the whole call.
+    """
+    lock = threading.Lock()
+    running = 0
+    max_running = 0
+    task_types = set()
+
+    def perform_task(self):
+        with BlockingAgent.lock:
+            BlockingAgent.running += 1
+            BlockingAgent.max_running = max(BlockingAgent.max_running, BlockingAgent.running)
+            BlockingAgent.task_types.add(current_task_type.get())
+        time.sleep(0.2)
+        with BlockingAgent.lock:
+            BlockingAgent.running -= 1
+        return True
+
+    def share(self):
+        pass
+
+def make_agents(task_queue, agent_types, agent_class=RecordingAgent):
+    swarm = SimpleNamespace(shared_memory=None, task_queue=task_queue, max_task_duration=60)
+    logger = logging.getLogger("test_async_agent_runtime")
+    return [agent_class(i, agent_type, swarm, logger) for i, agent_type in enumerate(agent_types)]
+
+def test_task_added_later_is_claimed_at_once():
+    task_queue = HeapQueue(TASK_TYPES, list(TASK_ASSOCIATIONS), TASK_ASSOCIATIONS)
+    # more idle googlers than slots: they must not keep the analyst from running
+    agents = make_agents(task_queue, ["googler"] * 4 + ["analyst"])
+    runtime = AsyncAgentRuntime(agents, max_concurrency=2, claim_timeout=30)
+
+    async def scenario():
+        run = asyncio.create_task(runtime.run(timeout=10))
+        await asyncio.sleep(0.3)
+        added = time.monotonic()
+        await asyncio.to_thread(task_queue.add_task, Task(50, Task.TaskTypes.analysis, "late analysis"))
+        while not agents[-1].started:
+            await asyncio.sleep(0.01)
+        runtime.stop()
+        await run
+        return agents[-1].started[0][1] - added
+
+    start = time.monotonic()
+    latency = asyncio.run(scenario())
+    assert latency < 0.2, latency
+    # the idle agents blocked for claim_timeout are woken up on stop
+    assert time.monotonic() - start < 5
+    assert task_queue.get_metrics()["task_types"][Task.TaskTypes.analysis]["completed"] == 1
+    task_queue.close()
+
+def test_all_tasks_completed_with_few_slots():
+    task_queue = HeapQueue(TASK_TYPES, list(TASK_ASSOCIATIONS), TASK_ASSOCIATIONS, lease_duration=0.3)
+    task_queue.add_tasks([Task(50, Task.TaskTypes.google_search, f"search {i}") for i in range(30)])
+    agents = make_agents(task_queue, ["googler"] * 10)
+    for agent in agents:
+        agent.max_cycles = 30
+    runtime = AsyncAgentRuntime(agents, max_concurrency=2)
+
+    async def scenario():
+        run = asyncio.create_task(runtime.run(timeout=10))
+        while task_queue.get_metrics()["task_types"][Task.TaskTypes.google_search]["completed"] < 30:
+            await asyncio.sleep(0.01)
+        runtime.stop()
+        await run
+
+    asyncio.run(scenario())
+    assert sum(len(agent.started) for agent in agents) == 30
+    task_queue.close()
+
+def test_blocking_agents_reach_max_concurrency():
+    task_queue = HeapQueue(TASK_TYPES, list(TASK_ASSOCIATIONS), TASK_ASSOCIATIONS)
+    task_queue.add_tasks([Task(50, Task.TaskTypes.google_search, f"search {i}") for i in range(100)])
+    agents = make_agents(task_queue, ["googler"] * 100, agent_class=BlockingAgent)
+    # above the default executor of asyncio.to_thread, min(32, cpu + 4) threads
+    runtime = AsyncAgentRuntime(agents, max_concurrency=64)
+
+    async def scenario():
+        run = asyncio.create_task(runtime.run(timeout=10))
+        while task_queue.get_metrics()["task_types"][Task.TaskTypes.google_search]["completed"] < 100:
+            await asyncio.sleep(0.01)
+        runtime.stop()
+        await run
+
+    asyncio.run(scenario())
+    assert BlockingAgent.max_running == 64
+    assert BlockingAgent.task_types == {Task.TaskTypes.google_search}
+    task_queue.close()
+
+if __name__ == "__main__":
+    test_task_added_later_is_claimed_at_once()
+    test_all_tasks_completed_with_few_slots()
+    test_blocking_agents_reach_max_concurrency()
+    print("ok")
@@ -0,0 +1,41 @@
+"""The Chroma vector store of the VectorMemory doesn't return placeholder documents, also for a db written by an older version.
+
+Run from the repo root: python tests/test_chroma_store.py (or with pytest)
+"""
+import sys
+import tempfile
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from langchain.vectorstores import Chroma
+from langchain.embeddings.fake import FakeEmbeddings
+
+from swarmai.utils.memory.ChromaStore import ChromaStore
+
+def test_new_db_is_empty():
+    embeddings = FakeEmbeddings(size=8)
+    with tempfile.TemporaryDirectory() as loc:
+        store = ChromaStore(loc, embeddings)
+        assert store.count() == 0
+        store.add(["initial funding round"], embeddings.embed_documents(["initial funding round"]))
+        texts, _, _ = store.query(embeddings.embed_query("funding"), 1)
+        assert texts == ["initial funding round"]
+
+def test_old_placeholders_removed():
+    embeddings = FakeEmbeddings(size=8)
+    with tempfile.TemporaryDirectory() as loc:
+        # the older versions added an "init" document every time the db was opened
+        for _ in range(2):
+            db = Chroma.from_texts(texts=["init"], embedding=embeddings, persist_directory=loc)
+        db.persist()
+        store = ChromaStore(loc, embeddings)
+        assert store.count() == 0
+        texts = ["init the search", "market size"]
+        store.add(texts, embeddings.embed_documents(texts))
+        found, _, _ = store.query(embeddings.embed_query("market"), store.count())
+        assert sorted(found) == texts
+
+if __name__ == "__main__":
+    test_new_db_is_empty()
+    test_old_placeholders_removed()
+    print("ok")
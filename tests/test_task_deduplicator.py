@@ -0,0 +1,66 @@
+"""Near-duplicate suppression of the heap task queue and the bounded index of the TaskDeduplicator.
+
+Run from the repo root: python tests/test_task_deduplicator.py (or with pytest)
+"""
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+sys.path.append(str(Path(__file__).parent.parent))
+
+from swarmai.utils.task_queue.Task import Task
+from swarmai.utils.task_queue.HeapQueue import HeapQueue
+from swarmai.utils.task_queue.TaskDeduplicator import TaskDeduplicator
+
+TASK_TYPES = [Task.TaskTypes.google_search]
+AGENT_TYPES = ["googler"]
+TASK_ASSOCIATIONS = {"googler": [Task.TaskTypes.google_search]}
+GOOGLER = SimpleNamespace(agent_id=1, agent_type="googler")
+
+def search(description):
+    return Task(50, Task.TaskTypes.google_search, description)
+
+def run_and_complete(task_queue):
+    task = task_queue.get_task(GOOGLER, timeout=0)
+    assert task_queue.complete_task(task.task_id, fencing_token=task.fencing_token)
+
+def test_duplicates_suppressed():
+    task_queue = HeapQueue(TASK_TYPES, AGENT_TYPES, TASK_ASSOCIATIONS, deduplicator=TaskDeduplicator(mode="reject"))
+    assert task_queue.add_task(search("Find the market size of brain computer interfaces")) is not None
+    assert task_queue.add_task(search("find the market size of brain-computer interfaces!")) is None
+    run_and_complete(task_queue)
+    # still suppressed once the task is completed
+    assert task_queue.add_task(search("Find the market size of brain computer interfaces")) is None
+    task_queue.close()
+
+def test_completed_signatures_evicted():
+    deduplicator = TaskDeduplicator(mode="reject", max_completed=3)
+    task_queue = HeapQueue(TASK_TYPES, AGENT_TYPES, TASK_ASSOCIATIONS, deduplicator=deduplicator)
+    topics = ["funding rounds", "patents", "hiring", "customers", "competitors", "regulation", "press coverage", "founders"]
+    for topic in topics:
+        assert task_queue.add_task(search(f"Search the {topic} of the startup")) is not None
+        run_and_complete(task_queue)
+    assert len(deduplicator.entries) == 3
+    assert len(deduplicator.completed) == 3
+    assert sum(len(bucket) for bucket in deduplicator.buckets[Task.TaskTypes.google_search].values()) == 3 * deduplicator.bands
+
+    # the recently completed tasks are still duplicates, the evicted ones are not
+    assert task_queue.add_task(search("Search the founders of the startup")) is None
+    assert task_queue.add_task(search("Search the funding rounds of the startup")) is not None
+    task_queue.close()
+
+def test_pending_signatures_kept():
+    deduplicator = TaskDeduplicator(mode="reject", max_completed=0)
+    task_queue = HeapQueue(TASK_TYPES, AGENT_TYPES, TASK_ASSOCIATIONS, deduplicator=deduplicator)
+    assert task_queue.add_task(search("Find the top investors in the field")) is not None
+    task = task_queue.get_task(GOOGLER, timeout=0)
+    assert task_queue.reset_task(task.task_id, fencing_token=task.fencing_token)
+    assert task_queue.add_task(search("Find the top investors in the field")) is None
+    run_and_complete(task_queue)
+    assert len(deduplicator.entries) == 0
+    task_queue.close()
+
+if __name__ == "__main__":
+    test_duplicates_suppressed()
+    test_completed_signatures_evicted()
+    test_pending_signatures_kept()
+    print("ok")
@@ -0,0 +1,72 @@
+"""Task dependencies of the task queues: a blocked task becomes claimable when its parents complete,
+or after the dependency timeout when a parent never completes (abandoned, failing again and again).
+
+Run from the repo root: python tests/test_task_dependencies.py (or with pytest)
+"""
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+sys.path.append(str(Path(__file__).parent.parent))
+
+from swarmai.utils.task_queue.Task import Task
+from swarmai.utils.task_queue.PandasQueue import PandasQueue
+from swarmai.utils.task_queue.HeapQueue import HeapQueue
+
+TASK_TYPES = [Task.TaskTypes.google_search, Task.TaskTypes.report_preparation]
+AGENT_TYPES = ["googler", "manager"]
+TASK_ASSOCIATIONS = {"googler": [Task.TaskTypes.google_search], "manager": [Task.TaskTypes.report_preparation]}
+GOOGLER = SimpleNamespace(agent_id=1, agent_type="googler")
+MANAGER = SimpleNamespace(agent_id=2, agent_type="manager")
+
+def queues(**kwargs):
+    return [PandasQueue(TASK_TYPES, AGENT_TYPES, TASK_ASSOCIATIONS, **kwargs), HeapQueue(TASK_TYPES, AGENT_TYPES, TASK_ASSOCIATIONS, **kwargs)]
+
+def add_report_after_searches(task_queue, n_searches=2):
+    search_ids = task_queue.add_tasks([Task(50, Task.TaskTypes.google_search, f"search {i}") for i in range(n_searches)])
+    report_id = task_queue.add_task(Task(50, Task.TaskTypes.report_preparation, "write the report", depends_on=search_ids))
+    return search_ids, report_id
+
+def test_unblocked_when_parents_complete():
+    for task_queue in queues():
+        _, report_id = add_report_after_searches(task_queue)
+        for _ in range(2):
+            assert task_queue.get_task(MANAGER, timeout=0) is None
+            task = task_queue.get_task(GOOGLER, timeout=0)
+            assert task_queue.complete_task(task.task_id, fencing_token=task.fencing_token)
+        assert task_queue.get_task(MANAGER, timeout=0).task_id == report_id
+        task_queue.close()
+
+def test_released_after_dependency_timeout():
+    for task_queue in queues(dependency_timeout=0.2):
+        _, report_id = add_report_after_searches(task_queue)
+        # one search completes, the other keeps failing
+        task = task_queue.get_task(GOOGLER, timeout=0)
+        assert task_queue.complete_task(task.task_id, fencing_token=task.fencing_token)
+        task = task_queue.get_task(GOOGLER, timeout=0)
+        assert task_queue.reset_task(task.task_id, fencing_token=task.fencing_token)
+        assert task_queue.get_task(MANAGER, timeout=0) is None
+
+        time.sleep(0.3)
+        report = task_queue.get_task(MANAGER, timeout=0)
+        assert report is not None and report.task_id == report_id
+        assert task_queue.complete_task(report.task_id, fencing_token=report.fencing_token)
+
+        # the late completion of the parent doesn't unblock the report again
+        task = task_queue.get_task(GOOGLER, timeout=0)
+        assert task_queue.complete_task(task.task_id, fencing_token=task.fencing_token)
+        assert task_queue.get_task(MANAGER, timeout=0) is None
+        task_queue.close()
+
+def test_blocked_forever_without_timeout():
+    for task_queue in queues(dependency_timeout=None):
+        add_report_after_searches(task_queue, n_searches=1)
+        time.sleep(0.1)
+        assert task_queue.get_task(MANAGER, timeout=0) is None
+        task_queue.close()
+
+if __name__ == "__main__":
+    test_unblocked_when_parents_complete()
+    test_released_after_dependency_timeout()
+    test_blocked_forever_without_timeout()
+    print("ok")
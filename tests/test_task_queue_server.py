@@ -0,0 +1,75 @@
+"""Round trip of the task queue protocol: a RemoteQueue client against a TaskQueueServer serving a PandasQueue and a HeapQueue.
+
+Run from the repo root: python tests/test_task_queue_server.py (or with pytest)
+"""
+import sys
+import json
+import socket
+from pathlib import Path
+from types import SimpleNamespace
+sys.path.append(str(Path(__file__).parent.parent))
+
+from swarmai.utils.task_queue.Task import Task
+from swarmai.utils.task_queue.PandasQueue import PandasQueue
+from swarmai.utils.task_queue.HeapQueue import HeapQueue
+from swarmai.utils.task_queue.RemoteQueue import RemoteQueue
+from swarmai.utils.task_queue.TaskQueueServer import TaskQueueServer, parse_address
+
+TASK_TYPES = [Task.TaskTypes.google_search, Task.TaskTypes.report_preparation]
+AGENT_TYPES = ["googler", "manager"]
+TASK_ASSOCIATIONS = {"googler": [Task.TaskTypes.google_search], "manager": [Task.TaskTypes.report_preparation]}
+
+def round_trip(task_queue):
+    server = TaskQueueServer(task_queue, "tcp://127.0.0.1:0").start()
+    client = RemoteQueue(server.address)
+    googler = SimpleNamespace(agent_id=1, agent_type="googler")
+    manager = SimpleNamespace(agent_id=2, agent_type="manager")
+    try:
+        search_id = client.add_task(Task(1, Task.TaskTypes.google_search, "search the market size"))
+        assert isinstance(search_id, str)
+        report_id, = client.add_tasks([Task(1, Task.TaskTypes.report_preparation, "write the report", depends_on=[search_id])])
+        assert isinstance(report_id, str)
+
+        # the report is blocked until the search completes
+        assert client.get_task(manager, timeout=0) is None
+        task = client.get_task(googler, timeout=0)
+        assert task.task_id == search_id
+
+        # reset and claim again, then complete with the ids the client got
+        assert client.reset_task(task.task_id, fencing_token=task.fencing_token)
+        task = client.get_task(googler, timeout=0)
+        assert task.task_id == search_id
+        assert client.complete_task(task.task_id, fencing_token=task.fencing_token)
+        assert not client.complete_task(task.task_id, fencing_token=task.fencing_token)
+
+        task = client.get_task(manager, timeout=0)
+        assert task.task_id == report_id
+        assert client.complete_tasks([task.task_id], fencing_tokens=[task.fencing_token]) == [True]
+    finally:
+        client.close()
+        server.stop()
+
+def test_pandas_queue_round_trip():
+    round_trip(PandasQueue(TASK_TYPES, AGENT_TYPES, TASK_ASSOCIATIONS))
+
+def test_heap_queue_round_trip():
+    round_trip(HeapQueue(TASK_TYPES, AGENT_TYPES, TASK_ASSOCIATIONS))
+
+def test_malformed_request_keeps_connection():
+    server = TaskQueueServer(HeapQueue(TASK_TYPES, AGENT_TYPES, TASK_ASSOCIATIONS), "tcp://127.0.0.1:0").start()
+    try:
+        with socket.create_connection(parse_address(server.address)[1], timeout=5) as sock:
+            lines = sock.makefile("rb")
+            for line in [b"{not json\n", b"[1, 2]\n", b'{"method": "get_supported_tasks", "kwargs": {"agent_type": "googler"}}\n']:
+                sock.sendall(line)
+            assert json.loads(lines.readline())["error"] == "JSONDecodeError"
+            assert json.loads(lines.readline())["error"] == "ValueError"
+            assert json.loads(lines.readline()) == {"result": [Task.TaskTypes.google_search]}
+    finally:
+        server.stop()
+
+if __name__ == "__main__":
+    test_pandas_queue_round_trip()
+    test_heap_queue_round_trip()
+    test_malformed_request_keeps_connection()
+    print("ok")
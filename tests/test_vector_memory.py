@@ -0,0 +1,68 @@
+"""Read your writes of the buffered VectorMemory: an entry is found by a search right after add_entry, without flush(),
+and the search doesn't wait for flush_interval.
+
+Run from the repo root: python tests/test_vector_memory.py (or with pytest)
+"""
+import sys
+import time
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from swarmai.utils.memory import VectorMemory
+from swarmai.utils.ai_engines.SimulatedEngine import Simulation, SimulatedEmbeddings, SimulatedLLM
+
+def make_memory(backend):
+    Simulation.configure({"latency": {"embedding": {"distribution": "constant", "value": 0.05}}})
+    loc = Path(tempfile.mkdtemp()) / "shared_memory"
+    # a long flush_interval: the writer would not write a partial batch on its own during the test
+    return VectorMemory(loc, embeddings=SimulatedEmbeddings(), qa_llm=SimulatedLLM(), backend=backend, flush_interval=30), loc
+
+def check_read_your_writes(backend):
+    memory, loc = make_memory(backend)
+    try:
+        memory.add_entry("Brainamics raised a seed round of two million euros from neurotech investors")
+        memory.add_entry("The market of brain computer interfaces grows by fifteen percent per year")
+        start = time.monotonic()
+        texts = memory.search_memory("seed round investors of Brainamics", k=2, type="cos", distance_threshold=10)
+        assert time.monotonic() - start < 5
+        assert texts is not None and texts[0].startswith("Brainamics raised")
+        assert len(texts) == 2
+    finally:
+        memory.close()
+        shutil.rmtree(loc.parent, ignore_errors=True)
+
+def test_read_your_writes_numpy():
+    check_read_your_writes("numpy")
+
+def test_read_your_writes_chroma():
+    check_read_your_writes("chroma")
+
+def test_concurrent_writers_and_searches():
+    memory, loc = make_memory("numpy")
+    try:
+        failures = []
+        def agent(i):
+            for j in range(5):
+                memory.add_entry(f"agent{i} finding{j} about the startup")
+                texts = memory.search_memory(f"agent{i} finding{j}", k=1, type="mmr")
+                if texts is None or texts[0] != f"agent{i} finding{j} about the startup":
+                    failures.append((i, j, texts))
+        threads = [threading.Thread(target=agent, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert failures == []
+        assert memory.store.count() == 20
+    finally:
+        memory.close()
+        shutil.rmtree(loc.parent, ignore_errors=True)
+
+if __name__ == "__main__":
+    test_read_your_writes_numpy()
+    test_read_your_writes_chroma()
+    test_concurrent_writers_and_searches()
+    print("ok")